@@ -0,0 +1,436 @@
+"""Throughput, latency and allocations of the ingest path, end to end and offline.
+
+Runs the app from ``create_app()`` (the telemetry, security and lighting handlers, the MQTT workers
+and the batching InfluxDB writer) against an MQTT broker stand-in and a fake InfluxDB, both served
+from this process, so nothing else has to run. Scenarios:
+
+* ``steady``: ``--rate`` messages a second for ``--duration`` seconds.
+* ``burst``: ``--burst`` messages at once, handled as fast as the workers drain them.
+* ``reconnect``: steady, with the broker dropping the app's connection halfway through. Messages
+  published while it is not subscribed are lost, as they would be with a real broker at QoS 0.
+
+Latency is from the broker sending a message to all its handlers having run. Allocations are the
+peak of memory traced while handling one message at a time (tracemalloc), per message.
+
+    python benchmarks/ingest.py [steady burst reconnect] [--rate 2000] [--duration 5] [--burst 20000]
+"""
+
+import os
+import json
+import atexit
+import shutil
+import time
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import cycle
+from urllib.parse import parse_qs, urlsplit
+
+from paho.mqtt.client import topic_matches_sub
+
+from justkeeplivin.app import create_app
+from justkeeplivin.x import influxdb2, mqtt as x_mqtt
+
+MESSAGES = [
+    ("home/default/porch/motion", {"detected": True}),
+    ("home/default/living_room/motion", {"detected": False}),
+    ("home/default/garage/door", {"open": True}),
+    ("home/default/porch/proximity", {"distance": 1.25, "in_range": True}),
+    ("home/default/kitchen/temperature", {"temperature": 21.3, "humidity": 55.1}),
+    ("home/default/bedroom/temperature", {"temperature": 19.8, "humidity": 48.0}),
+    ("home/default/икона/gyro", {"accel": [0.01, 0.0, 1.0], "gyro": [1.5, 0.0, 0.0]}),
+    ("home/default/master_bedroom/remote", {"button": "OK"}),
+    ("home/default/porch/typing", {"keys": "0000"}),
+]
+"""What the pies publish, in the proportions the benchmark publishes it."""
+
+CONFIG = """
+MQTT_BROKER_URL = "127.0.0.1"
+MQTT_BROKER_PORT = {mqtt_port}
+MQTT_KEEPALIVE = 5
+INFLUX_URL = "http://127.0.0.1:{influx_port}"
+INFLUX_TOKEN = "token"
+INFLUX_ORG = "org"
+INFLUX_BUCKET = "justkeeplivin"
+INFLUX_SPOOL = False
+HOME_PIN = "1234"
+SECURITY_DB = "{security_dir}/security.db"
+"""
+
+
+#region Broker
+
+def _encode_length(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        n, byte = divmod(n, 128)
+        out.append(byte | (0x80 if n else 0))
+        if not n:
+            return bytes(out)
+
+def _decode_length(data: bytes, pos: int) -> tuple[int, int]:
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+class _Session:
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.version = 4
+        self.filters: set[str] = set()
+        self.lock = threading.Lock()
+
+    def send(self, packet: bytes):
+        with self.lock:
+            self.sock.sendall(packet)
+
+
+class Broker:
+    """Just enough of an MQTT 3.1.1/5 broker for one process: QoS 0 delivery, subscriptions, pings.
+
+    :meth:`publish` sends a message straight to the subscribed clients, from the calling thread.
+    """
+
+    def __init__(self, port: int = 0):
+        self._server = socket.create_server(("127.0.0.1", port))
+        self.port = self._server.getsockname()[1]
+        self._sessions: list[_Session] = []
+        self._lock = threading.Lock()
+        self.subscribed = threading.Event()
+
+        threading.Thread(target=self._accept, name="broker", daemon=True).start()
+
+    def publish(self, topic: str, payload: bytes) -> int:
+        """Returns how many clients the message was sent to."""
+        encoded = topic.encode()
+        with self._lock:
+            sessions = [s for s in self._sessions if any(topic_matches_sub(f, topic) for f in s.filters)]
+
+        for session in sessions:
+            body = len(encoded).to_bytes(2, "big") + encoded + (b"\x00" if session.version == 5 else b"") + payload
+            try:
+                session.send(b"\x30" + _encode_length(len(body)) + body)
+            except OSError:
+                pass
+
+        return len(sessions)
+
+    def drop_clients(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+            self.subscribed.clear()
+
+        for session in sessions:
+            session.sock.shutdown(socket.SHUT_RDWR) # closing alone leaves it open for the session's reader
+
+    def close(self):
+        self.drop_clients()
+        self._server.close()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve, args=(_Session(sock),), name="broker-session", daemon=True).start()
+
+    def _serve(self, session: _Session):
+        stream = session.sock.makefile("rb")
+        try:
+            while header := stream.read(1):
+                length = shift = 0
+                while (byte := stream.read(1)[0]) & 0x80:
+                    length |= (byte & 0x7F) << shift
+                    shift += 7
+                length |= byte << shift
+                self._handle(session, header[0] >> 4, stream.read(length))
+        except (OSError, IndexError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                if session in self._sessions:
+                    self._sessions.remove(session)
+            session.sock.close()
+
+    def _handle(self, session: _Session, type_: int, body: bytes):
+        v5 = session.version == 5
+
+        match type_:
+            case 1: # CONNECT
+                session.version = body[6]
+                session.send(b"\x20\x03\x00\x00\x00" if session.version == 5 else b"\x20\x02\x00\x00")
+                with self._lock:
+                    self._sessions.append(session)
+            case 3: # PUBLISH, from the app (alarms, lights), nobody else is subscribed
+                pass
+            case 8: # SUBSCRIBE
+                pos = 2
+                if v5:
+                    properties, pos = _decode_length(body, pos)
+                    pos += properties
+                granted = bytearray()
+                while pos < len(body):
+                    size = int.from_bytes(body[pos:pos + 2], "big")
+                    session.filters.add(body[pos + 2:pos + 2 + size].decode())
+                    pos += size + 3
+                    granted.append(0)
+                reply = body[:2] + (b"\x00" if v5 else b"") + granted
+                session.send(b"\x90" + _encode_length(len(reply)) + reply)
+                self.subscribed.set()
+            case 12: # PINGREQ
+                session.send(b"\xd0\x00")
+            case 14: # DISCONNECT
+                raise OSError
+
+#endregion
+
+#region InfluxDB
+
+def serve_influx(lines: Counter) -> ThreadingHTTPServer:
+    """Fake InfluxDB v2 API, counts the lines written to every bucket and creates buckets that are asked for."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            if url.path == "/api/v2/write":
+                bucket = parse_qs(url.query).get("bucket", [""])[0]
+                lines[bucket] += body.count(b"\n") + 1
+                return self._reply(204)
+            if url.path == "/api/v2/buckets":
+                return self._reply(201, {"id": "0", "name": json.loads(body)["name"], "retentionRules": []})
+            self._reply(404)
+
+        def do_GET(self):
+            if urlsplit(self.path).path == "/api/v2/buckets":
+                return self._reply(200, {"buckets": []})
+            self._reply(404)
+
+        def _reply(self, status: int, data: dict | None = None):
+            body = json.dumps(data).encode() if data is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, name="influx", daemon=True).start()
+    return server
+
+#endregion
+
+#region Scenarios
+
+class _ErrorCounter(logging.Handler):
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord):
+        self.count += 1
+
+
+@dataclass
+class Result:
+    published: int
+    handled: int
+    lost: int
+    elapsed: float
+    latencies: list[float]
+    errors: int
+    note: str = ""
+
+    def row(self, name: str) -> str:
+        latencies = sorted(self.latencies)
+
+        def p(q: float) -> float:
+            return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1e3 if latencies else float("nan")
+
+        return (
+            f"{name:<10} {self.handled / self.elapsed:9.0f} msgs/s  p50 {p(.5):7.2f} ms  p99 {p(.99):7.2f} ms"
+            f"  published {self.published}, handled {self.handled}, lost {self.lost}, handler errors {self.errors}"
+            + (f"\n{'':<10} {self.note}" if self.note else "")
+        )
+
+
+class Bench:
+    """Publishes numbered messages through the broker and times the handlers of every one of them."""
+
+    def __init__(self, broker: Broker, errors: _ErrorCounter):
+        self.broker = broker
+        self.errors = errors
+        self._messages = cycle(MESSAGES)
+        self._sent: list[float] = []
+        self._latencies: list[float] = []
+        self._handled = 0
+        self._done = threading.Condition()
+
+        dispatcher = x_mqtt.dispatcher
+        run = dispatcher._run
+
+        def timed_run(client, userdata, message: x_mqtt.JsonMessage, handlers):
+            run(client, userdata, message, handlers)
+            if isinstance(message.json, dict) and (seq := message.json.get("seq")) is not None:
+                self._latencies.append(time.perf_counter() - self._sent[seq])
+                with self._done:
+                    self._handled += 1
+                    self._done.notify_all()
+
+        dispatcher._run = timed_run
+
+    def publish(self) -> bool:
+        topic, data = next(self._messages)
+        payload = json.dumps({**data, "simulated": True, "seq": len(self._sent)}).encode()
+        self._sent.append(time.perf_counter())
+        return self.broker.publish(topic, payload) > 0
+
+    def run(self, publish, timeout: float = 30) -> Result:
+        """Runs ``publish(bench)``, which returns how many messages were lost, and waits for the rest to be handled."""
+        self._latencies = []
+        self._handled = 0
+        errors = self.errors.count
+        published = len(self._sent)
+
+        started = time.perf_counter()
+        lost = publish(self)
+        published = len(self._sent) - published
+
+        with self._done:
+            self._done.wait_for(lambda: self._handled >= published - lost, timeout)
+        elapsed = time.perf_counter() - started
+
+        return Result(published, self._handled, lost, elapsed, self._latencies, self.errors.count - errors)
+
+    def paced(self, rate: float, duration: float, midway=None) -> int:
+        lost = 0
+        started = time.perf_counter()
+        total = int(rate * duration)
+
+        for i in range(total):
+            if midway and i == total // 2:
+                midway()
+            if (delay := started + i / rate - time.perf_counter()) > 0:
+                time.sleep(delay)
+            lost += not self.publish()
+
+        return lost
+
+
+def steady(bench: Bench, args) -> Result:
+    return bench.run(lambda b: b.paced(args.rate, args.duration))
+
+def burst(bench: Bench, args) -> Result:
+    return bench.run(lambda b: sum(not b.publish() for _ in range(args.burst)))
+
+def reconnect(bench: Bench, args) -> Result:
+    dropped_at = 0.
+
+    def drop():
+        nonlocal dropped_at
+        dropped_at = time.perf_counter()
+        bench.broker.drop_clients()
+
+    result = bench.run(lambda b: b.paced(args.rate, args.duration, midway=drop))
+    if bench.broker.subscribed.wait(30):
+        result.note = f"reconnected and resubscribed in {time.perf_counter() - dropped_at:.2f}s at the latest"
+    else:
+        result.note = "did not resubscribe"
+    return result
+
+SCENARIOS = {
+    "steady": steady,
+    "burst": burst,
+    "reconnect": reconnect,
+}
+
+
+def allocations(bench: Bench, n: int) -> float:
+    """Peak of traced memory while handling one message, in bytes."""
+    tracemalloc.start()
+    peaks = []
+
+    for _ in range(n):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        bench.run(lambda b: not b.publish())
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+
+    tracemalloc.stop()
+    return sorted(peaks)[len(peaks) // 2]
+
+#endregion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS), help=f"Any of {', '.join(SCENARIOS)}, all by default.")
+    parser.add_argument("--rate", type=float, default=2_000, help="Messages a second of steady scenarios.")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds of steady scenarios.")
+    parser.add_argument("--burst", type=int, default=20_000, help="Messages of the burst.")
+    parser.add_argument("--allocations", type=int, default=500, help="Messages handled one at a time under tracemalloc.")
+    args = parser.parse_args()
+    if unknown := set(args.scenarios) - SCENARIOS.keys():
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.WARNING)
+    errors = _ErrorCounter() # failing handlers show up as a count
+    logging.getLogger(x_mqtt.__name__).addHandler(errors)
+    logging.getLogger(x_mqtt.__name__).propagate = False
+
+    broker = Broker()
+    lines = Counter()
+    influx = serve_influx(lines)
+
+    security_dir = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, security_dir, True) # after the app's own exit handlers
+    with tempfile.NamedTemporaryFile("w", suffix=".py") as config:
+        config.write(CONFIG.format(mqtt_port=broker.port, influx_port=influx.server_address[1], security_dir=security_dir))
+        config.flush()
+
+        os.environ["JKL_CONFIG"] = config.name
+        create_app()
+
+    if not broker.subscribed.wait(10):
+        raise SystemExit("The app did not subscribe")
+
+    bench = Bench(broker, errors)
+    bench.run(lambda b: sum(not b.publish() for _ in range(1_000))) # warm up caches and workers
+
+    for name in args.scenarios:
+        print(SCENARIOS[name](bench, args).row(name))
+
+    print(f"{'':<10} {allocations(bench, args.allocations):.0f} B/msg allocated (median peak)")
+
+    x_mqtt.mqtt.client.loop_stop()
+    if influxdb2.writer:
+        influxdb2.writer.flush(10)
+    print(f"{'':<10} lines written {dict(lines)}")
+
+    broker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""End-to-end latency of the ingest path under the load of many simulated houses.
+
+Every house runs the sensors of the pi manifests (doors, buttons, DHTs, IMUs and IR receivers, as
+``gpiohero.sim`` devices bound like the pi agent binds them) as house ``h0000``, ``h0001``, ... of the
+``home/<house>/<location>/<sensor>`` topics. Readings go out through
+``--clients`` pi ``Publisher``\\ s (so they are batched like on the pies) to the broker the backend is
+subscribed to. The backend is pointed at the fake InfluxDB this script serves, which only counts the
+written lines, by a config (``JKL_CONFIG``) with ``INFLUX_URL = "http://localhost:8087"``:
+
+    JKL_CONFIG=instance/loadgen.py jkl run
+    python benchmarks/loadgen.py [--houses 500] [--speed 10] [--duration 60]
+
+Latency is from the reading being published (handed to a publisher) to the backend writing its line,
+readings are matched to lines by measurement, house and location, in order (lines written twice, when the
+backend retries a write that timed out, are unmatched). Readings the deadband filters of the manifests
+hold back are never published, ``--sample-interval`` and ``--speed`` set the rate.
+"""
+
+import glob
+import gzip
+import json
+import math
+import time
+import logging
+import argparse
+import threading
+import warnings
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Deque, Dict, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.enums import MQTTProtocolVersion
+from gpiozero.pins.mock import MockFactory
+
+from gpiohero.clock import VirtualClock, set_clock
+from gpiohero.sim import Button, scheduler
+from piagent.agent import DeviceSpec, Manifest
+from piagent.commands import CommandRouter
+from piagent.devices import DEVICE_TYPES, create_device
+from piagent.publisher import Publisher
+
+from justkeeplivin.telemetry import SCHEMA
+
+SENSORS = ("door", "button", "dht", "imu", "ir")
+"""Device types that run on the shared scheduler, motion and proximity simulators take a thread each.
+
+So does the gpiozero hold thread of every door and button, leave them out for the largest loads.
+"""
+
+SCHEDULING = ("keypad", "proximity")
+"""Device types whose bindings schedule calls on the agent's event loop, which the houses do not run."""
+
+MANIFESTS = Path(__file__).parent.parent / "pies" / "*" / "config.json"
+
+# last topic level -> measurement
+MEASUREMENTS = {measurement.topic.rsplit("/", 1)[1]: measurement.name for measurement in SCHEMA}
+
+_Key = Tuple[str, str, str] # (measurement, house, location)
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return math.nan
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def rate(count: int, previous: int, elapsed: float) -> float:
+    return (count - previous) / elapsed
+
+
+class Latencies:
+    """Matches published readings to the lines written for them."""
+
+    def __init__(self):
+        self._published: Dict[_Key, Deque[float]] = defaultdict(deque)
+        self._lock = threading.Lock()
+        self.samples: List[float] = []
+        self.published = self.written = self.unmatched = 0
+
+    def on_publish(self, topic: str):
+        _, house, location, sensor = topic.split("/")
+        if (measurement := MEASUREMENTS.get(sensor)) is None:
+            return
+
+        with self._lock:
+            self._published[measurement, house, location.upper()].append(time.monotonic())
+            self.published += 1
+
+    def on_lines(self, lines: List[str]):
+        now = time.monotonic()
+
+        with self._lock:
+            for line in lines:
+                series, _, _ = line.partition(" ")
+                measurement, *tags = series.split(",")
+                tags = dict(tag.split("=", 1) for tag in tags)
+
+                self.written += 1
+                if published := self._published.get((measurement, tags.get("house"), tags.get("location"))):
+                    self.samples.append(now - published.popleft())
+                else:
+                    self.unmatched += 1
+
+    def take(self) -> List[float]:
+        with self._lock:
+            samples, self.samples = self.samples, []
+        return sorted(samples)
+
+
+def serve_influx(port: int, bucket: str, latencies: Latencies) -> ThreadingHTTPServer:
+    """Fake InfluxDB that takes writes, those to ``bucket`` (not the rollups) are matched to readings."""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            if url.path != "/api/v2/write":
+                return self.send_error(404)
+
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+
+            if parse_qs(url.query).get("bucket", [""])[0] == bucket:
+                latencies.on_lines(body.decode().splitlines())
+
+            self.send_response(204)
+            self.end_headers()
+
+        def do_GET(self):
+            self.send_error(404) # bucket setup, the backend goes on without it
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), Handler)
+    threading.Thread(target=server.serve_forever, name="influx", daemon=True).start()
+    return server
+
+
+class House:
+    """What the device bindings need of an ``Agent``, for the sensors of one house (not those in :data:`SCHEDULING`)."""
+
+    def __init__(self, publisher: Publisher, latencies: Latencies):
+        self.publisher = publisher
+        self.latencies = latencies
+        self.commands = CommandRouter()
+
+    def report(self, spec: DeviceSpec, data: dict):
+        data["simulated"] = True
+        if self.publisher.publish(spec.topic, data):
+            self.latencies.on_publish(spec.topic)
+
+    def call_soon_threadsafe(self, callback, *args):
+        callback(*args)
+
+
+def house_specs(manifest: Manifest, house: int, types: List[str], sample_interval: 'float | None') -> List[DeviceSpec]:
+    specs = []
+
+    for spec in manifest.devices:
+        if spec.type not in types or spec.type in SCHEDULING or not spec.topic:
+            continue
+
+        _, _, location, sensor = spec.topic.split("/")
+        options = dict(spec.options)
+        if sample_interval and spec.type in ("dht", "imu"):
+            options["sample_interval"] = sample_interval
+
+        specs.append(replace(spec, topic=f"home/h{house:04d}/{location}/{sensor}", options=options))
+
+    return specs
+
+def create_sensor(spec: DeviceSpec, pins: MockFactory):
+    if spec.type not in ("door", "button"):
+        return create_device(spec, True)
+
+    # NOTE: the mock factory has a few dozen pins, every pi of every house gets its own
+    clazz = type(Button.__name__, (Button,), dict(spec.sim)) if spec.sim else Button
+    return clazz(spec.options["pin"], pin_factory=pins)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--houses', type=int, default=100)
+    parser.add_argument('--speed', type=float, default=1, help="How much faster than real time the houses run.")
+    parser.add_argument('--types', nargs='+', choices=SENSORS, default=SENSORS, help="Device types the houses have.")
+    parser.add_argument('--sample-interval', type=float, help="Of DHTs and IMUs, seconds. Default is the manifests'.")
+    parser.add_argument('--duration', type=float, default=60, help="Seconds.")
+    parser.add_argument('--report', type=float, default=5, help="Seconds between reports.")
+    parser.add_argument('--clients', type=int, default=4, help="MQTT clients (and publishers) the houses share.")
+    parser.add_argument('--broker', default="localhost:1883")
+    parser.add_argument('--listen', type=int, default=8087, help="Port of the fake InfluxDB.")
+    parser.add_argument('--bucket', default="justkeeplivin")
+    parser.add_argument('--batch-size', type=int, default=30, help="Readings per batch message.")
+    parser.add_argument('--max-latency', type=float, default=1, help="Seconds a reading waits for its batch.")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    logging.basicConfig(level=logging.WARNING)
+
+    latencies = Latencies()
+    influx = serve_influx(args.listen, args.bucket, latencies)
+    set_clock(VirtualClock(speed=args.speed))
+
+    host, _, port = args.broker.partition(":")
+    clients, publishers = [], []
+    for i in range(args.clients):
+        client = mqtt.Client(client_id=f"loadgen-{i}", protocol=MQTTProtocolVersion.MQTTv5)
+        client.connect_async(host, int(port or 1883))
+        client.loop_start()
+        clients.append(client)
+        publishers.append(Publisher(client, batch_size=args.batch_size, max_latency=args.max_latency, max_inflight=1_000, queue_size=100_000).start())
+
+    manifests = [Manifest.load(path) for path in sorted(glob.glob(str(MANIFESTS)))]
+    devices = []
+    for house in range(args.houses):
+        agent = House(publishers[house % len(publishers)], latencies)
+        for manifest in manifests:
+            pins = MockFactory()
+            for spec in house_specs(manifest, house, args.types, args.sample_interval):
+                device = create_sensor(spec, pins)
+                DEVICE_TYPES[spec.type].bind(agent, device, spec)
+                devices.append(device)
+
+    print(f"{args.houses} houses, {len(devices)} devices, {threading.active_count()} threads")
+
+    started = last = time.monotonic()
+    published = written = 0
+    try:
+        while (now := time.monotonic()) - started < args.duration:
+            time.sleep(min(args.report, args.duration - (now - started)))
+
+            now = time.monotonic()
+            samples = [s * 1e3 for s in latencies.take()]
+            print(
+                f"{rate(latencies.published, published, now - last):8.0f} readings/s"
+                f" {rate(latencies.written, written, now - last):8.0f} lines/s"
+                f" | latency ms p50 {percentile(samples, .5):7.1f} p90 {percentile(samples, .9):7.1f}"
+                f" p99 {percentile(samples, .99):7.1f} max {max(samples, default=math.nan):7.1f}"
+                f" | unmatched {latencies.unmatched} | scheduler lag {scheduler.max_lag * 1e3:.0f}ms"
+            )
+            scheduler.max_lag = 0.
+            last, published, written = now, latencies.published, latencies.written
+    except KeyboardInterrupt:
+        pass
+    finally:
+        with ThreadPoolExecutor(32) as pool: # closing a gpiozero hold thread takes up to .1s
+            pool.map(lambda device: device.close(), devices)
+        for publisher, client in zip(publishers, clients):
+            publisher.close()
+            client.loop_stop()
+            client.disconnect()
+        influx.shutdown()
+
+    stats = [publisher.stats for publisher in publishers]
+    print(f"Published {latencies.published}, written {latencies.written}, publishers {json.dumps(stats)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""CPU cost of routing one MQTT message to its handlers.
+
+Compares the old setup, where every ``on_topic`` handler matched and parsed the payload itself,
+with the trie dispatcher that parses the payload once into a shared ``JsonMessage``.
+
+    python benchmarks/mqtt_dispatch.py [-n 100000]
+"""
+
+import json
+import time
+import argparse
+
+from paho.mqtt.client import MQTTMessage
+from paho.mqtt.matcher import MQTTMatcher
+
+from justkeeplivin.x import mqtt as x_mqtt
+from justkeeplivin.x.mqtt import TopicDispatcher
+
+FILTERS = [
+    "home/+/+/door",
+    "home/+/+/motion",
+    "home/+/+/proximity",
+    "home/+/+/temperature",
+    "home/+/+/typing",
+    "home/+/+/gyro",
+    "home/+/+/remote",
+    "home/+/+/timer",
+    "home/+/+/motion", # security
+    "home/+/porch/typing",
+    "home/+/икона/gyro",
+    "home/+/+/motion", # lighting
+    "home/+/master_bedroom/remote",
+]
+
+TOPICS = [
+    "home/default/porch/motion",
+    "home/default/kitchen/temperature",
+    "home/default/икона/gyro",
+    "home/default/garage/door",
+]
+
+PAYLOADS = {
+    "motion": {"detected": True, "simulated": True},
+    "temperature": {"temperature": 21.3, "humidity": 55.1, "simulated": True},
+    "gyro": {"accel": [0.01, 0.0, 1.0], "gyro": [1.5, 0.0, 0.0], "simulated": True},
+    "door": {"open": False, "simulated": True},
+}
+
+
+def make_messages(n: int) -> list[MQTTMessage]:
+    messages = []
+
+    for i in range(n):
+        topic = TOPICS[i % len(TOPICS)]
+        message = MQTTMessage(topic=topic.encode())
+        message.payload = json.dumps(PAYLOADS[topic.rsplit('/', 1)[1]]).encode()
+        messages.append(message)
+
+    return messages
+
+
+def old_dispatch(messages: list[MQTTMessage]) -> int:
+    """paho's matcher (behind ``mqtt.on_topic``), every handler splits the topic and parses the payload."""
+    seen = 0
+    matcher = MQTTMatcher()
+
+    def handler(client, userdata, message: MQTTMessage):
+        nonlocal seen
+        location = message.topic.split('/')[2]
+        data = json.loads(message.payload.decode("utf-8"))
+        seen += bool(location and data)
+
+    for topic_filter in FILTERS:
+        try:
+            matcher[topic_filter].append(handler)
+        except KeyError:
+            matcher[topic_filter] = [handler]
+
+    for message in messages:
+        for handlers in matcher.iter_match(message.topic):
+            for handler_ in handlers:
+                handler_(None, None, message)
+
+    return seen
+
+
+def new_dispatch(messages: list[MQTTMessage]) -> int:
+    seen = 0
+    dispatcher = TopicDispatcher()
+
+    def handler(client, userdata, message, *wildcards):
+        nonlocal seen
+        seen += bool(message.json)
+
+    for topic_filter in FILTERS:
+        dispatcher.on_json_topic(topic_filter)(handler)
+
+    for message in messages:
+        dispatcher.dispatch(None, None, message)
+
+    return seen
+
+
+def measure(name: str, run, messages: list[MQTTMessage]):
+    start = time.process_time()
+    handled = run(messages)
+    elapsed = time.process_time() - start
+    print(f"{name:<24} {elapsed / len(messages) * 1e6:8.2f} µs/msg  {handled / len(messages):.2f} handler calls/msg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=100_000, help="Number of messages.")
+    args = parser.parse_args()
+
+    messages = make_messages(args.n)
+
+    measure("per handler parsing", old_dispatch, messages)
+
+    x_mqtt.set_json_backend("json")
+    measure("dispatcher, json", new_dispatch, messages)
+
+    if x_mqtt.orjson:
+        x_mqtt.set_json_backend("orjson")
+        measure("dispatcher, orjson", new_dispatch, messages)
+
+
+if __name__ == "__main__":
+    main()
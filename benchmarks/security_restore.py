@@ -0,0 +1,62 @@
+"""Cold start of the security state machine, restoring the houses from their SQLite log.
+
+Fills a log with ``--events`` events of ``--houses`` houses (armed ones with an alarm pending), as a
+backend that was busy until it stopped leaves it, then times :meth:`SecurityContexts.start` restoring
+them.
+
+    python benchmarks/security_restore.py [--houses 100] [--events 1000] [-n 20]
+"""
+
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+from justkeeplivin import security
+from justkeeplivin.security import EventLog, SecurityContexts, SecurityEvent, STATES
+
+
+def fill(path: Path, houses: int, events: int):
+    log = EventLog(path)
+    log.load()
+    now = time.time()
+
+    for i in range(max(houses, events)):
+        state = random.choice(list(STATES))
+        deadline = now + 10 if state in ("ArmingState", "ArmedState") else None
+        snapshot = {"state": state, "deadline": deadline, "people_counter": i % 3}
+        log.append(f"h{i % houses:04d}", SecurityEvent(SecurityEvent.MOTION_DETECTED, timestamp=now), snapshot)
+    log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--houses", type=int, default=100)
+    parser.add_argument("--events", type=int, default=1_000, help="In the log, up to SECURITY_COMPACT_EVERY.")
+    parser.add_argument("-n", type=int, default=20, help="Number of restores.")
+    args = parser.parse_args()
+
+    # alarms going off while restoring would go to InfluxDB and MQTT
+    security.write = lambda *_: None
+    security.mqtt.publish = lambda *_: None
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "security.db"
+        fill(path, args.houses, args.events)
+
+        times = []
+        for _ in range(args.n):
+            contexts = SecurityContexts({}, "1234", EventLog(path)).start()
+            times.append(contexts.restore_time * 1e3)
+            for context in contexts: # their timers, the next restore schedules them again
+                if timer := getattr(context.state, "timer", None) or getattr(context.state, "alarm_timer", None):
+                    timer.cancel()
+            contexts.stop()
+
+    times.sort()
+    print(f"{args.houses} houses, {args.events} events: restored in {times[len(times) // 2]:.2f}ms median, {times[0]:.2f}ms min, {times[-1]:.2f}ms max")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Cost of many pending timeouts, ``threading.Timer`` against the shared timer wheel.
+
+Schedules ``-n`` timeouts (like the arming and door approach timers of that many houses), cancels
+most of them as a correct pin would and lets the rest fire.
+
+    python benchmarks/timers.py [-n 2000] [--delay 1]
+"""
+
+import time
+import argparse
+import threading
+
+from justkeeplivin.x.timers import TimerWheel
+
+
+def run(name: str, schedule, n: int, delay: float):
+    fired = 0
+    lock = threading.Lock()
+
+    def callback():
+        nonlocal fired
+        with lock:
+            fired += 1
+
+    start = time.perf_counter()
+    handles = [schedule(delay, callback) for _ in range(n)]
+    scheduled = time.perf_counter() - start
+    threads = threading.active_count()
+
+    start = time.perf_counter()
+    for handle in handles[n // 10:]:
+        handle.cancel()
+    cancelled = time.perf_counter() - start
+
+    time.sleep(delay + .5)
+    print(
+        f"{name:<16} schedule {scheduled / n * 1e6:8.2f} µs  cancel {cancelled / (n - n // 10) * 1e6:6.2f} µs"
+        f"  {threads:5} threads  fired {fired}/{n // 10}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=2_000, help="Number of timeouts.")
+    parser.add_argument("--delay", type=float, default=1, help="Seconds.")
+    args = parser.parse_args()
+
+    def start_timer(delay, callback):
+        timer = threading.Timer(delay, callback)
+        timer.start()
+        return timer
+
+    run("threading.Timer", start_timer, args.n, args.delay)
+
+    wheel = TimerWheel()
+    run("timer wheel", wheel.call_later, args.n, args.delay)
+    wheel.stop()
+
+
+if __name__ == "__main__":
+    main()
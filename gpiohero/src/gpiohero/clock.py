@@ -0,0 +1,151 @@
+__all__ = [
+    "Clock",
+    "VirtualClock",
+    "get_clock",
+    "set_clock",
+]
+
+import time
+from threading import Condition
+from typing import List
+
+
+class Clock:
+    """Wall clock time, what devices run on by default.
+
+    Device programs wait :meth:`real` seconds for every second they yield and simulators read the
+    time with :meth:`now`, so another clock changes how fast they all run.
+    """
+
+    step = False
+    """Whether time only moves when it is :meth:`advance`\\ d, which only a ``Scheduler`` does."""
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def real(self, seconds: float) -> float:
+        """How many wall clock seconds the given ones on this clock take."""
+        return seconds
+
+    def sleep(self, seconds: float):
+        time.sleep(self.real(seconds))
+
+    @property
+    def next_wakeup(self) -> 'float | None':
+        """When the first :meth:`sleep` ends, for stepped clocks."""
+        return None
+
+    def advance_to(self, at: float):
+        raise NotImplementedError(f"{self.__class__.__name__} cannot be advanced")
+
+
+class VirtualClock(Clock):
+    """Simulated time, running ``speed`` times faster than the wall clock from ``start``.
+
+    With ``step`` it does not run at all, the shared scheduler advances it straight to the next
+    deadline instead of waiting for it, so simulators go as fast as they can while still seeing
+    their delays pass (drivers that cannot step, threads and asyncio, do not wait at all). It is
+    not advanced past the end of a :meth:`sleep` before the sleeper wakes up.
+    """
+
+    def __init__(self, speed: float = 1, step: bool = False, start: float = 0):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+
+        self.speed = speed
+        self.step = step
+
+        self._start = start
+        self._origin = time.monotonic()
+        self._changed = Condition()
+        self._sleepers: List[float] = []
+
+    def now(self) -> float:
+        if self.step:
+            return self._start
+
+        with self._changed:
+            return self._start + (time.monotonic() - self._origin) * self.speed
+
+    def real(self, seconds: float) -> float:
+        return 0 if self.step else seconds / self.speed
+
+    def sleep(self, seconds: float):
+        if not self.step:
+            return super().sleep(seconds)
+
+        with self._changed:
+            until = self._start + seconds
+            self._sleepers.append(until)
+            try:
+                while self._start < until:
+                    self._changed.wait()
+            finally:
+                self._sleepers.remove(until)
+                self._changed.notify_all()
+
+    @property
+    def next_wakeup(self) -> 'float | None':
+        with self._changed:
+            return min(self._sleepers, default=None)
+
+    def advance_to(self, at: float):
+        """Moves a stepped clock forward to ``at``, never back, waiting for the sleepers on the way."""
+        with self._changed:
+            while self._sleepers and (wakeup := min(self._sleepers)) < at:
+                self._start = max(self._start, wakeup)
+                self._changed.notify_all()
+                self._changed.wait()
+
+            self._start = max(self._start, at)
+            self._changed.notify_all()
+
+
+_clock = Clock()
+
+def get_clock() -> Clock:
+    return _clock
+
+def set_clock(clock: Clock) -> Clock:
+    """Sets the clock devices run on, returns the previous one. Meant to be set before devices are made."""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+def main():
+    import logging
+    import warnings
+    from collections import Counter
+    logging.basicConfig(level=logging.INFO)
+    warnings.filterwarnings('ignore')
+
+    from gpiohero.clock import set_clock, VirtualClock # NOTE: not this module's, when run as __main__
+    from gpiohero.sim import DHT11, Button, IrReceiver, MatrixKeypad
+
+    clock = VirtualClock(step=True)
+    set_clock(clock)
+
+    events = Counter()
+    def counter(name):
+        def count(*_):
+            events[name] += 1
+        return count
+
+    with (
+        DHT11(sample_interval=60) as dht,
+        Button(1) as button,
+        IrReceiver(2) as ir,
+        MatrixKeypad("1234", "567", ["123", "456", "789", "*0#"]) as keypad,
+    ):
+        dht.when_measure = counter("measurements")
+        button.when_pressed = counter("presses")
+        ir.when_message = counter("ir messages")
+        keypad.when_key = counter("keys")
+
+        started = time.monotonic()
+        clock.sleep(24 * 60 * 60)
+        print(f"A simulated day in {time.monotonic() - started:.2f}s: {dict(events)}")
+
+if __name__ == "__main__":
+    main()
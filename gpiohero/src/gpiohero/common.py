@@ -2,13 +2,14 @@
 import logging
 from threading import Lock
 from typing import Callable
-from gpiozero.threads import GPIOThread
 from contextlib import AbstractContextManager
 
+from gpiohero.drivers import Driven, Program
+
 
 # TODO: Recheck logic, probably has some bugs
 
-class ContdownTimer(AbstractContextManager):
+class ContdownTimer(Driven, AbstractContextManager):
     # when_tick: Callable[[], None] = None
     # when_expired: Callable[[], None] = None
     # when_dismissed: Callable[[], None] = None
@@ -19,6 +20,8 @@ class ContdownTimer(AbstractContextManager):
         self._duration = self._remaining = duration
         self._dismissed = False
         self._lock = Lock()
+        self._run: 'object | None' = None
+        """Token of the running countdown, a stopped one ends at its next tick."""
 
     @property
     def remaining(self):
@@ -28,11 +31,16 @@ class ContdownTimer(AbstractContextManager):
     def expired(self):
         return self.remaining == 0
 
-    def _countdown(self):
+    def _countdown(self, run: object) -> Program:
         was_expired = self.expired
 
-        while not self._countdown_thread.stopping.wait(self._dt):
+        while True:
+            yield self._dt
+
             with self._lock:
+                if self._run is not run:
+                    return
+
                 if self.expired:
                     if not was_expired:
                         was_expired = True
@@ -46,14 +54,10 @@ class ContdownTimer(AbstractContextManager):
                 self._tick()
 
     def start(self):
-        countdown_thread: GPIOThread
-
         with self._lock:
             self._start()
 
     def stop(self):
-        countdown_thread: GPIOThread
-
         with self._lock:
             self._stop()
 
@@ -77,17 +81,11 @@ class ContdownTimer(AbstractContextManager):
         self._remaining = max(0, self._remaining - 1)
 
     def _start(self):
-        if (
-            self.expired
-            or (
-                getattr(self, "_countdown_thread", None)
-                and self._countdown_thread.is_alive()
-            )
-        ):
+        if self.expired or self._run is not None:
                 return
 
-        self._countdown_thread = GPIOThread(self._countdown)
-        self._countdown_thread.start()
+        self._run = object()
+        self._start_program(self._countdown(self._run))
 
     def _dismiss(self):
         self._dismissed = True
@@ -101,18 +99,15 @@ class ContdownTimer(AbstractContextManager):
                 self._remaining += duration
 
     def _stop(self):
-        if (
-            getattr(self, "_countdown_thread", None)
-            and self._countdown_thread.is_alive()
-        ):
-            self._countdown_thread.stop()
-            self._countdown_thread = None
+        # NOTE: Not waiting for the countdown to stop here, its step may be waiting for the lock
+        self._run = None
 
     def _expire(self):
         self._dismissed = False
 
     def close(self):
         self.stop()
+        self._stop_program()
 
     def __exit__(self, exc_type, exc_value, traceback):
         return self.close()
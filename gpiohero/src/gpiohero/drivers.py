@@ -0,0 +1,236 @@
+__all__ = [
+    "Program",
+    "Handle",
+    "Driver",
+    "ThreadDriver",
+    "AsyncioDriver",
+    "get_driver",
+    "set_driver",
+    "Driven",
+]
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Callable, Generator, Protocol, Tuple, Union
+from gpiozero.threads import GPIOThread
+
+from gpiohero.clock import get_clock
+
+_logger = logging.getLogger(__name__)
+
+Program = Generator[float, None, None]
+"""A device's loop, written as a generator that yields how many seconds to wait before it is resumed.
+
+Everything between two ``yield``s is one step, the driver decides whether steps run on a thread of their
+own or on an event loop shared with other devices. Closing the generator (``GeneratorExit`` at the ``yield``
+it waits on) stops the device.
+"""
+
+
+class Handle(Protocol):
+    def stop(self) -> None: ...
+
+
+class Driver:
+    """Runs device programs."""
+
+    def start(self, program: Program, name: str) -> Handle:
+        raise NotImplementedError
+
+
+#region Thread
+
+class _ProgramThread(GPIOThread):
+
+    def __init__(self, program: Program, name: str):
+        super().__init__(self._drive, name=name)
+        self.program = program
+
+    def _drive(self):
+        try:
+            delay = next(self.program)
+            while not self.stopping.wait(get_clock().real(delay)):
+                delay = next(self.program)
+        except StopIteration:
+            pass
+        except Exception:
+            _logger.exception("Program %s failed", self.name)
+        finally:
+            self.program.close()
+
+
+class ThreadDriver(Driver):
+    """Runs every program on its own ``GPIOThread``, the default for real devices."""
+
+    def start(self, program: Program, name: str) -> Handle:
+        thread = _ProgramThread(program, name)
+        thread.start()
+        return thread
+
+#endregion
+
+#region Asyncio
+
+def _running_loop() -> 'asyncio.AbstractEventLoop | None':
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+async def _drive(program: Program, name: str):
+    try:
+        for delay in program:
+            await asyncio.sleep(get_clock().real(delay))
+    except asyncio.CancelledError:
+        pass
+    except Exception:
+        _logger.exception("Program %s failed", name)
+    finally:
+        program.close()
+
+
+class _TaskHandle:
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, task: 'Union[asyncio.Task, Future]'):
+        self._loop = loop
+        self._task = task
+
+    def stop(self):
+        if isinstance(self._task, Future) or _running_loop() is self._loop:
+            self._task.cancel()
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+
+
+class AsyncioDriver(Driver):
+    """Runs programs as tasks of one asyncio loop, so devices take no threads of their own.
+
+    Steps run on the loop along with everything else on it and must not block. Without a ``loop`` the
+    programs go on the loop running when they are started, devices made on other threads need it given.
+    """
+
+    def __init__(self, loop: 'asyncio.AbstractEventLoop | None' = None):
+        self.loop = loop
+
+    def start(self, program: Program, name: str) -> Handle:
+        running = _running_loop()
+        loop = self.loop or running
+        if loop is None:
+            raise RuntimeError("No loop to run the program on, start it from a coroutine or give the driver a loop")
+
+        if running is loop:
+            return _TaskHandle(loop, loop.create_task(_drive(program, name)))
+
+        return _TaskHandle(loop, asyncio.run_coroutine_threadsafe(_drive(program, name), loop))
+
+#endregion
+
+
+_driver: 'Driver | None' = None
+
+def get_driver() -> 'Driver | None':
+    return _driver
+
+def set_driver(driver: 'Driver | None') -> 'Driver | None':
+    """Sets what runs the programs of the devices made from now on, returns the previous driver.
+
+    ``None`` leaves it to the devices, see :attr:`Driven._default_driver`.
+    """
+    global _driver
+    previous, _driver = _driver, driver
+    return previous
+
+
+_CLOSED = object()
+
+class Driven:
+    """Mixin of devices that run a :data:`Program` and emit readings.
+
+    Readings go to the device's ``when_*`` callback and to every :meth:`readings` stream being iterated.
+    """
+
+    _default_driver: Driver = ThreadDriver()
+    """What runs the program when no driver is set."""
+    _EVENT = "when_measure"
+    """The callback readings go to, recorded in traces."""
+    _program_handle: 'Handle | None' = None
+    _listeners: Tuple[Callable[[Any], None], ...] = ()
+
+    def _start_program(self, program: Program, driver: 'Driver | None' = None):
+        driver = driver or get_driver() or self._default_driver
+        self._program_handle = driver.start(program, self.__class__.__name__)
+
+    def _stop_program(self):
+        if self._program_handle:
+            self._program_handle.stop()
+            self._program_handle = None
+
+        for listener in self._listeners:
+            listener(_CLOSED)
+
+    def _emit(self, reading, callback: 'Callable[[Any], Any] | None' = None):
+        if callback:
+            callback(reading)
+
+        for listener in self._listeners:
+            listener(reading)
+
+    async def readings(self, maxsize: int = 0) -> AsyncIterator[Any]:
+        """Yields what the device emits (what its ``when_*`` callback gets) until it is closed.
+
+        Readings emitted on another thread are handed over to the iterating loop, with a ``maxsize``
+        the ones that do not fit in the queue are dropped.
+        """
+        loop = asyncio.get_running_loop()
+        thread = threading.get_ident()
+        queue: 'asyncio.Queue[Any]' = asyncio.Queue(maxsize)
+
+        def put(reading):
+            try:
+                queue.put_nowait(reading)
+            except asyncio.QueueFull:
+                if reading is _CLOSED: # the end makes it in, in place of the oldest reading
+                    queue.get_nowait()
+                    queue.put_nowait(reading)
+
+        def listener(reading):
+            if threading.get_ident() == thread:
+                put(reading)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(put, reading)
+
+        self._listeners = (*self._listeners, listener)
+        try:
+            while (reading := await queue.get()) is not _CLOSED:
+                yield reading
+        finally:
+            self._listeners = tuple(other for other in self._listeners if other is not listener)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    from gpiohero.drivers import set_driver, AsyncioDriver # NOTE: not this module's, when run as __main__
+    from gpiohero.sim import DHT11, IrReceiver
+    from gpiohero.sim.imu import MPU
+
+    async def print_readings(device):
+        async for reading in device.readings():
+            print(f"{device.__class__.__name__}: {reading}")
+
+    async def run():
+        set_driver(AsyncioDriver())
+
+        with DHT11() as dht, MPU() as mpu, IrReceiver() as ir:
+            tasks = [asyncio.create_task(print_readings(device)) for device in (dht, mpu, ir)]
+            await asyncio.sleep(5)
+            print(f"{threading.active_count()} thread(s)")
+
+        await asyncio.gather(*tasks) # the streams end with their devices
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -11,10 +11,10 @@ except ImportError as e:
 from enum import IntEnum
 from itertools import count
 from typing import Callable
-from gpiozero.threads import GPIOThread
+from gpiohero.drivers import Driven, Program
 
 
-class DHT11:
+class DHT11(Driven):
     DHTLIB_OK = 0
     DHTLIB_ERROR_CHECKSUM = -1
     DHTLIB_ERROR_TIMEOUT = -2
@@ -33,17 +33,22 @@ class DHT11:
         self._logger = logging.getLogger(f"{self.__class__.__name__}@GPIO{pin}")
 
         self.sample_interval = sample_interval
-        self._polling_thread = GPIOThread(self._poll)
-        self._polling_thread.start()
+        self._start_program(self._poll())
 
     #Read DHT sensor, store the original data in bits[]
     def readSensor(self,pin,wakeupDelay):
+        self._wakeup(pin)
+        time.sleep(wakeupDelay)
+        return self._receive(pin)
+
+    def _wakeup(self, pin):
+        GPIO.setup(pin,GPIO.OUT)
+        GPIO.output(pin,GPIO.LOW)
+
+    def _receive(self, pin):
         mask = 0x80
         idx = 0
         self._bits = [0,0,0,0,0]
-        GPIO.setup(pin,GPIO.OUT)
-        GPIO.output(pin,GPIO.LOW)
-        time.sleep(wakeupDelay)
         GPIO.output(pin,GPIO.HIGH)
         #time.sleep(40*0.000001)
         GPIO.setup(pin,GPIO.IN)
@@ -83,7 +88,9 @@ class DHT11:
         return self.DHTLIB_OK
     #Read DHT sensor, analyze the data of temperature and humidity
     def readDHT11(self):
-        rv = self.readSensor(self.pin,self.DHTLIB_DHT11_WAKEUP)
+        return self._decode(self.readSensor(self.pin,self.DHTLIB_DHT11_WAKEUP))
+
+    def _decode(self, rv):
         if (rv is not self.DHTLIB_OK):
             self.humidity = self.DHTLIB_INVALID_VALUE
             self.temperature = self.DHTLIB_INVALID_VALUE
@@ -95,27 +102,33 @@ class DHT11:
             return self.DHTLIB_ERROR_CHECKSUM
         return self.DHTLIB_OK
 
-    def _poll(self):
+    def _poll(self) -> Program:
         total = 0
         ok = 0
 
-        while not self._polling_thread.stopping.wait(self.sample_interval):
-            if getattr(self, 'when_measure', None):
+        while True:
+            yield self.sample_interval
+
+            when_measure = getattr(self, 'when_measure', None)
+            if when_measure or self._listeners:
                 total += 1
 
-                chk = self.readDHT11()
+                # NOTE: The wakeup signal is held low for a step of its own, only reading the bits back blocks
+                self._wakeup(self.pin)
+                yield self.DHTLIB_DHT11_WAKEUP
+                chk = self._decode(self._receive(self.pin))
+
                 if chk == self.DHTLIB_OK:
                     ok += 1
-                    self.when_measure({
+                    self._emit({
                         "temperature": self.temperature,
                         "humidity": self.humidity,
-                    })
+                    }, when_measure)
                 else:
                     self._logger.info("Reading error: %s [%d sucessfull readings out of %d, %f accuracy]", chk, ok, total, ok/total * 100)
 
     def close(self):
-        if getattr(self, '_polling_thread', None):
-            self._polling_thread.stop()
+        self._stop_program()
 
         GPIO.cleanup(self.pin)
 
@@ -1,7 +1,7 @@
 from typing import Callable
 
 from .mpu6050 import MPU6050, MPUConstants as C
-from gpiozero.threads import GPIOThread
+from gpiohero.drivers import Driven, Program
 
 
 # class MPUMeasurment(NamedTuple):
@@ -40,7 +40,7 @@ from gpiozero.threads import GPIOThread
 # #         }[self]
 
 
-class MPU:
+class MPU(Driven):
     when_measure: 'Callable[[dict,], None] | None'
 
     def __init__(self, bus: int = 1, address: int = C.MPU6050_DEFAULT_ADDRESS, sample_interval: float = .5):
@@ -48,22 +48,23 @@ class MPU:
         self._mpu.dmp_initialize()
 
         self.sample_interval = sample_interval
-        self._polling_thread = GPIOThread(self._poll)
-        self._polling_thread.start()
+        self._start_program(self._poll())
 
-    def _poll(self):
-        while not self._polling_thread.stopping.wait(self.sample_interval):
-            if getattr(self, 'when_measure', None):
+    def _poll(self) -> Program:
+        while True:
+            yield self.sample_interval
+
+            when_measure = getattr(self, 'when_measure', None)
+            if when_measure or self._listeners:
                 accel, gyro = self._mpu.get_acceleration(), self._mpu.get_rotation()
 
-                self.when_measure(dict(
-                    accel=tuple(a / 131.0 for a in accel),
-                    gyro=tuple(g / 16384.0 for g in gyro),
-                ))
+                self._emit(dict(
+                    accel=tuple(a / 16384.0 for a in accel), # g at ±2g
+                    gyro=tuple(g / 131.0 for g in gyro), # °/s at ±250°/s
+                ), when_measure)
 
     def close(self):
-        if getattr(self, '_polling_thread', None):
-            self._polling_thread.stop()
+        self._stop_program()
 
         # cleanup??
 
@@ -4,14 +4,15 @@ __all__ = [
 
 from gpiozero import CompositeDevice, InputDevice, OutputDevice
 from gpiozero.mixins import event
-from gpiozero.threads import GPIOThread
+from gpiohero.drivers import Driven, Program
 
 import time
 from queue import Queue
 from typing import Sequence, Union, Optional, Callable
 
 
-class MatrixKeypad(CompositeDevice):
+class MatrixKeypad(Driven, CompositeDevice):
+    _EVENT = "when_key"
 
     def __init__(self,
         rows: Sequence[Union[int, str]],
@@ -55,30 +56,28 @@ class MatrixKeypad(CompositeDevice):
 
         self.scan_interval = scan_interval
         self.scan_row_interval = scan_row_interval
-        self._scan_thread = GPIOThread(self._scan_matrix)
-        self._scan_thread.start()
         self.when_key: Optional[Callable[[object,], None]] = None
+        self._start_program(self._scan_matrix())
 
     # when_key = event()
 
-    def _scan_matrix(self):
-        while not self._scan_thread.stopping.wait(self.scan_interval):
+    def _scan_matrix(self) -> Program:
+        while True:
+            yield self.scan_interval
+
             for i, out in enumerate(self._rows):
                 out.on()
-                if self.scan_row_interval > 0 and self._scan_thread.stopping.wait(self.scan_row_interval):
-                    break
+                if self.scan_row_interval > 0:
+                    yield self.scan_row_interval
 
                 for j, in_ in enumerate(self._cols):
-                    if in_.is_active and self.when_key:
-                        key = self.labels[i][j]
-                        self.when_key(key)
+                    if in_.is_active and (self.when_key or self._listeners):
+                        self._emit(self.labels[i][j], self.when_key)
 
-                if not self._scan_thread.stopping.is_set():
-                    out.off()
+                out.off()
 
     def close(self):
-        if getattr(self, '_scan_thread', None):
-            self._scan_thread.stop()
+        self._stop_program()
 
         super().close()
 
@@ -0,0 +1,161 @@
+__all__ = [
+    "Deadband",
+    "ReportFilter",
+]
+
+import time
+import logging
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Mapping, Union
+
+
+@dataclass(frozen=True)
+class Deadband:
+    """Change a numeric field has to exceed to be reported, ``absolute`` units or ``percent`` of the last reported value.
+
+    With both set, exceeding either of them is enough. Changes are measured against the last *reported*
+    value, so a slow drift is still reported once it adds up.
+    """
+    absolute: float = 0
+    percent: float = 0
+
+    def exceeded(self, last: float, value: float) -> bool:
+        change = abs(value - last)
+
+        if not (self.absolute or self.percent):
+            return change != 0
+
+        return (
+            (self.absolute > 0 and change > self.absolute)
+            or (self.percent > 0 and change > abs(last) * self.percent / 100)
+        )
+
+
+Threshold = Union[Deadband, float, None]
+"""Deadband, absolute deadband or ``None`` to never report a field on its own (it still goes out with the others)."""
+
+
+class ReportFilter:
+    """Change-only reporting for ``when_measure`` style callbacks.
+
+    Passes a measurement on to ``callback`` only when a field changed by more than its deadband (any
+    change for fields without a threshold and for non-numeric ones), when a field appeared or went
+    missing, or when nothing has been reported for ``max_silence`` seconds (a heartbeat, so a silent
+    sensor can be told apart from a dead one). Sequence fields (``accel``, ``gyro``) are compared per
+    component. The first measurement is always reported::
+
+        dht.when_measure = ReportFilter(dht_measured, {"temperature": .2, "humidity": Deadband(percent=2)})
+    """
+
+    def __init__(
+        self,
+        callback: 'Callable[[dict], Any] | None' = None,
+        thresholds: 'Mapping[str, Threshold] | None' = None,
+        default: Threshold = Deadband(),
+        max_silence: 'float | None' = 60,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.callback = callback
+        self.default = self._deadband(default)
+        self.thresholds = {key: self._deadband(threshold) for key, threshold in (thresholds or {}).items()}
+        self.max_silence = max_silence
+        self.clock = clock
+
+        self.reported = self.suppressed = 0
+        self._last: 'dict | None' = None
+        self._last_time = 0.
+        self._lock = Lock()
+        self._logger = logging.getLogger(f"{self.__class__.__name__}#{getattr(callback, '__name__', id(self))}")
+
+    @staticmethod
+    def _deadband(threshold: Threshold) -> 'Deadband | None':
+        if threshold is None or isinstance(threshold, Deadband):
+            return threshold
+        return Deadband(absolute=threshold)
+
+    def __call__(self, measurement: dict) -> bool:
+        """Reports the measurement if it should be, returns whether it was."""
+        if not self.should_report(measurement):
+            return False
+
+        if self.callback:
+            self.callback(measurement)
+        return True
+
+    def should_report(self, measurement: dict) -> bool:
+        """Decides and, if reporting, records the measurement as the last reported one."""
+        now = self.clock()
+
+        with self._lock:
+            last = self._last
+
+            if (
+                last is None
+                or (self.max_silence is not None and now - self._last_time >= self.max_silence)
+                or self._changed(last, measurement)
+            ):
+                self._last, self._last_time = dict(measurement), now
+                self.reported += 1
+                return True
+
+            self.suppressed += 1
+
+        self._logger.debug("Suppressed %s", measurement)
+        return False
+
+    def reset(self):
+        """Forgets the last report, so the next measurement goes out."""
+        with self._lock:
+            self._last = None
+
+    def _changed(self, last: dict, measurement: dict) -> bool:
+        if last.keys() != measurement.keys():
+            return True
+
+        for key, value in measurement.items():
+            deadband = self.thresholds.get(key, self.default)
+            if deadband is not None and self._exceeded(deadband, last[key], value):
+                return True
+
+        return False
+
+    @classmethod
+    def _exceeded(cls, deadband: Deadband, last: Any, value: Any) -> bool:
+        if isinstance(value, (list, tuple)):
+            return (
+                not isinstance(last, (list, tuple))
+                or len(last) != len(value)
+                or any(cls._exceeded(deadband, old, new) for old, new in zip(last, value))
+            )
+
+        if (
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            and isinstance(last, (int, float)) and not isinstance(last, bool)
+        ):
+            return deadband.exceeded(last, value)
+
+        return value != last
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "reported": self.reported,
+            "suppressed": self.suppressed,
+        }
+
+
+def main():
+    from .sim.dht import DHT11
+    logging.basicConfig(level=logging.DEBUG)
+
+    report = ReportFilter(print, {"temperature": .5, "humidity": Deadband(percent=2)}, max_silence=10)
+
+    with DHT11(sample_interval=.2) as dht:
+        dht.when_measure = report
+        time.sleep(20)
+
+    print(report.stats)
+
+if __name__ == "__main__":
+    main()
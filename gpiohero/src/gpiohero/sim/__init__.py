@@ -1,3 +1,4 @@
+from .wheel import *
 from .zero import *
 from .matrix import *
 from .ir import *
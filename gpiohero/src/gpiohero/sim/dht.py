@@ -5,9 +5,10 @@ __all__ = [
 import logging
 import random
 from typing import Callable
-from gpiozero.threads import GPIOThread
+from gpiohero.drivers import Program
+from gpiohero.sim.wheel import Simulated
 
-class DHT11:
+class DHT11(Simulated):
     SIM_INITIAL_TEMP = 20
     SIM_TEMP_FLUX = .5
     SIM_INITAL_HUM = 60
@@ -19,32 +20,34 @@ class DHT11:
         self._logger = logging.getLogger(f"{self.__class__.__name__}@GPIO{pin}")
 
         self.sample_interval = sample_interval
-        self._simulator_thread = GPIOThread(self._simulator)
-        self._simulator_thread.start()
+        self._start_program(self._simulator())
 
-    def _simulator(self):
+    def _simulator(self) -> Program:
         self._logger.debug("Starting simulation")
 
         temperature = self.SIM_INITIAL_TEMP
         humidity = self.SIM_INITAL_HUM
 
-        while not self._simulator_thread.stopping.wait(self.sample_interval):
-            if getattr(self, 'when_measure', None):
-                temperature = max(-273.15, temperature + random.uniform(-self.SIM_TEMP_FLUX, self.SIM_TEMP_FLUX))
-                humidity = min(100, max(0, humidity + random.uniform(-self.SIM_HUM_FLUX, self.SIM_HUM_FLUX)))
+        try:
+            while True:
+                yield self.sample_interval
 
-                self._logger.debug("Temperature: %.2f℃ Humidity: %.2f%%", temperature, humidity)
-                self.when_measure({
-                    "temperature": temperature,
-                    "humidity": humidity,
-                })
+                when_measure = getattr(self, 'when_measure', None)
+                if when_measure or self._listeners:
+                    temperature = max(-273.15, temperature + random.uniform(-self.SIM_TEMP_FLUX, self.SIM_TEMP_FLUX))
+                    humidity = min(100, max(0, humidity + random.uniform(-self.SIM_HUM_FLUX, self.SIM_HUM_FLUX)))
 
-        self._logger.debug("Simulation stopped")
+                    self._logger.debug("Temperature: %.2f℃ Humidity: %.2f%%", temperature, humidity)
+                    self._emit({
+                        "temperature": temperature,
+                        "humidity": humidity,
+                    }, when_measure)
+        finally:
+            self._logger.debug("Simulation stopped")
 
 
     def close(self):
-        if getattr(self, '_simulator_thread', None):
-            self._simulator_thread.stop()
+        self._stop_program()
 
     def __enter__(self):
         return self
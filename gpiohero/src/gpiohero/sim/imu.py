@@ -6,14 +6,16 @@ import time
 import logging
 from typing import Callable
 from math import sin, cos, pi
-from gpiozero.threads import GPIOThread
+from gpiohero.clock import get_clock
+from gpiohero.drivers import Program
+from gpiohero.sim.wheel import Simulated
 
 
-class MPU:
+class MPU(Simulated):
     SIM_MOVEMENT_SCALE = 1.0        # Base movement amplitude
     SIM_FREQ = 0.5            # Hz (oscillation frequency)
     SIM_GYRO_SCALE = 50.0     # deg/s multiplier
-    SIM_GRAVITY = 9.81                # m/s²
+    SIM_GRAVITY = 1.0               # g, like the MPU reports it
 
     when_measure: 'Callable[[dict,], None] | None'
 
@@ -21,39 +23,42 @@ class MPU:
         self._logger = logging.getLogger(f"{self.__class__.__name__}@(bus={bus}, addr={address})")
 
         self.sample_interval = sample_interval
-        self._simulator_thread = GPIOThread(self._simulator)
-        self._simulator_thread.start()
+        self._start_program(self._simulator())
 
-    def _simulator(self): # thanks to chat.openai.com
+    def _simulator(self) -> Program: # thanks to chat.openai.com
         self._logger.debug("Starting simulation")
-        init_t = time.perf_counter()
+        clock = get_clock()
+        init_t = clock.now()
 
-        while not self._simulator_thread.stopping.wait(self.sample_interval):
-            if getattr(self, 'when_measure', None):
-                t = time.perf_counter() - init_t
+        try:
+            while True:
+                yield self.sample_interval
 
-                angle = sin(2 * pi * self.SIM_FREQ * t)
-                angular_velocity = (
-                    2 * pi * self.SIM_FREQ
-                    * cos(2 * pi * self.SIM_FREQ * t)
-                    * 180 / pi
-                )
+                when_measure = getattr(self, 'when_measure', None)
+                if when_measure or self._listeners:
+                    t = clock.now() - init_t
 
-                accel = self.SIM_MOVEMENT_SCALE * angle * self.SIM_GRAVITY, 0, self.SIM_GRAVITY
-                gyro = self.SIM_MOVEMENT_SCALE * angular_velocity * self.SIM_GYRO_SCALE, 0, 0
+                    angle = sin(2 * pi * self.SIM_FREQ * t)
+                    angular_velocity = (
+                        2 * pi * self.SIM_FREQ
+                        * cos(2 * pi * self.SIM_FREQ * t)
+                        * 180 / pi
+                    )
 
-                self._logger.debug("Accel: %s [g] Gyro: %s [deg/s]", accel, gyro)
-                self.when_measure({
-                    "accel": accel,
-                    "gyro": gyro,
-                })
+                    accel = self.SIM_MOVEMENT_SCALE * angle * self.SIM_GRAVITY, 0, self.SIM_GRAVITY
+                    gyro = self.SIM_MOVEMENT_SCALE * angular_velocity * self.SIM_GYRO_SCALE, 0, 0
 
-        self._logger.debug("Simulation stopped")
+                    self._logger.debug("Accel: %s [g] Gyro: %s [deg/s]", accel, gyro)
+                    self._emit({
+                        "accel": accel,
+                        "gyro": gyro,
+                    }, when_measure)
+        finally:
+            self._logger.debug("Simulation stopped")
 
 
     def close(self):
-        if getattr(self, '_simulator_thread', None):
-            self._simulator_thread.stop()
+        self._stop_program()
 
     def __enter__(self):
         return self
@@ -7,11 +7,13 @@ from itertools import cycle
 from typing import Callable, Iterable
 
 from gpiohero.legit.ir import IrMessage
-from gpiozero.threads import GPIOThread
+from gpiohero.drivers import Program
+from gpiohero.sim.wheel import Simulated
 
 import logging
 
-class IrReceiver:
+class IrReceiver(Simulated):
+    _EVENT = "when_message"
     SIM_PRESS_DELAY: float = 1
     SIM_PAUSE_DELAY: float = 10
     SIM_INITIAL_DELAY: float = .0001
@@ -22,34 +24,29 @@ class IrReceiver:
         self.when_message: 'Callable[[IrMessage,], None] | None' = None
 
         self._logger = logging.getLogger(f"{self.__class__.__name__}@GPIO{self.pin}")
-        self._simulator_thread = GPIOThread(self._simulator)
-        self._simulator_thread.start()
+        self._start_program(self._simulator())
 
-    def _simulator(self):
+    def _simulator(self) -> Program:
         self._logger.debug("Starting simulation")
         messages = self.SIM_MESSAGES or cycle(IrMessage)
 
-        if self._simulator_thread.stopping.wait(self.SIM_INITIAL_DELAY):
-            messages = []
+        try:
+            yield self.SIM_INITIAL_DELAY
 
-        for message in messages:
-            if message is None:
-                if self._simulator_thread.stopping.wait(self.SIM_PAUSE_DELAY):
-                    break
-                continue
+            for message in messages:
+                if message is None:
+                    yield self.SIM_PAUSE_DELAY
+                    continue
 
-            self._logger.debug("Received message: %s", message.name)
-            if getattr(self, 'when_message', None):
-                self.when_message(message)
+                self._logger.debug("Received message: %s", message.name)
+                self._emit(message, getattr(self, 'when_message', None))
 
-            if self._simulator_thread.stopping.wait(self.SIM_PRESS_DELAY):
-                break
-
-        self._logger.debug("Simulation stopped")
+                yield self.SIM_PRESS_DELAY
+        finally:
+            self._logger.debug("Simulation stopped")
 
     def close(self):
-        if getattr(self, '_simulator_thread', None):
-            self._simulator_thread.stop()
+        self._stop_program()
 
     def __enter__(self):
         return self
@@ -4,6 +4,8 @@ __all__ = [
 
 from gpiozero.pins.mock import MockFactory
 from gpiohero.legit import MatrixKeypad as _HeroMatrixKeypad
+from gpiohero.drivers import Program
+from gpiohero.sim.wheel import Simulated
 
 import logging
 import random
@@ -15,7 +17,7 @@ _mock_factory = MockFactory()
 
 
 
-class MatrixKeypad(_HeroMatrixKeypad):
+class MatrixKeypad(Simulated, _HeroMatrixKeypad):
     SIM_TYPE_DELAY: float = .7
     SIM_PAUSE_DELAY: float = 20
     SIM_INITIAL_DELAY: float = 2
@@ -36,11 +38,11 @@ class MatrixKeypad(_HeroMatrixKeypad):
         super().__init__(rows, cols, labels, scan_interval, scan_row_interval, pull_up, _mock_factory)
 
 
-    def _scan_matrix(self):
-        self._simulator()
+    def _scan_matrix(self) -> Program:
+        return self._simulator()
 
 
-    def _simulator(self):
+    def _simulator(self) -> Program:
         self._logger.debug("Starting simulation")
 
         if self.SIM_KEYS:
@@ -56,23 +58,20 @@ class MatrixKeypad(_HeroMatrixKeypad):
 
             keys = cycle_labels()
 
-        if self._scan_thread.stopping.wait(self.SIM_INITIAL_DELAY):
-            keys = []
+        try:
+            yield self.SIM_INITIAL_DELAY
 
-        for key_ in keys:
-            if key_ is None:
-                if self._scan_thread.stopping.wait(self.SIM_PAUSE_DELAY):
-                    break
-                continue
+            for key_ in keys:
+                if key_ is None:
+                    yield self.SIM_PAUSE_DELAY
+                    continue
 
-            self._logger.debug("Key pressed: '%s'", key_)
-            if getattr(self, 'when_key', None):
-                self.when_key(key_) # type: ignore
+                self._logger.debug("Key pressed: '%s'", key_)
+                self._emit(key_, getattr(self, 'when_key', None))
 
-            if self._scan_thread.stopping.wait(self.SIM_TYPE_DELAY):
-                break
-
-        self._logger.debug("Simulation stopped")
+                yield self.SIM_TYPE_DELAY
+        finally:
+            self._logger.debug("Simulation stopped")
 
 
 def main():
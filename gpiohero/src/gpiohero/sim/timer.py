@@ -1,9 +1,10 @@
 import logging
 from typing import Iterable
 from gpiohero.common import ContdownTimer
+from gpiohero.sim.wheel import Simulated
 
 
-class Timer(ContdownTimer):
+class Timer(Simulated, ContdownTimer):
 
     def __init__(self, segments: Iterable[int], digits: Iterable[int], duration = 10, tick = 1):
         super().__init__(duration, tick)
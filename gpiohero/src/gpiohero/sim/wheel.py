@@ -0,0 +1,250 @@
+__all__ = [
+    "Scheduler",
+    "Simulated",
+    "scheduler",
+]
+
+import math
+import time
+import logging
+import threading
+from itertools import count
+from typing import List, Optional
+from gpiozero.threads import GPIOThread
+
+from gpiohero.clock import Clock, get_clock
+from gpiohero.drivers import Driven, Driver, Program
+
+_logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("scheduler", "program", "name", "seq", "deadline", "tick", "stopped", "closed")
+
+    def __init__(self, scheduler: 'Scheduler', program: Program, name: str, seq: int, deadline: float):
+        self.scheduler = scheduler
+        self.program = program
+        self.name = name
+        self.seq = seq
+        self.deadline = deadline
+        self.tick = 0
+        self.stopped = False
+        self.closed = threading.Event()
+
+    def stop(self):
+        self.scheduler._stop(self)
+
+
+class Scheduler(Driver):
+    """Timer wheel that runs the programs of any number of simulated devices on one thread.
+
+    Deadlines are rounded up to ``tick`` seconds and hashed into ``slots`` buckets by their tick, so
+    scheduling and stopping a program are O(1) and every tick only looks at its own bucket. Programs
+    due on the same tick run in the order of their deadlines, then of their registration, and the next
+    deadline is counted from the previous one rather than from when the step ran, so the same
+    simulators always step in the same order.
+
+    Time is that of ``clock``, the one set with ``set_clock`` by default. A stepped ``VirtualClock``
+    is advanced straight to the next deadline, a whole day of the house goes by in seconds.
+    """
+
+    def __init__(self, tick: float = .01, slots: int = 512, clock: 'Clock | None' = None):
+        self.tick = tick
+        self._clock = clock
+
+        self._slots: List[List[_Entry]] = [[] for _ in range(slots)]
+        self._current = 0
+        """The next tick to run, counted from ``_origin``."""
+        self._origin = 0.
+        self._seq = count()
+        self._stopped: List[_Entry] = []
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[GPIOThread] = None
+
+        self.programs = self.steps = 0
+        self.max_lag = 0.
+
+    @property
+    def clock(self) -> Clock:
+        return self._clock or get_clock()
+
+    def start(self, program: Program, name: str) -> _Entry:
+        with self._lock:
+            if not self.programs: # (re)started on the current clock
+                self._origin = self.clock.now()
+                self._current = 0
+                for bucket in self._slots:
+                    bucket.clear()
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = GPIOThread(self._run, name=self.__class__.__name__)
+                self._thread.start()
+
+            entry = _Entry(self, program, name, next(self._seq), self.clock.now())
+            self._insert(entry)
+            self.programs += 1
+
+        self._wakeup.set()
+        return entry
+
+    def _insert(self, entry: _Entry):
+        # NOTE: Called with the lock held, the tick being run was already taken out of its bucket
+        entry.tick = max(self._current, math.ceil((entry.deadline - self._origin) / self.tick))
+        self._slots[entry.tick % len(self._slots)].append(entry)
+
+    def _stop(self, entry: _Entry):
+        with self._lock:
+            if entry.stopped:
+                return
+            entry.stopped = True
+            self._stopped.append(entry)
+
+        self._wakeup.set()
+
+        if self._thread is None or not self._thread.is_alive(): # already shut down, at exit
+            self._close(entry)
+        elif threading.current_thread() is not self._thread:
+            entry.closed.wait(10) # like joining a device thread, its last step is done once this returns
+
+    def _close(self, entry: _Entry):
+        if entry.closed.is_set():
+            return
+
+        try:
+            entry.program.close()
+        except Exception:
+            _logger.exception("Closing program %s failed", entry.name)
+        finally:
+            with self._lock:
+                self.programs -= 1
+            entry.closed.set()
+
+    def _step(self, entry: _Entry, now: float):
+        if entry.stopped:
+            return
+
+        self.max_lag = max(self.max_lag, now - entry.deadline)
+
+        try:
+            delay = next(entry.program)
+        except StopIteration:
+            return self._close(entry)
+        except Exception:
+            _logger.exception("Program %s failed", entry.name)
+            return self._close(entry)
+
+        self.steps += 1
+
+        with self._lock:
+            if not entry.stopped: # not stopped by the step itself
+                entry.deadline += delay
+                self._insert(entry)
+
+    def _run(self):
+        assert self._thread
+        stopping = self._thread.stopping
+
+        while not stopping.is_set():
+            self._close_stopped()
+
+            clock = self.clock
+            with self._lock:
+                idle = not self.programs or clock.step and not self._skip_to_next()
+                due_at = self._origin + self._current * self.tick
+
+            if clock.step and not idle:
+                clock.advance_to(due_at)
+            elif clock.step and (wakeup := clock.next_wakeup) is not None:
+                clock.advance_to(wakeup) # nothing to simulate until then
+
+            now = clock.now()
+            if idle or now < due_at:
+                self._wakeup.wait(clock.real(due_at - now) if not idle else .01 if clock.step else 1)
+                self._wakeup.clear()
+                continue
+
+            with self._lock:
+                bucket = self._slots[self._current % len(self._slots)]
+                due = [entry for entry in bucket if entry.tick <= self._current]
+                if due:
+                    bucket[:] = [entry for entry in bucket if entry.tick > self._current]
+                self._current += 1
+
+            due.sort(key=lambda entry: (entry.deadline, entry.seq))
+            for entry in due:
+                self._step(entry, now)
+
+        self._close_stopped()
+
+    def _skip_to_next(self) -> bool:
+        # NOTE: Called with the lock held, a stepped clock has no time to wait out between deadlines
+        if any(entry.tick <= self._current for entry in self._slots[self._current % len(self._slots)]):
+            ticks = [self._current]
+        else:
+            ticks = [entry.tick for bucket in self._slots for entry in bucket if not entry.stopped]
+        if not ticks:
+            return False
+
+        self._current = max(self._current, min(ticks))
+        return True
+
+    def _close_stopped(self):
+        with self._lock:
+            stopped, self._stopped = self._stopped, []
+
+        for entry in stopped:
+            self._close(entry)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "programs": self.programs,
+            "steps": self.steps,
+            "max_lag": self.max_lag,
+        }
+
+
+scheduler = Scheduler()
+"""Shared by all simulators."""
+
+
+class Simulated(Driven):
+    """Mixin of simulators, which run on the shared :data:`scheduler` unless a driver is set."""
+
+    _default_driver: Driver = scheduler
+
+
+def main():
+    import warnings
+    logging.basicConfig(level=logging.INFO)
+    warnings.filterwarnings('ignore')
+
+    from gpiohero.sim import DHT11, scheduler # NOTE: not this module's, when run as __main__
+    from gpiohero.sim.imu import MPU
+
+    readings = 0
+    def count_reading(_):
+        nonlocal readings
+        readings += 1
+
+    # a 50 room house, a few sensors per room
+    devices = []
+    for room in range(50):
+        for _ in range(4):
+            devices.append(DHT11(sample_interval=.1))
+        for _ in range(4):
+            devices.append(MPU(sample_interval=.05))
+
+    for device in devices:
+        device.when_measure = count_reading
+
+    time.sleep(10)
+    for device in devices:
+        device.close()
+
+    print(f"{len(devices)} devices, {readings} readings, {threading.active_count()} thread(s), {scheduler.stats}")
+
+if __name__ == "__main__":
+    main()
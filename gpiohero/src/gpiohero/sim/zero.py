@@ -21,14 +21,18 @@ from gpiozero import (
     LEDMultiCharDisplay as _ZeroLEDMultiCharDisplay,
     Device,
 )
-from gpiozero.threads import GPIOThread
 from gpiozero.pins.mock import MockFactory as _MockFactory
+from gpiohero.drivers import Program
+from gpiohero.sim.wheel import Simulated
 
 _mock_factory = _MockFactory()
 
 #region Sensors
 
-class Button(_ZeroButton):
+class Button(Simulated, _ZeroButton):
+    """Simulated button, its :meth:`readings` are whether it is pressed, on every change."""
+    _EVENT = "when_pressed"
+
     SIM_PRESS_TIME_RANGE: tuple[float, float] = 2, 10
     SIM_HOLD_DURATION_RANGE: tuple[float, float] = .5, 2
     SIM_MSG_PRESSED: str = "Pressed"
@@ -36,39 +40,37 @@ class Button(_ZeroButton):
 
     def __init__(self, pin=None, *, pull_up=True, active_state=None, bounce_time=None, hold_time=1, hold_repeat=False, pin_factory=None):
         self._logger = logging.getLogger(f"{self.__class__.__name__}@{pin}")
-        super().__init__(pin, pull_up=pull_up, active_state=active_state, bounce_time=bounce_time, hold_time=hold_time, hold_repeat=hold_repeat, pin_factory=_mock_factory)
-
+        super().__init__(pin, pull_up=pull_up, active_state=active_state, bounce_time=bounce_time, hold_time=hold_time, hold_repeat=hold_repeat, pin_factory=pin_factory or _mock_factory)
 
-        self._simulation_thread = GPIOThread(self._simulator)
-        self._simulation_thread.start()
+        self._start_program(self._simulator())
 
     def _fire_activated(self):
         self._logger.debug(self.SIM_MSG_PRESSED)
+        self._emit(True)
         return super()._fire_activated()
 
     def _fire_deactivated(self):
         self._logger.debug(self.SIM_MSG_RELEASED)
+        self._emit(False)
         return super()._fire_deactivated()
 
-    def _simulator(self):
+    def _simulator(self) -> Program:
         self._logger.debug("Starting simulation")
         pin = self.pin
-        press, release = (pin.drive_high, pin.drive_low) if self.pull_up else (pin.drive_low, pin.drive_high) # type: ignore
-
-        while not self._simulation_thread.stopping.wait(random.uniform(*self.SIM_PRESS_TIME_RANGE)):
-            press()
-
-            hold_for = random.uniform(*self.SIM_HOLD_DURATION_RANGE)
-            if self._simulation_thread.stopping.wait(hold_for):
-                break
+        press, release = (pin.drive_low, pin.drive_high) if self.pull_up else (pin.drive_high, pin.drive_low) # type: ignore
 
-            release()
+        try:
+            while True:
+                yield random.uniform(*self.SIM_PRESS_TIME_RANGE)
+                press()
 
-        self._logger.debug("Simulation stopped")
+                yield random.uniform(*self.SIM_HOLD_DURATION_RANGE)
+                release()
+        finally:
+            self._logger.debug("Simulation stopped")
 
     def close(self):
-        if getattr(self, '_simulation_thread', None):
-            self._simulation_thread.stop()
+        self._stop_program()
 
         super().close()
 
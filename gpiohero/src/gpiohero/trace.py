@@ -0,0 +1,376 @@
+__all__ = [
+    "TraceWriter",
+    "read_trace",
+    "Replay",
+]
+
+import enum
+import inspect
+import logging
+import struct
+from importlib import import_module
+from threading import Lock
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Tuple
+
+from gpiohero.clock import get_clock
+from gpiohero.drivers import Driven, Program, _CLOSED
+from gpiohero.sim.wheel import Simulated
+
+_logger = logging.getLogger(__name__)
+
+MAGIC = b"GHT1"
+
+# Records are <time since the previous one, in µs><source><payload>, all varints but the payload,
+# a source index one past the known ones is followed by its name and event (the callback it went to).
+# Payloads are tagged values, strings (dict keys, ...) are written once and then referred to by index.
+_NONE, _TRUE, _FALSE, _INT, _NEG, _FLOAT, _STR, _STR_REF, _LIST, _TUPLE, _DICT, _ENUM = b"NTFinfsrltde"
+_DOUBLE = struct.Struct("<d")
+
+# (time, source, event, payload)
+TraceEvent = Tuple[float, str, str, Any]
+
+
+def _write_varint(buf: bytearray, n: int):
+    while n > 0x7F:
+        buf.append(n & 0x7F | 0x80)
+        n >>= 7
+    buf.append(n)
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+class _Encoder:
+
+    def __init__(self):
+        self._strings: Dict[str, int] = {}
+
+    def encode(self, buf: bytearray, value: Any):
+        # NOTE: bool and enums before int, they are ints too
+        if value is None:
+            buf.append(_NONE)
+        elif value is True:
+            buf.append(_TRUE)
+        elif value is False:
+            buf.append(_FALSE)
+        elif isinstance(value, enum.Enum):
+            buf.append(_ENUM)
+            self._string(buf, f"{type(value).__module__}:{type(value).__qualname__}")
+            self.encode(buf, value.value)
+        elif isinstance(value, int):
+            buf.append(_INT if value >= 0 else _NEG)
+            _write_varint(buf, abs(value))
+        elif isinstance(value, float):
+            buf.append(_FLOAT)
+            buf += _DOUBLE.pack(value)
+        elif isinstance(value, str):
+            self._string(buf, value)
+        elif isinstance(value, (list, tuple)):
+            buf.append(_LIST if isinstance(value, list) else _TUPLE)
+            _write_varint(buf, len(value))
+            for item in value:
+                self.encode(buf, item)
+        elif isinstance(value, dict):
+            buf.append(_DICT)
+            _write_varint(buf, len(value))
+            for key, item in value.items():
+                self._string(buf, str(key))
+                self.encode(buf, item)
+        else:
+            raise TypeError(f"Cannot trace {type(value).__name__} values")
+
+    def forget(self, count: int):
+        """Forgets the strings after the first ``count``, which were not written after all."""
+        for value in list(self._strings)[count:]:
+            del self._strings[value]
+
+    def _string(self, buf: bytearray, value: str):
+        if (index := self._strings.get(value)) is not None:
+            buf.append(_STR_REF)
+            _write_varint(buf, index)
+            return
+
+        self._strings[value] = len(self._strings)
+        data = value.encode()
+        buf.append(_STR)
+        _write_varint(buf, len(data))
+        buf += data
+
+
+class _Decoder:
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+        self._strings: List[str] = []
+        self._enums: Dict[str, Any] = {}
+
+    def varint(self) -> int:
+        n, self.pos = _read_varint(self.data, self.pos)
+        return n
+
+    def decode(self) -> Any:
+        tag = self.data[self.pos]
+        self.pos += 1
+
+        if tag == _NONE:
+            return None
+        if tag == _TRUE:
+            return True
+        if tag == _FALSE:
+            return False
+        if tag == _INT:
+            return self.varint()
+        if tag == _NEG:
+            return -self.varint()
+        if tag == _FLOAT:
+            value, = _DOUBLE.unpack_from(self.data, self.pos)
+            self.pos += _DOUBLE.size
+            return value
+        if tag == _STR:
+            length = self.varint()
+            value = self.data[self.pos:self.pos + length].decode()
+            self.pos += length
+            self._strings.append(value)
+            return value
+        if tag == _STR_REF:
+            return self._strings[self.varint()]
+        if tag in (_LIST, _TUPLE):
+            items = [self.decode() for _ in range(self.varint())]
+            return items if tag == _LIST else tuple(items)
+        if tag == _DICT:
+            return {self.decode(): self.decode() for _ in range(self.varint())}
+        if tag == _ENUM:
+            type_ = self.decode()
+            value = self.decode()
+            return self._enum(type_)(value)
+
+        raise ValueError(f"Corrupt trace, unknown tag {tag!r} at {self.pos - 1}")
+
+    def _enum(self, path: str):
+        if (type_ := self._enums.get(path)) is None:
+            module, _, name = path.partition(":")
+            type_ = import_module(module)
+            for part in name.split("."):
+                type_ = getattr(type_, part)
+            self._enums[path] = type_
+        return type_
+
+
+class TraceWriter:
+    """Writes the readings of devices to a compact binary trace, for :class:`Replay` to play back.
+
+    >>> with TraceWriter("house.trace") as trace:
+    ...     trace.record(dht, "kitchen_dht")
+
+    Times are those of the device clock, so traces of virtual time simulations are virtual too.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(MAGIC)
+
+        self._encoder = _Encoder()
+        self._sources: Dict[Tuple[str, str], int] = {}
+        self._last: 'float | None' = None
+        self._lock = Lock()
+        self.events = 0
+
+    def write(self, source: str, event: str, payload: Any, at: 'float | None' = None):
+        """Writes a reading of ``source`` that went to its ``event`` callback. Safe to call from any thread."""
+        at = get_clock().now() if at is None else at
+        buf = bytearray()
+
+        with self._lock:
+            if self._file.closed:
+                return
+
+            last = at if self._last is None else self._last
+            _write_varint(buf, max(0, round((at - last) * 1e6)))
+
+            strings = len(self._encoder._strings)
+            try:
+                if (index := self._sources.get((source, event))) is not None:
+                    _write_varint(buf, index)
+                else:
+                    _write_varint(buf, len(self._sources))
+                    self._encoder.encode(buf, source)
+                    self._encoder.encode(buf, event)
+
+                self._encoder.encode(buf, payload)
+            except TypeError:
+                self._encoder.forget(strings)
+                raise
+
+            self._sources.setdefault((source, event), len(self._sources))
+            self._last = max(at, last)
+            self._file.write(buf)
+            self.events += 1
+
+    def record(self, device: Driven, name: 'str | None' = None) -> Callable[[], None]:
+        """Writes everything ``device`` emits from now on, returns a function that stops the recording."""
+        name = name or getattr(getattr(device, '_logger', None), 'name', None) or device.__class__.__name__
+        event = device._EVENT
+
+        def listener(reading):
+            if reading is not _CLOSED: # the device was closed
+                self.write(name, event, reading)
+
+        device._listeners = (*device._listeners, listener)
+
+        def stop():
+            device._listeners = tuple(other for other in device._listeners if other is not listener)
+
+        return stop
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> 'TraceWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_trace(path: str) -> Iterator[TraceEvent]:
+    """Yields the ``(time, source, event, payload)`` of every reading in a trace, time counted from the first."""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a trace")
+
+    decoder = _Decoder(data)
+    decoder.pos = len(MAGIC)
+    sources: List[Tuple[str, str]] = []
+    at = 0.
+
+    while decoder.pos < len(data):
+        try:
+            at += decoder.varint() / 1e6
+            index = decoder.varint()
+            if index == len(sources):
+                sources.append((decoder.decode(), decoder.decode()))
+            source, event = sources[index]
+            payload = decoder.decode()
+        except (IndexError, struct.error): # cut short, the recording was not closed
+            _logger.warning("Trace %s ends with an incomplete reading", path)
+            return
+
+        yield at, source, event, payload
+
+
+class Replay(Simulated):
+    """Plays a trace back through the callbacks its readings originally went to.
+
+    With a ``source`` only its readings are played, so a replay can stand in for one recorded device,
+    ``speed`` times as fast as they were recorded (which adds up with a faster ``VirtualClock``).
+    Button readings (whether it is pressed) go to ``when_pressed``/``when_released``.
+    """
+
+    def __init__(self, path: str, source: 'str | None' = None, speed: float = 1, repeat: bool = False):
+        self.path = path
+        self.source = source
+        self.speed = speed
+        self.repeat = repeat
+
+        self.when_measure: 'Callable[[dict,], None] | None' = None
+        self.when_key: 'Callable[[object,], None] | None' = None
+        self.when_message: 'Callable[[Any,], None] | None' = None
+        self.when_pressed: 'Callable | None' = None
+        self.when_released: 'Callable | None' = None
+        self.is_pressed = False
+
+        self._logger = logging.getLogger(f"{self.__class__.__name__}@{source or path}")
+        self._start_program(self._player())
+
+    def _player(self) -> Program:
+        self._logger.debug("Starting replay")
+
+        try:
+            while True:
+                previous = 0.
+                for at, source, event, payload in read_trace(self.path):
+                    if self.source is not None and source != self.source:
+                        continue
+
+                    yield (at - previous) / self.speed
+                    previous = at
+                    self._play(event, payload)
+
+                if not self.repeat:
+                    break
+        finally:
+            self._logger.debug("Replay stopped")
+
+    def _play(self, event: str, payload: Any):
+        if event != "when_pressed":
+            return self._emit(payload, getattr(self, event, None))
+
+        self.is_pressed = bool(payload)
+        self._emit(payload)
+
+        if callback := self.when_pressed if payload else self.when_released:
+            # NOTE: like gpiozero, callbacks that take an argument get the device
+            try:
+                inspect.signature(callback).bind(self)
+            except TypeError:
+                callback()
+            else:
+                callback(self)
+
+    def close(self):
+        self._stop_program()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def main():
+    import os
+    import time
+    import json
+    import tempfile
+    import warnings
+    logging.basicConfig(level=logging.INFO)
+    warnings.filterwarnings('ignore')
+
+    from gpiohero.clock import set_clock, VirtualClock # NOTE: not this module's, when run as __main__
+    from gpiohero.sim import DHT11, IrReceiver
+    from gpiohero.sim.imu import MPU
+    from gpiohero.trace import TraceWriter, Replay, read_trace
+
+    path = os.path.join(tempfile.mkdtemp(), "house.trace")
+    clock = VirtualClock(step=True)
+    set_clock(clock)
+
+    with TraceWriter(path) as trace, DHT11(sample_interval=10) as dht, MPU(sample_interval=1) as mpu, IrReceiver() as ir:
+        trace.record(dht, "dht")
+        trace.record(mpu, "mpu")
+        trace.record(ir, "ir")
+        clock.sleep(60 * 60)
+
+    events = list(read_trace(path))
+    as_json = sum(len(json.dumps([at, source, event, payload])) for at, source, event, payload in events)
+    print(f"An hour of readings: {len(events)} in {os.path.getsize(path)} bytes ({as_json} as JSON)")
+
+    set_clock(VirtualClock(speed=600))
+    with Replay(path, source="dht") as replay:
+        replay.when_measure = print
+        time.sleep(1)
+
+if __name__ == "__main__":
+    main()
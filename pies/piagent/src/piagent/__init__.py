@@ -0,0 +1,3 @@
+from .publisher import *
+from .buffer import *
+from .agent import *
@@ -0,0 +1,233 @@
+__all__ = [
+    "MqttConfig",
+    "DeviceSpec",
+    "Manifest",
+    "Agent",
+    "main",
+]
+
+import os
+import json
+import time
+import signal
+import asyncio
+import logging
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.enums import MQTTProtocolVersion
+from gpiohero.drivers import AsyncioDriver, Driven, set_driver
+from gpiohero.trace import TraceWriter
+
+from .buffer import RingBuffer
+from .commands import CommandRouter
+from .connection import Connection
+from .devices import DEVICE_TYPES, create_device
+from .publisher import Publisher
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MqttConfig:
+    host: str = field(default_factory=lambda: os.getenv('MQTT_HOST', "localhost"))
+    port: int = field(default_factory=lambda: int(os.getenv('MQTT_PORT', 1883)))
+    qos: int = 0
+
+@dataclass
+class DeviceSpec:
+    id: str
+    type: str
+    """One of ``DEVICE_TYPES``."""
+    topic: 'str | None' = None
+    """Where readings are published, for sensors."""
+    command: 'str | None' = None
+    """Where commands are received, for actuators."""
+    simulated: bool = False
+    report: 'dict | None' = None
+    """Deadband filter, ``{"thresholds": {"temperature": .2, "humidity": {"percent": 2}}, "max_silence": 60}``."""
+    sim: Dict[str, Any] = field(default_factory=dict)
+    """``SIM_*`` properties of the simulator."""
+    options: Dict[str, Any] = field(default_factory=dict)
+    """Everything else, pins and such."""
+
+    @classmethod
+    def from_dict(cls, id: str, data: dict, house: str = "default") -> 'DeviceSpec':
+        """``{house}`` in the topics is replaced with the house."""
+        data = dict(data)
+        topic, command = data.pop("topic", None), data.pop("command", None)
+        return cls(
+            id=id,
+            type=data.pop("type"),
+            topic=topic.replace("{house}", house) if topic else None,
+            command=command.replace("{house}", house) if command else None,
+            simulated=data.pop("simulated", False),
+            report=data.pop("report", None),
+            sim=data.pop("sim", {}),
+            options=data,
+        )
+
+@dataclass
+class Manifest:
+    """What a Pi runs, loaded from its JSON file.
+
+    ``devices`` maps device ids to their specs, ``{house}`` in their topics stands for the ``house``
+    the Pi is in (``$PI_HOUSE`` or ``default`` if not given). ``publisher`` holds ``Publisher`` arguments
+    and ``buffer`` the ``RingBuffer`` ones (``null`` to go without the offline buffer). With ``record``
+    the readings of all gpiohero devices are recorded to that trace file, under their ids, for
+    devices with a ``"replay"`` option to play back.
+    """
+    name: str
+    devices: List[DeviceSpec]
+    house: str = "default"
+    simulated: bool = False
+    mqtt: MqttConfig = field(default_factory=MqttConfig)
+    publisher: Dict[str, Any] = field(default_factory=dict)
+    buffer: 'Dict[str, Any] | None' = field(default_factory=lambda: {"directory": "buffer"})
+    record: 'str | None' = None
+
+    @classmethod
+    def load(cls, path: str) -> 'Manifest':
+        with open(path) as f:
+            data = json.load(f)
+
+        house = data.get("house") or os.getenv("PI_HOUSE", "default")
+        devices = [DeviceSpec.from_dict(id, spec, house) for id, spec in data.get("devices", {}).items()]
+        for spec in devices:
+            if spec.type not in DEVICE_TYPES:
+                raise ValueError(f"Unknown type {spec.type!r} of device {spec.id}")
+
+        return cls(
+            name=data["name"],
+            devices=devices,
+            house=house,
+            simulated=data.get("simulated", False),
+            mqtt=MqttConfig(**data.get("mqtt", {})),
+            publisher=data.get("publisher", {}),
+            buffer=data.get("buffer", {"directory": "buffer"}),
+            record=data.get("record"),
+        )
+
+
+class Agent:
+    """Runs a Pi from its manifest on one asyncio loop.
+
+    The loop runs the MQTT client's network loop, the publisher and the command router, timed
+    actions (``"for"`` rollbacks, typing timeouts) are scheduled on it too. So do the gpiohero
+    devices (simulators, DHT, IMU and keypad polling), which are driven by an ``AsyncioDriver``
+    instead of a thread each. Callbacks of plain gpiozero devices still come from their pin
+    threads and only queue readings, which is safe from any thread.
+    """
+
+    def __init__(self, manifest: Manifest):
+        self.manifest = manifest
+
+        self.client = mqtt.Client(client_id=manifest.name, protocol=MQTTProtocolVersion.MQTTv5)
+        self.buffer = RingBuffer(**manifest.buffer) if manifest.buffer is not None else None
+        self.publisher = Publisher(self.client, qos=manifest.mqtt.qos, buffer=self.buffer, **manifest.publisher)
+        self.commands = CommandRouter()
+        self.devices: Dict[str, Any] = {}
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._scheduled: Dict[str, asyncio.TimerHandle] = {}
+
+    def report(self, spec: DeviceSpec, data: dict):
+        """Publishes a reading of a device on its topic, stamped with when it was taken. Safe to call from any thread."""
+        data["simulated"] = self.manifest.simulated or spec.simulated
+        data["ts"] = time.time() # batched and buffered readings arrive long after
+        self.publisher.publish(spec.topic, data)
+
+    def schedule(self, key: str, delay: 'float | str | None', callback: Callable[[], Any]):
+        """Calls back after ``delay`` seconds, replacing what was scheduled under the same key. Loop only."""
+        assert self.loop
+
+        if previous := self._scheduled.pop(key, None):
+            previous.cancel()
+
+        try:
+            delay = float(delay) if delay else None
+        except ValueError:
+            _logger.warning("Invalid delay for %s: %r", key, delay)
+            return
+
+        if delay:
+            self._scheduled[key] = self.loop.call_later(delay, self._scheduled_call, key, callback)
+
+    def _scheduled_call(self, key: str, callback: Callable[[], Any]):
+        self._scheduled.pop(key, None)
+        try:
+            callback()
+        except Exception:
+            _logger.exception("Scheduled call for %s failed", key)
+
+    def call_soon_threadsafe(self, callback: Callable[..., Any], *args):
+        assert self.loop
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def _on_connect(self, client: mqtt.Client, userdata, flags, rc, properties=None):
+        if topics := self.commands.topics:
+            client.subscribe([(topic, self.manifest.mqtt.qos) for topic in topics])
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(signum, self.stop)
+
+        with ExitStack() as stack:
+            stack.callback(set_driver, set_driver(AsyncioDriver(self.loop)))
+            trace = stack.enter_context(TraceWriter(self.manifest.record)) if self.manifest.record else None
+
+            for spec in self.manifest.devices:
+                simulated = self.manifest.simulated or spec.simulated
+                device = self.devices[spec.id] = create_device(spec, simulated)
+                stack.callback(device.close)
+
+                if trace and isinstance(device, Driven):
+                    trace.record(device, spec.id)
+
+                DEVICE_TYPES[spec.type].bind(self, device, spec)
+                _logger.debug("Started %s %s%s", spec.type, spec.id, " (simulated)" if simulated else "")
+
+            self.client.on_connect = self._on_connect
+            self.client.on_message = self.commands
+
+            connection = Connection(self.client, self.manifest.mqtt.host, self.manifest.mqtt.port)
+            connection.start()
+            publishing = self.loop.create_task(self.publisher.run())
+
+            await self._stopping.wait()
+            _logger.info("Shutting down")
+
+            for handle in self._scheduled.values():
+                handle.cancel()
+
+            self.publisher.stop()
+            await publishing
+            await connection.close()
+
+    def stop(self):
+        if self._stopping:
+            self._stopping.set()
+
+
+def main():
+    import argparse
+    import warnings
+
+    parser = argparse.ArgumentParser(description="Runs a Pi from its device manifest.")
+    parser.add_argument('manifest', nargs='?', default=os.getenv("PI_MANIFEST", "config.json"), help="Path to the manifest. Default is $PI_MANIFEST or config.json.")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Log debug messages.")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore') # ignore gpiozero, use pigpio and no echo detected for simulators warnings
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+    asyncio.run(Agent(Manifest.load(args.manifest)).run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+__all__ = [
+    "DROP_OLDEST",
+    "DROP_NEWEST",
+    "RingBuffer",
+]
+
+import os
+import mmap
+import time
+import struct
+import logging
+import zlib
+from collections import deque
+from threading import Lock
+from typing import Deque, List, Optional, Tuple
+
+_logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+"""When full, the oldest segment is deleted to make room."""
+DROP_NEWEST = "drop_newest"
+"""When full, new messages are rejected."""
+
+_MAGIC = b"PIB1"
+# magic, read offset
+_HEADER = struct.Struct("<4sI")
+# payload length, crc32 of the payload
+_RECORD = struct.Struct("<II")
+
+# (segment sequence, read offset in it)
+Cursor = Tuple[int, int]
+
+
+class _Segment:
+    """Fixed size, memory mapped file of length prefixed records, zero filled past the last one."""
+
+    def __init__(self, path: str, size: int, sequence: int):
+        self.path = path
+        self.sequence = sequence
+
+        create = not os.path.exists(path)
+        with open(path, "a+b") as f:
+            if create or os.path.getsize(path) < size:
+                f.truncate(size)
+            self.mm = mmap.mmap(f.fileno(), 0)
+
+        self.size = len(self.mm)
+        magic, self.read_offset = _HEADER.unpack_from(self.mm)
+
+        if magic != _MAGIC:
+            if not create:
+                _logger.warning("Segment %s has no header, starting it over", path)
+            self.mm[:] = bytes(self.size)
+            _HEADER.pack_into(self.mm, 0, _MAGIC, _HEADER.size)
+            self.read_offset = _HEADER.size
+
+        # find where the last complete record ends, a torn write after it is overwritten
+        self.write_offset = _HEADER.size
+        self.unread = 0
+        for offset, _ in self._scan(_HEADER.size):
+            if offset > self.read_offset:
+                self.unread += 1
+            self.write_offset = offset
+
+        self.read_offset = min(self.read_offset, self.write_offset)
+
+    def _scan(self, offset: int, end: Optional[int] = None):
+        """Yields ``(offset after the record, record)`` for the complete records from ``offset``."""
+        mm = self.mm
+        end = self.size if end is None else end
+
+        while offset + _RECORD.size <= end:
+            length, crc = _RECORD.unpack_from(mm, offset)
+            start = offset + _RECORD.size
+
+            if not length or start + length > end:
+                return
+
+            record = mm[start:start + length]
+            if zlib.crc32(record) != crc:
+                return
+
+            offset = start + length
+            yield offset, record
+
+    def append(self, record: bytes) -> bool:
+        end = self.write_offset + _RECORD.size + len(record)
+        if end > self.size:
+            return False
+
+        _RECORD.pack_into(self.mm, self.write_offset, len(record), zlib.crc32(record))
+        self.mm[self.write_offset + _RECORD.size:end] = record
+        self.write_offset = end
+        self.unread += 1
+        return True
+
+    def read(self, limit: int) -> List[Tuple[int, bytes]]:
+        records = []
+        for item in self._scan(self.read_offset, self.write_offset):
+            records.append(item)
+            if len(records) >= limit:
+                break
+
+        return records
+
+    def advance(self, offset: int) -> int:
+        """Moves the read offset forward, returns how many records were consumed."""
+        if offset <= self.read_offset:
+            return 0
+
+        consumed = sum(1 for _ in self._scan(self.read_offset, offset))
+        self.read_offset = offset
+        self.unread -= consumed
+        _HEADER.pack_into(self.mm, 0, _MAGIC, offset)
+        return consumed
+
+    def flush(self):
+        self.mm.flush()
+
+    def close(self):
+        if not self.mm.closed:
+            self.mm.flush()
+            self.mm.close()
+
+    def delete(self):
+        self.mm.close()
+        os.remove(self.path)
+
+
+class RingBuffer:
+    """Persistent FIFO of ``(topic, payload)`` messages for when the broker cannot be reached.
+
+    Messages are appended to fixed size memory mapped segment files (``<directory>/<sequence>.seg``),
+    each record checksummed so a write torn by a power cut is dropped on the next start. At most
+    ``max_size`` bytes of segments are kept, when that is reached ``overflow`` decides whether the
+    oldest segment is deleted (``drop_oldest``) or new messages are rejected (``drop_newest``).
+
+    Reading does not consume: :meth:`peek` returns messages with a cursor that is :meth:`consume`-d
+    once they were published, so nothing is lost if the Pi restarts in between (some may be sent twice).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 2**20,
+        max_size: int = 64 * 2**20,
+        overflow: str = DROP_OLDEST,
+        flush_interval: float = 1,
+    ):
+        if overflow not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError("Unsupported overflow policy: " + overflow)
+
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max(2, max_size // segment_size)
+        self.overflow = overflow
+        self.flush_interval = flush_interval
+
+        self.appended = self.consumed = self.dropped = 0
+        self._last_flush = time.monotonic()
+        self._lock = Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._segments: Deque[_Segment] = deque(
+            _Segment(os.path.join(directory, name), segment_size, int(name[:-4]))
+            for name in sorted(os.listdir(directory))
+            if name.endswith(".seg") and name[:-4].isdigit()
+        )
+
+        if not self._segments:
+            self._segments.append(self._new_segment(0))
+
+        if pending := self.pending:
+            _logger.info("Loaded %d buffered messages from %s", pending, directory)
+
+    def _new_segment(self, sequence: int) -> _Segment:
+        return _Segment(os.path.join(self.directory, f"{sequence:012d}.seg"), self.segment_size, sequence)
+
+    @property
+    def pending(self) -> int:
+        return sum(segment.unread for segment in self._segments)
+
+    @property
+    def size(self) -> int:
+        return len(self._segments) * self.segment_size
+
+    def append(self, topic: str, payload: 'bytes | str') -> bool:
+        """Stores a message, returns ``False`` if it was rejected (buffer full with ``drop_newest``)."""
+        record = topic.encode() + b"\0" + (payload.encode() if isinstance(payload, str) else payload)
+
+        if _HEADER.size + _RECORD.size + len(record) > self.segment_size:
+            _logger.warning("Message on %s is larger than a segment, dropping it", topic)
+            self.dropped += 1
+            return False
+
+        with self._lock:
+            if not self._segments[-1].append(record):
+                if len(self._segments) >= self.max_segments:
+                    if self.overflow == DROP_NEWEST:
+                        self.dropped += 1
+                        return False
+
+                    oldest = self._segments.popleft()
+                    self.dropped += oldest.unread
+                    _logger.warning("Buffer full, dropped %d oldest messages", oldest.unread)
+                    oldest.delete()
+
+                self._segments.append(self._new_segment(self._segments[-1].sequence + 1))
+                self._segments[-1].append(record)
+
+            self.appended += 1
+
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+        return True
+
+    def peek(self, limit: int = 100) -> Tuple[List[Tuple[str, bytes]], Optional[Cursor]]:
+        """Returns up to ``limit`` of the oldest messages and the cursor to consume them with."""
+        messages: List[Tuple[str, bytes]] = []
+        cursor: Optional[Cursor] = None
+
+        with self._lock:
+            for segment in self._segments:
+                for offset, record in segment.read(limit - len(messages)):
+                    topic, _, payload = record.partition(b"\0")
+                    messages.append((topic.decode(), payload))
+                    cursor = segment.sequence, offset
+
+                if len(messages) >= limit:
+                    break
+
+        return messages, cursor
+
+    def consume(self, cursor: Optional[Cursor]):
+        """Marks everything up to the cursor as sent, deleting the segments that were fully read."""
+        if cursor is None:
+            return
+
+        sequence, offset = cursor
+
+        with self._lock:
+            while self._segments and self._segments[0].sequence < sequence:
+                segment = self._segments.popleft()
+                self.consumed += segment.unread
+                segment.delete()
+
+            if self._segments and self._segments[0].sequence == sequence:
+                segment = self._segments[0]
+                self.consumed += segment.advance(offset)
+
+                if segment.read_offset >= segment.write_offset and len(self._segments) > 1:
+                    self._segments.popleft().delete()
+
+    def _flush(self):
+        for segment in self._segments:
+            segment.flush()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "size": self.size,
+            "appended": self.appended,
+            "consumed": self.consumed,
+            "dropped": self.dropped,
+        }
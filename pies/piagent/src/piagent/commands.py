@@ -0,0 +1,51 @@
+__all__ = [
+    "CommandRouter",
+]
+
+import json
+import logging
+from typing import Callable, Dict, List
+
+import paho.mqtt.client as mqtt
+
+_logger = logging.getLogger(__name__)
+
+CommandHandler = Callable[[dict], None]
+
+
+class CommandRouter:
+    """Routes command messages (``cmd/home/default/porch/light``, ...) to the handlers of their exact topic.
+
+    Set as the client's ``on_message``, the payload is parsed once and handlers only get JSON objects.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[CommandHandler]] = {}
+
+    def add(self, topic: str, handler: CommandHandler):
+        self._handlers.setdefault(topic, []).append(handler)
+
+    @property
+    def topics(self) -> List[str]:
+        return list(self._handlers)
+
+    def __call__(self, client: mqtt.Client, userdata, message: mqtt.MQTTMessage):
+        if not (handlers := self._handlers.get(message.topic)):
+            _logger.debug("Unhandled message on topic: %s", message.topic)
+            return
+
+        try:
+            data = json.loads(message.payload)
+        except ValueError:
+            _logger.warning("Malformed command on %s", message.topic)
+            return
+
+        if not isinstance(data, dict):
+            _logger.warning("Malformed command on %s", message.topic)
+            return
+
+        for handler in handlers:
+            try:
+                handler(data)
+            except Exception:
+                _logger.exception("Command handler for %s failed", message.topic)
@@ -0,0 +1,98 @@
+__all__ = [
+    "Connection",
+]
+
+import socket
+import asyncio
+import logging
+from typing import Optional
+
+import paho.mqtt.client as mqtt
+
+_logger = logging.getLogger(__name__)
+
+
+class Connection:
+    """Runs a paho client's network loop on an asyncio loop instead of a ``loop_start`` thread.
+
+    The socket is watched with ``add_reader``/``add_writer`` and the keepalive handled by a task, which
+    also reconnects (with exponential backoff up to ``max_reconnect_delay``) whenever the connection is
+    lost. Connecting itself blocks the loop for at most the client's ``connect_timeout``.
+    """
+
+    def __init__(self, client: mqtt.Client, host: str, port: int = 1883, keepalive: int = 60, max_reconnect_delay: float = 30):
+        self.client = client
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: 'asyncio.Task | None' = None
+        self._connected_once = False
+
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    def _on_socket_open(self, client: mqtt.Client, userdata, sock):
+        assert self._loop
+        self._loop.add_reader(sock, client.loop_read)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 2048)
+
+    def _on_socket_close(self, client: mqtt.Client, userdata, sock):
+        assert self._loop
+        self._loop.remove_reader(sock)
+        _logger.info("Disconnected from %s:%s", self.host, self.port)
+
+    def _on_socket_register_write(self, client: mqtt.Client, userdata, sock):
+        assert self._loop
+        self._loop.add_writer(sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client: mqtt.Client, userdata, sock):
+        assert self._loop
+        self._loop.remove_writer(sock)
+
+    def _connect(self) -> bool:
+        try:
+            if self._connected_once:
+                self.client.reconnect()
+            else:
+                self.client.connect(self.host, self.port, self.keepalive)
+                self._connected_once = True
+        except OSError as e:
+            _logger.warning("Could not connect to %s:%s (%s)", self.host, self.port, e)
+            return False
+
+        _logger.info("Connected to %s:%s", self.host, self.port)
+        return True
+
+    async def _run(self):
+        delay = 1.
+
+        while True:
+            if self.client.loop_misc() == mqtt.MQTT_ERR_NO_CONN:
+                if not self._connect():
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_reconnect_delay)
+                    continue
+
+                delay = 1.
+
+            await asyncio.sleep(1)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        self.client.disconnect()
+        await asyncio.sleep(.1) # the DISCONNECT packet is written by the loop
@@ -0,0 +1,294 @@
+__all__ = [
+    "DeviceType",
+    "DEVICE_TYPES",
+    "create_device",
+]
+
+import logging
+from dataclasses import dataclass
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, Callable, Dict
+
+from gpiohero.report import ReportFilter, Deadband
+
+if TYPE_CHECKING:
+    from .agent import Agent, DeviceSpec
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DeviceType:
+    sim: str
+    """``module:Class`` of the simulator."""
+    legit: str
+    """``module:Class`` of the real device, only imported when used."""
+    create: Callable[[Any, dict], Any]
+    """Makes the device from its class and the spec's options (pins, ...)."""
+    bind: 'Callable[[Agent, Any, DeviceSpec], None]'
+    """Wires the device's callbacks to the agent's publisher and its commands to the router."""
+
+
+def _import(path: str):
+    module, _, name = path.partition(":")
+    return getattr(import_module(module), name)
+
+def create_device(spec: 'DeviceSpec', simulated: bool):
+    """Makes the device of a spec, a ``Replay`` of the device's recorded readings if it has a ``replay`` option.
+
+    ``"replay": "pi1.trace"`` or ``"replay": {"path": "pi1.trace", "speed": 10, "repeat": true}``.
+    """
+    try:
+        type_ = DEVICE_TYPES[spec.type]
+    except KeyError:
+        raise ValueError(f"Unknown type {spec.type!r} of device {spec.id}") from None
+
+    if replay := spec.options.get("replay"):
+        from gpiohero.trace import Replay
+
+        options = replay if isinstance(replay, dict) else {"path": replay}
+        return Replay(**{"source": spec.id, **options})
+
+    clazz = _import(type_.sim if simulated else type_.legit)
+
+    if simulated and spec.sim and isinstance(clazz, type):
+        # NOTE: Simulators are configured through their SIM_* class properties
+        clazz = type(clazz.__name__, (clazz,), dict(spec.sim))
+
+    return type_.create(clazz, spec.options)
+
+
+#region Sensors
+
+def _reporter(agent: 'Agent', spec: 'DeviceSpec') -> Callable[[dict], Any]:
+    """Publishes measurements as they are, through a deadband filter if the spec has ``report`` settings."""
+    def report(measurement: dict):
+        agent.report(spec, dict(measurement))
+
+    if not spec.report:
+        return report
+
+    thresholds = {
+        key: Deadband(**threshold) if isinstance(threshold, dict) else threshold
+        for key, threshold in spec.report.get("thresholds", {}).items()
+    }
+    return ReportFilter(report, thresholds, max_silence=spec.report.get("max_silence", 60))
+
+def _bind_door(agent: 'Agent', button, spec: 'DeviceSpec'):
+    def changed(button):
+        agent.report(spec, {"open": not button.is_pressed})
+
+    button.when_pressed = button.when_released = changed
+
+def _bind_button(agent: 'Agent', button, spec: 'DeviceSpec'):
+    payload = spec.options.get("payload", {"pressed": True})
+    button.when_pressed = lambda: agent.report(spec, dict(payload))
+
+def _bind_motion(agent: 'Agent', pir, spec: 'DeviceSpec'):
+    def changed(pir):
+        agent.report(spec, {"detected": pir.motion_detected})
+
+    pir.when_motion = pir.when_no_motion = changed
+
+def _bind_proximity(agent: 'Agent', us, spec: 'DeviceSpec'):
+    """Distances are published on getting in and out of range, and every ``interval`` seconds while in
+    range once they moved by ``deadband`` meters, the backend tells people coming in from people going
+    out by their trend."""
+    interval = spec.options.get("interval", .2)
+    deadband = spec.options.get("deadband", .02)
+    last = 0. # published on getting in range, before any sample
+
+    def publish(distance: float, in_range: bool):
+        nonlocal last
+        last = distance
+        agent.report(spec, {"distance": distance, "in_range": in_range})
+
+    def sample():
+        if not us.in_range:
+            return # out of range is published by its callback
+        if abs((distance := us.distance) - last) >= deadband:
+            publish(distance, True)
+        agent.schedule(spec.id, interval, sample)
+
+    def changed(in_range: bool, distance: float):
+        publish(distance, in_range)
+        agent.schedule(spec.id, interval if in_range else None, sample)
+
+    us.when_in_range = us.when_out_of_range = lambda us: agent.call_soon_threadsafe(changed, us.in_range, us.distance)
+
+def _bind_measure(agent: 'Agent', sensor, spec: 'DeviceSpec'):
+    sensor.when_measure = _reporter(agent, spec)
+
+def _bind_ir(agent: 'Agent', ir, spec: 'DeviceSpec'):
+    ir.when_message = lambda message: agent.report(spec, {"button": message.name})
+
+def _bind_keypad(agent: 'Agent', keypad, spec: 'DeviceSpec'):
+    """Typed keys are published together, once nothing was typed for ``idle`` seconds."""
+    idle = spec.options.get("idle", 2)
+    keys = []
+
+    def flush():
+        agent.report(spec, {"keys": "".join(keys)})
+        keys.clear()
+
+    def typed(key):
+        keys.append(key)
+        agent.schedule(spec.id, idle, flush)
+
+    keypad.when_key = lambda key: agent.call_soon_threadsafe(typed, key)
+
+#endregion
+
+#region Actuators
+
+def _action(data: dict) -> str:
+    return str(data.get("action", "")).lower()
+
+def _bind_switch(agent: 'Agent', device, spec: 'DeviceSpec'):
+    """``{"action": "on" | "off", "for": <seconds>}``, switched back after ``for`` seconds."""
+    def handle(data: dict):
+        action = _action(data)
+
+        if action == "on":
+            device.on()
+            rollback = device.off
+        elif action == "off":
+            device.off()
+            rollback = device.on
+        else:
+            _logger.warning("Unknown action for %s: %r", spec.id, action)
+            return
+
+        agent.schedule(spec.id, data.get("for"), rollback)
+
+    agent.commands.add(spec.command, handle)
+
+def _bind_rgb(agent: 'Agent', rgb, spec: 'DeviceSpec'):
+    """``{"action": "on" | "off", "colour": "#rrggbb", "for": <seconds>}``."""
+    from colorzero import Color
+
+    def handle(data: dict):
+        action = _action(data)
+
+        if action == "on":
+            rgb.color = Color(data.get("colour", Color.from_rgb(1, 1, 1).html))
+            rollback = rgb.off
+        elif action == "off":
+            colour = rgb.color
+            def rollback():
+                rgb.color = colour
+
+            rgb.off()
+        else:
+            _logger.warning("Unknown action for %s: %r", spec.id, action)
+            return
+
+        agent.schedule(spec.id, data.get("for"), rollback)
+
+    agent.commands.add(spec.command, handle)
+
+def _bind_display(agent: 'Agent', lcd, spec: 'DeviceSpec'):
+    """``{"action": "display", "message": "..."}`` or ``{"action": "clear"}``."""
+    def handle(data: dict):
+        action = _action(data)
+
+        if action == "display":
+            lcd.show(data.get("message", ""))
+        elif action == "clear":
+            lcd.clear()
+        else:
+            _logger.warning("Unknown action for %s: %r", spec.id, action)
+
+    agent.commands.add(spec.command, handle)
+
+def _bind_timer(agent: 'Agent', timer, spec: 'DeviceSpec'):
+    """``{"action": "start" | "stop" | "reset" | "snooze" | "dismiss", "duration": <seconds>}``."""
+    def handle(data: dict):
+        action = _action(data)
+
+        if action == "start":
+            timer.start()
+        elif action == "stop":
+            timer.stop()
+        elif action == "reset":
+            timer.reset(data.get("duration"))
+        elif action == "snooze":
+            timer.snooze(data.get("duration", 10))
+        elif action == "dismiss":
+            timer.dismiss()
+        else:
+            _logger.warning("Unknown action for %s: %r", spec.id, action)
+
+    agent.commands.add(spec.command, handle)
+
+#endregion
+
+
+DEVICE_TYPES: Dict[str, DeviceType] = {
+    "door": DeviceType(
+        "gpiohero.sim:Button", "gpiohero.legit:Button",
+        lambda clazz, o: clazz(o["pin"]),
+        _bind_door,
+    ),
+    "button": DeviceType(
+        "gpiohero.sim:Button", "gpiohero.legit:Button",
+        lambda clazz, o: clazz(o["pin"]),
+        _bind_button,
+    ),
+    "motion": DeviceType(
+        "gpiohero.sim:MotionSensor", "gpiohero.legit:MotionSensor",
+        lambda clazz, o: clazz(o["pin"]),
+        _bind_motion,
+    ),
+    "proximity": DeviceType(
+        "gpiohero.sim:DistanceSensor", "gpiohero.legit:DistanceSensor",
+        lambda clazz, o: clazz(o["trig"], o["echo"]),
+        _bind_proximity,
+    ),
+    "dht": DeviceType(
+        "gpiohero.sim:DHT11", "gpiohero.legit:DHT11",
+        lambda clazz, o: clazz(o["pin"], o.get("sample_interval", 1)),
+        _bind_measure,
+    ),
+    "imu": DeviceType(
+        "gpiohero.sim.imu:MPU", "gpiohero.legit.imu:MPU",
+        lambda clazz, o: clazz(o.get("bus", 1), o.get("address", 104), o.get("sample_interval", .5)),
+        _bind_measure,
+    ),
+    "ir": DeviceType(
+        "gpiohero.sim:IrReceiver", "gpiohero.legit:IrReceiver",
+        lambda clazz, o: clazz(o["pin"]),
+        _bind_ir,
+    ),
+    "keypad": DeviceType(
+        "gpiohero.sim:MatrixKeypad", "gpiohero.legit:MatrixKeypad",
+        lambda clazz, o: clazz(o["rows"], o["cols"], o.get("labels")),
+        _bind_keypad,
+    ),
+    "light": DeviceType(
+        "gpiohero.sim:LED", "gpiohero.legit:LED",
+        lambda clazz, o: clazz(o["pin"]),
+        _bind_switch,
+    ),
+    "buzzer": DeviceType(
+        "gpiohero.sim:Buzzer", "gpiohero.legit:Buzzer",
+        lambda clazz, o: clazz(o["pin"]),
+        _bind_switch,
+    ),
+    "rgb": DeviceType(
+        "gpiohero.sim:RGBLED", "gpiohero.legit:RGBLED",
+        lambda clazz, o: clazz(o["red"], o["green"], o["blue"], pwm=False, initial_value=(0, 0, 0)),
+        _bind_rgb,
+    ),
+    "display": DeviceType(
+        "gpiohero.sim.lcd:Display", "gpiohero.legit.lcd:Display",
+        lambda clazz, o: clazz(o.get("pin_rs", 25), o.get("pin_e", 24), o.get("pins_db", (23, 17, 21, 22))),
+        _bind_display,
+    ),
+    "timer": DeviceType(
+        "gpiohero.sim.timer:Timer", "gpiohero.legit.timer:Timer",
+        lambda clazz, o: clazz(o["segments"], o["digits"], o.get("duration", 10)),
+        _bind_timer,
+    ),
+}
+"""Device types by the ``type`` used in manifests, add to it for new kinds of devices."""
@@ -0,0 +1,367 @@
+__all__ = [
+    "BATCH_LEVEL",
+    "Publisher",
+]
+
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from queue import Queue, Full, Empty
+from threading import Event, Lock, Thread
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import paho.mqtt.client as mqtt
+
+from .buffer import RingBuffer, Cursor
+
+_logger = logging.getLogger(__name__)
+
+BATCH_LEVEL = "batch"
+"""Last level of batch topics, ``home/default/porch/door`` and ``home/default/porch/motion`` readings go out on ``home/default/porch/batch``."""
+
+POLL_INTERVAL = .05
+"""How often unacknowledged messages are checked on, in seconds."""
+
+# (topic, data, enqueued at)
+_Reading = Tuple[str, dict, float]
+
+
+def _encode(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def _is_published(info: mqtt.MQTTMessageInfo) -> bool:
+    try:
+        return info.is_published()
+    except (ValueError, RuntimeError): # failed after it was queued, the connection was lost
+        return False
+
+def _has_failed(info: mqtt.MQTTMessageInfo) -> bool:
+    try:
+        info.is_published()
+    except (ValueError, RuntimeError):
+        return True
+    return False
+
+
+class Publisher:
+    """Publishes device readings in the background, coalescing them into batch messages.
+
+    Readings are queued by :meth:`publish` (never blocking the device callbacks, a full queue drops the
+    reading) and flushed once ``batch_size`` of them are waiting or the oldest one waited ``max_latency``
+    seconds. A flush groups the readings by topic prefix (everything but the last level) and publishes
+    one ``<prefix>/batch`` message ``{"readings": [[<last level>, <data>], ...]}`` per prefix, a single
+    reading goes out on its own topic as is.
+
+    Readings are held back while ``max_inflight`` messages are unacknowledged (tracked through their
+    ``MQTTMessageInfo``), a message not acknowledged in ``publish_timeout`` seconds counts as failed.
+
+    With a ``buffer``, messages that cannot be published while the client is disconnected go to it
+    (as do all new ones while it is not empty, to keep them in order) and it is drained, oldest
+    first, once the client is connected again.
+
+    All the work is done by :meth:`pump`, which never blocks, so the publisher runs either on its own
+    thread (:meth:`start`/:meth:`close`) or as a task on the asyncio loop that also runs the client's
+    network loop (:meth:`run`/:meth:`stop`).
+    """
+
+    def __init__(
+        self,
+        client: mqtt.Client,
+        batch_size: int = 30,
+        max_latency: float = 1,
+        max_inflight: int = 20,
+        queue_size: int = 1_000,
+        qos: int = 0,
+        publish_timeout: float = 5,
+        buffer: 'RingBuffer | None' = None,
+    ):
+        self.client = client
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.max_inflight = max_inflight
+        self.qos = qos
+        self.publish_timeout = publish_timeout
+        self.buffer = buffer
+
+        self._queue: 'Queue[_Reading]' = Queue(queue_size)
+        self._pending: List[_Reading] = []
+        # (message info, enqueued time of its oldest reading, sent at, readings in it, topic, payload)
+        self._inflight: Deque[Tuple[mqtt.MQTTMessageInfo, float, float, int, str, str]] = deque()
+        # (message infos, cursor to consume them with, sent at) of the buffered messages being replayed
+        self._replaying: Optional[Tuple[List[mqtt.MQTTMessageInfo], Optional[Cursor], float]] = None
+
+        self._stopping = Event()
+        self._wakeup = Event()
+        self._loop: 'asyncio.AbstractEventLoop | None' = None
+        self._async_wakeup: 'asyncio.Event | None' = None
+        self._thread: 'Thread | None' = None
+
+        self.readings = self.messages = self.batches = self.dropped = self.failed = 0
+        self.buffered = self.replayed = 0
+        self._max_depth = 0
+        self._latencies: Deque[float] = deque(maxlen=1_000)
+        self._stats_lock = Lock()
+
+    def publish(self, topic: str, data: dict) -> bool:
+        """Queues a reading, returns ``False`` if it was dropped. Safe to call from any thread."""
+        try:
+            self._queue.put_nowait((topic, data, time.monotonic()))
+        except Full:
+            with self._stats_lock:
+                self.dropped += 1
+            _logger.warning("Publish queue full, dropping reading on %s", topic)
+            return False
+
+        with self._stats_lock:
+            self.readings += 1
+            depth = self._queue.qsize()
+            self._max_depth = max(self._max_depth, depth)
+
+        if depth == 1: # the max latency timer starts with the first reading
+            self._wake()
+
+        return True
+
+    def _wake(self):
+        self._wakeup.set()
+
+        if self._loop and self._async_wakeup:
+            try:
+                self._loop.call_soon_threadsafe(self._async_wakeup.set)
+            except RuntimeError: # loop already closed
+                pass
+
+    #region Pump
+
+    def pump(self, final: bool = False) -> float:
+        """Does whatever can be done without blocking, returns the seconds until it should be called again.
+
+        ``final`` flushes everything that is queued, regardless of the batch size and inflight window.
+        """
+        now = time.monotonic()
+        self._collect(now)
+
+        pending = self._pending
+        while final or len(pending) < self.batch_size:
+            try:
+                pending.append(self._queue.get_nowait())
+            except Empty:
+                break
+
+        if pending and (
+            final
+            or len(self._inflight) < self.max_inflight
+            and (len(pending) >= self.batch_size or now - pending[0][2] >= self.max_latency)
+        ):
+            self._flush(pending)
+            self._pending = pending = []
+
+        if self.buffer is not None and not final:
+            if self._replaying:
+                self._check_replay(now)
+            elif self.buffer.pending and self.client.is_connected() and len(self._inflight) < self.max_inflight:
+                self._replay(now)
+
+        if not self._queue.empty() and len(self._inflight) < self.max_inflight:
+            return 0
+
+        timeout = 1.
+        if pending:
+            timeout = max(0, pending[0][2] + self.max_latency - now)
+        if self._inflight or self._replaying:
+            timeout = min(timeout, POLL_INTERVAL)
+        return timeout
+
+    def _flush(self, readings: List[_Reading]):
+        # prefix -> readings, in order
+        groups: Dict[str, List[_Reading]] = {}
+        for reading in readings:
+            groups.setdefault(reading[0].rpartition("/")[0], []).append(reading)
+
+        for prefix, group in groups.items():
+            if len(group) == 1:
+                topic, data, enqueued = group[0]
+                self._send(topic, _encode(data), enqueued, 1)
+            else:
+                payload = _encode({"readings": [[topic.rpartition("/")[2], data] for topic, data, _ in group]})
+                self._send(f"{prefix}/{BATCH_LEVEL}", payload, group[0][2], len(group))
+
+                with self._stats_lock:
+                    self.batches += 1
+
+    def _send(self, topic: str, payload: str, enqueued: float, count: int):
+        if self.buffer and (self.buffer.pending or self._replaying or not self.client.is_connected()):
+            return self._store(topic, payload, count)
+
+        info = self.client.publish(topic, payload, qos=self.qos)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            _logger.warning("Publishing on %s failed: %s", topic, mqtt.error_string(info.rc))
+            return self._store(topic, payload, count)
+
+        self._inflight.append((info, enqueued, time.monotonic(), count, topic, payload))
+        with self._stats_lock:
+            self.messages += 1
+
+    def _store(self, topic: str, payload: str, count: int):
+        stored = self.buffer is not None and self.buffer.append(topic, payload)
+
+        with self._stats_lock:
+            if stored:
+                self.buffered += count
+            else:
+                self.failed += count
+
+    def _collect(self, now: float):
+        """Forgets the acknowledged messages, recording their latency, and the ones that timed out or failed."""
+        while self._inflight:
+            info, enqueued, sent, count, topic, payload = self._inflight[0]
+
+            if _is_published(info):
+                self._inflight.popleft()
+                with self._stats_lock:
+                    self._latencies.append(now - enqueued)
+            elif _has_failed(info) or now - sent >= self.publish_timeout:
+                self._inflight.popleft()
+                _logger.warning("Message %s on %s was not acknowledged", info.mid, topic)
+                self._store(topic, payload, count)
+            else:
+                break
+
+    def _replay(self, now: float):
+        """Publishes a window of buffered messages, consumed from the buffer once all were acknowledged."""
+        assert self.buffer
+
+        messages, cursor = self.buffer.peek(self.max_inflight - len(self._inflight))
+        infos = []
+
+        for topic, payload in messages:
+            info = self.client.publish(topic, payload, qos=self.qos)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                return # disconnected again, the whole window is retried later
+            infos.append(info)
+
+        self._replaying = infos, cursor, now
+
+    def _check_replay(self, now: float):
+        assert self.buffer and self._replaying
+        infos, cursor, sent = self._replaying
+
+        if all(_is_published(info) for info in infos):
+            self.buffer.consume(cursor)
+            self._replaying = None
+            with self._stats_lock:
+                self.replayed += len(infos)
+        elif any(_has_failed(info) for info in infos) or now - sent >= self.publish_timeout:
+            self._replaying = None # retried from the same cursor
+
+    def _finish(self) -> bool:
+        """Returns whether everything sent was acknowledged, after the last flush."""
+        self._collect(time.monotonic())
+
+        if self._replaying:
+            self._check_replay(time.monotonic())
+
+        return not (self._inflight or self._replaying)
+
+    def _abandon(self):
+        for info, _, _, count, topic, payload in self._inflight:
+            self._store(topic, payload, count)
+
+        self._inflight.clear()
+
+        if self.buffer:
+            self.buffer.close()
+
+    #endregion
+
+    #region Thread
+
+    def start(self) -> 'Publisher':
+        self._thread = Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stopping.is_set():
+            if timeout := self.pump():
+                self._wakeup.wait(timeout)
+                self._wakeup.clear()
+
+        self.pump(final=True)
+        deadline = time.monotonic() + self.publish_timeout
+
+        while not self._finish() and time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+
+        self._abandon()
+
+    def close(self, timeout: 'float | None' = 10):
+        """Publishes what is queued and waits for it to be acknowledged."""
+        self.stop()
+
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+
+            if self._thread.is_alive():
+                _logger.warning("Failed to join publisher thread, timeout reached.")
+
+    def __enter__(self) -> 'Publisher':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    #endregion
+
+    #region Asyncio
+
+    async def run(self):
+        """Runs the publisher on the current loop until :meth:`stop`, then publishes what is queued."""
+        self._loop = asyncio.get_running_loop()
+        self._async_wakeup = asyncio.Event()
+
+        while not self._stopping.is_set():
+            if timeout := self.pump():
+                try:
+                    await asyncio.wait_for(self._async_wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._async_wakeup.clear()
+
+        self.pump(final=True)
+        deadline = time.monotonic() + self.publish_timeout
+
+        while not self._finish() and time.monotonic() < deadline:
+            await asyncio.sleep(POLL_INTERVAL)
+
+        self._abandon()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake()
+
+    #endregion
+
+    @property
+    def stats(self) -> dict:
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+
+            return {
+                "queued": self._queue.qsize(),
+                "max_queued": self._max_depth,
+                "inflight": len(self._inflight),
+                "readings": self.readings,
+                "messages": self.messages,
+                "batches": self.batches,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "buffered": self.buffered,
+                "replayed": self.replayed,
+                "buffer": self.buffer.stats if self.buffer else None,
+                "latency_p50": latencies[len(latencies) // 2] if latencies else None,
+                "latency_p99": latencies[int(len(latencies) * .99)] if latencies else None,
+            }
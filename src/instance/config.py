@@ -10,3 +10,60 @@ INFLUX_ORG = "io.github.cetkovicaleksa"
 INFLUX_BUCKET = "justkeeplivin"
 
 HOME_PIN = "1234"
+
+# Topics are home/<house>/<location>/<sensor>, commands cmd/home/<house>/<location>/<device>
+HOUSES = { # house id -> settings, the pin falls back to HOME_PIN
+    "default": {"pin": HOME_PIN},
+}
+DEFAULT_HOUSE = "default" # of api requests that do not name one
+
+# security events and the state of every house they change are saved to SQLite, restored on start
+SECURITY_LOG = True
+# SECURITY_DB = "instance/security.db"
+SECURITY_SYNCHRONOUS = "NORMAL" # FULL also survives power loss, at an fsync per event
+SECURITY_COMPACT_EVERY = 1_000 # events kept in the log
+# locations with a door, motion and ultrasonic sensor, people coming in and going out are counted there
+SECURITY_ENTRANCES = ["porch", "garage"]
+SECURITY_CROSSING_WINDOW = 5 # seconds of distances before and after the door opens or motion
+# the икона is tilted when its last IMU_CONFIRM accelerometer samples lean more than the threshold, or
+# the last IMU_WINDOW ones are shaken (it reports every sample, change-only reporting would hold a tilt back)
+IMU_WINDOW = 8
+IMU_BATCH = 4 # samples analysed together
+IMU_CONFIRM = 2
+IMU_TILT_THRESHOLD = 15 # degrees from its rest orientation
+IMU_SHAKE_THRESHOLD = .01 # variance of the magnitudes relative to gravity
+
+# "batching" writes from a background thread, "synchronous" blocks the caller on every write
+INFLUX_WRITE_MODE = "batching"
+INFLUX_BATCH_SIZE = 500
+INFLUX_FLUSH_INTERVAL = 1 # seconds
+INFLUX_BUFFER_SIZE = 10_000 # records kept in memory
+INFLUX_OVERFLOW = "drop_oldest" # drop_oldest | block | spill (to the spool)
+
+# records that could not be written are kept on disk and replayed once InfluxDB is back
+INFLUX_SPOOL = True
+# INFLUX_SPOOL_DIR = "instance/influx-spool"
+INFLUX_SPOOL_MAX_SIZE = 256 * 2**20 # bytes, oldest segments are dropped over this
+INFLUX_REPLAY_RATE = 5_000 # records per second
+
+# MQTT handlers run on a pool of workers instead of the network thread, 0 to run them inline
+MQTT_WORKERS = 4
+MQTT_WORKER_QUEUE_SIZE = 1_000 # per worker
+MQTT_ORDER_KEY = "topic" # topic | house | location, messages with the same key are handled in order
+
+# Several workers split the HOUSES between them, each subscribing to the houses of its shard through
+# the $share/<group>-<shard>/ shared subscription (one worker per shard, others are standbys)
+MQTT_SHARDS = 1
+MQTT_SHARD = 0 # of this worker, 0 to MQTT_SHARDS - 1
+MQTT_SHARE_GROUP = "justkeeplivin"
+
+# Several workers split the stream through the $share/<group>/ shared subscription instead, without
+# HOUSES, the security state lives on the one MQTT_LEADER (MQTT_CLIENT_ID must differ between workers,
+# rollups are tagged with it)
+MQTT_SHARED = False
+MQTT_LEADER = False # set in exactly one of the workers, every leader runs the security handlers
+
+# 1m and 1h min/max/mean/count rollups of numeric telemetry, dashboards read these for long ranges
+INFLUX_ROLLUP_BUCKET = "justkeeplivin_rollups" # the rollups variable of the dashboard
+INFLUX_ROLLUP_RETENTION = 0 # seconds, 0 keeps rollups forever
+INFLUX_RAW_RETENTION = None # seconds, None leaves the raw bucket as it is, shorter deletes older data
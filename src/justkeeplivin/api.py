@@ -2,8 +2,9 @@ import json
 from sqlite3.dbapi2 import paramstyle
 from http import HTTPStatus
 
-from .x.mqtt import mqtt
-from flask import jsonify, Blueprint, request, Response
+from .x import influxdb2
+from .x.mqtt import mqtt, dispatcher
+from flask import jsonify, Blueprint, request, Response, current_app
 
 api = Blueprint('api', __name__, url_prefix="/api")
 for bp in [
@@ -15,20 +16,28 @@ for bp in [
 
 # TODO: Figure out nicer api, and add support for switch with duration to hold for...
 
-# /api/living_room/switch?device=light&state=on
+# /api/living_room/switch?device=light&state=on&house=default
 @api.route("/<location>/switch", methods=['PATCH', 'PUT'])
 def switch_device(location: str):
     state = request.args.get("state", 'on')
     device = request.args.get("device")
+    house = request.args.get("house", current_app.config.get("DEFAULT_HOUSE", "default"))
 
     if not device:
         return jsonify({"error", f'Device must be specified.'}), 400
 
     match state:
         case 'on' | 'ON' | True | 'off' | 'OFF' | False:
-            mqtt.publish(f"cmd/home/{location}/{device}", json.dumps({ "state": state in {'on', 'ON', True} }))
+            mqtt.publish(f"cmd/home/{house}/{location}/{device}", json.dumps({ "state": state in {'on', 'ON', True} }))
             return Response(status=HTTPStatus.NO_CONTENT)
         case _:
             return jsonify({"error", f'State must be "ON" or "OFF". Not "{state}".'}), HTTPStatus.BAD_REQUEST
 
+@api.route("/stats")
+def stats():
+    return jsonify({
+        "mqtt": dispatcher.executor.stats if dispatcher.executor else None,
+        "influx": influxdb2.writer.stats if influxdb2.writer else None,
+    })
+
 #endregion
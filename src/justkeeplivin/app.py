@@ -6,6 +6,7 @@ from .routes import main
 from .api import api
 from .x import init_extensions
 from .telemetry import init_app as init_telemetry
+from .rollups import init_app as init_rollups
 from .security import init_app as init_security
 from .lighting import init_app as init_lighting
 
@@ -19,6 +20,7 @@ def create_app():
         app.register_blueprint(bp)
 
     init_telemetry(app)
+    init_rollups(app)
     init_security(app)
     init_lighting(app)
     return app
@@ -0,0 +1,135 @@
+import time
+import math
+from array import array
+from threading import Lock
+
+APPROACH = 1
+"""Someone came to the entrance from outside."""
+LEAVE = -1
+"""Someone went away from the entrance."""
+
+
+def timestamp(data: dict) -> float:
+    """When a reading was taken (Unix time), the pies stamp them, readings of a batch arrive together."""
+    ts = data.get("ts")
+    return ts if isinstance(ts, (int, float)) else time.time()
+
+
+class Entrance:
+    """Tells people coming in from people going out at an entrance, from the distances its ultrasonic sensor reads.
+
+    Distances go into a ring of the last ``size`` samples, preallocated arrays of times and distances,
+    so adding one is O(1) and keeps no objects. A crossing starts with the door opening or motion at the
+    entrance (:meth:`trigger`), when the samples of the ``window`` seconds before it came closer by at
+    least ``speed`` m/s it is an :data:`APPROACH`. Otherwise it stays open for ``window`` seconds and the
+    samples after it are fitted as they come (running sums of a least squares line, O(1) each), getting
+    farther by ``speed`` m/s is a :data:`LEAVE`. Triggers of an open crossing or within ``window`` of the
+    last one told apart are the same crossing, the door opening after the motion of someone coming in.
+    """
+    __slots__ = (
+        "window", "speed", "_times", "_distances", "_head", "_count", "_lock",
+        "_opened", "_decided", "_n", "_sx", "_sy", "_sxx", "_sxy",
+    )
+
+    def __init__(self, size: int = 32, window: float = 5, speed: float = .05):
+        self.window = window
+        self.speed = speed
+        self._times = array('d', bytes(8 * size))
+        self._distances = array('d', bytes(8 * size))
+        self._head = self._count = 0
+        self._lock = Lock() # samples and events come from different MQTT workers
+
+        self._opened: float | None = None
+        """When the open crossing started."""
+        self._decided = -math.inf
+        # least squares sums of the samples after the open crossing started, times counted from its start
+        self._n = 0
+        self._sx = self._sy = self._sxx = self._sxy = 0.
+
+    def add(self, t: float, distance: float) -> int:
+        """Adds a sample, returns :data:`LEAVE` if it tells the open crossing apart, else 0."""
+        with self._lock:
+            i = self._head
+            self._times[i] = t
+            self._distances[i] = distance
+            self._head = (i + 1) % len(self._times)
+            if self._count < len(self._times):
+                self._count += 1
+
+            if self._opened is None or t < self._opened:
+                return 0
+            if (x := t - self._opened) > self.window:
+                self._opened = None # nobody left
+                return 0
+
+            self._n += 1
+            self._sx += x
+            self._sy += distance
+            self._sxx += x * x
+            self._sxy += x * distance
+
+            if (slope := _slope(self._n, self._sx, self._sy, self._sxx, self._sxy)) is not None and slope >= self.speed:
+                self._opened = None
+                self._decided = t
+                return LEAVE
+            return 0
+
+    def trigger(self, t: float) -> int:
+        """The door opened or motion at ``t``, returns :data:`APPROACH` if the samples before it came closer, else 0."""
+        with self._lock:
+            if self._opened is not None or t - self._decided < self.window:
+                return 0
+
+            # the ring is small and triggers are rare, the samples before one are fitted here
+            n, sx, sy, sxx, sxy = 0, 0., 0., 0., 0.
+            size = len(self._times)
+            for back in range(1, self._count + 1):
+                i = (self._head - back) % size
+                if (x := self._times[i] - t) < -self.window:
+                    break
+                if x > 0:
+                    continue
+                y = self._distances[i]
+                n += 1
+                sx += x
+                sy += y
+                sxx += x * x
+                sxy += x * y
+
+            if (slope := _slope(n, sx, sy, sxx, sxy)) is not None and slope <= -self.speed:
+                self._decided = t
+                return APPROACH
+
+            self._opened = t
+            self._n = 0
+            self._sx = self._sy = self._sxx = self._sxy = 0.
+            return 0
+
+
+def _slope(n: int, sx: float, sy: float, sxx: float, sxy: float) -> float | None:
+    """Of the least squares line through the samples, ``None`` for fewer than two (or all at once)."""
+    if n < 2 or (denominator := n * sxx - sx * sx) <= 1e-12:
+        return None
+    return (n * sxy - sx * sy) / denominator
+
+
+class Entrances:
+    """Entrances of the houses, each made on the first reading at it."""
+
+    def __init__(self, locations: set[str], **options):
+        self.locations = locations
+        self.options = options
+        self._entrances: dict[tuple[str, str], Entrance] = {}
+        self._lock = Lock()
+
+    def get(self, house: str, location: str) -> Entrance | None:
+        """The entrance at a location of a house, ``None`` if it is not one."""
+        if entrance := self._entrances.get((house, location)):
+            return entrance
+        if location not in self.locations:
+            return None
+
+        with self._lock:
+            if (entrance := self._entrances.get((house, location))) is None:
+                entrance = self._entrances[house, location] = Entrance(**self.options)
+            return entrance
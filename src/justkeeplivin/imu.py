@@ -0,0 +1,106 @@
+import math
+
+import numpy as np
+
+
+class ImuWindow:
+    """Tells whether a device with an accelerometer was tilted or shaken, from the last ``size`` samples.
+
+    Samples go into a preallocated ``(size, 3)`` array, adding one is O(1) and keeps no objects. Every
+    ``batch`` samples (or the first one ``max_delay`` seconds after the last analysis, for slow or
+    change-only reporting devices) the window is analysed at once: the magnitude of every sample, their
+    variance relative to the median magnitude (shaking, whatever the units of the accelerometer) and the
+    tilt of the last ``confirm`` samples from the rest orientation, that of the first sample. The device
+    is tilted once all of those lean more than ``tilt`` degrees, so one spike does not do it, or once the
+    full window's relative variance is over ``shake``. It has to settle under half of both before it is
+    tilted again.
+    """
+    __slots__ = (
+        "batch", "max_delay", "tilt", "shake", "confirm", "_accel", "_head", "_count", "_pending",
+        "_analysed", "_rest", "_tilted", "magnitude", "variance", "angle",
+    )
+
+    def __init__(
+        self,
+        size: int = 8,
+        batch: int = 4,
+        max_delay: float = 2,
+        tilt: float = 15,
+        shake: float = .01,
+        confirm: int = 2,
+    ):
+        self.batch = batch
+        self.max_delay = max_delay
+        self.tilt = tilt
+        self.shake = shake
+        self.confirm = min(confirm, size)
+        self._accel = np.zeros((size, 3))
+        self._head = self._count = self._pending = 0
+        self._analysed = -math.inf
+        self._rest: np.ndarray | None = None
+        """Unit vector of gravity when the device is untouched."""
+        self._tilted = False
+
+        # of the last analysis
+        self.magnitude = self.variance = self.angle = math.nan
+
+    def add(self, t: float, accel) -> bool:
+        """Adds a sample taken at ``t``, returns ``True`` if the device just got tilted or shaken.
+
+        Raises :class:`ValueError` (or :class:`TypeError`) for anything but three numbers.
+        """
+        i = self._head
+        sample = self._accel[i]
+        sample[:] = accel
+        if not np.isfinite(sample).all(): # None is read as nan
+            raise ValueError(f"not a sample: {accel!r}")
+
+        if self._rest is None:
+            if (norm := np.linalg.norm(sample)) <= 1e-9:
+                return False # nothing read, not even gravity
+            self._rest = sample / norm
+
+        self._head = (i + 1) % len(self._accel)
+        if self._count < len(self._accel):
+            self._count += 1
+        self._pending += 1
+
+        if self._count < self.confirm or self._pending < self.batch and t - self._analysed < self.max_delay:
+            return False
+        self._pending = 0
+        self._analysed = t
+        return self._analyse()
+
+    def _analyse(self) -> bool:
+        size = len(self._accel)
+        accel = self._accel[:self._count] # the whole array once full
+        magnitude = np.sqrt(np.einsum("ij,ij->i", accel, accel))
+        if (median := float(np.median(magnitude))) <= 1e-9:
+            return False
+
+        recent = (self._head - 1 - np.arange(self.confirm)) % size
+        cos = accel[recent] @ self._rest / np.maximum(magnitude[recent], 1e-9)
+        self.angle = float(np.degrees(np.arccos(np.clip(cos.max(), -1, 1)))) # the least tilted of them
+        # a few samples after a start tell noise from shaking poorly
+        self.variance = float(np.var(magnitude / median)) if self._count == size else 0.
+        self.magnitude = median
+
+        if self._tilted:
+            self._tilted = self.angle >= self.tilt / 2 or self.variance >= self.shake / 2
+            return False
+        self._tilted = self.angle > self.tilt or self.variance > self.shake
+        return self._tilted
+
+
+class ImuWindows:
+    """Windows of the accelerometers of the houses, each made on the first sample of it."""
+
+    def __init__(self, **options):
+        self.options = options
+        self._windows: dict[tuple[str, str], ImuWindow] = {}
+
+    def get(self, house: str, location: str) -> ImuWindow:
+        # a device's samples come on one topic, handled in order by one worker, so no locks
+        if (window := self._windows.get((house, location))) is None:
+            window = self._windows.setdefault((house, location), ImuWindow(**self.options))
+        return window
@@ -1,32 +1,31 @@
 import json
 
-from .x.mqtt import mqtt, try_parse_message, Message, Client
+from .x.mqtt import mqtt, on_json_topic, subscribe, JsonMessage, Client
 
 
 topics = [
-    ("home/+/motion", 0),
+    ("home/+/+/motion", 0),
 ]
 
 def init_app(app):
-    mqtt.subscribe(topics)
+    subscribe(topics)
 
-@mqtt.on_topic("home/+/motion")
-def on_motion_switch_light_on(client: Client, userdata: object, message: Message):
-    location = message.topic.split('/')[1]
-
-    if (data := try_parse_message(message)) and data.get("detected"):
+@on_json_topic("home/+/+/motion")
+def on_motion_switch_light_on(client: Client, userdata: object, message: JsonMessage, house: str, location: str):
+    if message.json.get("detected"):
         mqtt.publish(
-            f"cmd/home/{location}/light",
+            f"cmd/home/{house}/{location}/light",
             json.dumps({
                 "action": "on",
                 "for": 10
             })
         )
 
-@mqtt.on_topic("home/master_bedroom/remote")
-def on_brgb_remote_message(client: Client, userdata: object, message: Message):
-    if data := try_parse_message(message):
-        match button := data.get("button"):
-            case _:
-                # TODO: send commands to "cmd/home/master_bedroom/brgb"
-                ...
+@on_json_topic("home/+/master_bedroom/remote")
+def on_brgb_remote_message(client: Client, userdata: object, message: JsonMessage, house: str):
+    data = message.json
+
+    match button := data.get("button"):
+        case _:
+            # TODO: send commands to "cmd/home/<house>/master_bedroom/brgb"
+            ...
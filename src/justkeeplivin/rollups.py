@@ -0,0 +1,194 @@
+import time
+import atexit
+import logging
+from dataclasses import dataclass, field
+from threading import Lock, Thread, Event
+from typing import Callable, Iterable
+
+from .x.influxdb2 import write as _write
+from .x.influxdb2.lineprotocol import LineEncoder, format_float
+
+_logger = logging.getLogger(__name__)
+
+NS = 1_000_000_000
+
+WINDOWS: dict[str, int] = {
+    "1m": 60,
+    "1h": 60 * 60,
+}
+"""Rollup windows by the suffix of their measurement (``temperature_1m``), in seconds."""
+
+
+@dataclass
+class _Aggregate:
+    min: float = float("inf")
+    max: float = float("-inf")
+    sum: float = 0
+    count: int = 0
+
+    def add(self, value: float):
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.sum += value
+        self.count += 1
+
+    def fields(self, name: str) -> str:
+        return (
+            f"{name}_min={format_float(self.min)},{name}_max={format_float(self.max)},"
+            f"{name}_mean={format_float(self.sum / self.count)},{name}_count={self.count}i"
+        )
+
+@dataclass
+class _Window:
+    start: int
+    """Start of the window in ns, also the timestamp of the rollup point."""
+    aggregates: dict[str, _Aggregate] = field(default_factory=dict)
+
+
+class Rollups:
+    """Keeps min/max/mean/count of numeric fields per window, house, location and simulated flag in memory.
+
+    Samples are added as they are ingested, a window is written as a ``<measurement>_<window>`` point
+    once a sample from the next window arrives, or by :meth:`flush` once the window has ended (with a
+    grace period for late samples). Windows are aligned to the epoch, like Flux's ``aggregateWindow``.
+
+    Workers that share the stream each see part of a window, with a ``worker`` their rollups are tagged
+    with it so they do not overwrite each other's. Queries merge them per window, the min of the mins,
+    the max of the maxes, the sum of the counts and the mean weighted by them (see the dashboard).
+    """
+
+    def __init__(
+        self,
+        windows: dict[str, int] = WINDOWS,
+        bucket: str | None = None,
+        grace: float = 5,
+        write: Callable[[str, str | None], None] = _write,
+        worker: str | None = None,
+    ):
+        self.windows = {label: seconds * NS for label, seconds in windows.items()}
+        self.bucket = bucket
+        self.grace = int(grace * NS)
+        self.write = write
+        self.worker = worker
+
+        # measurement -> rolled up fields
+        self._fields: dict[str, tuple[str, ...]] = {}
+        self._encoders: dict[tuple[str, str], LineEncoder] = {}
+        # (measurement, window label, house, location, simulated) -> window
+        self._open: dict[tuple[str, str, str, str, bool], _Window] = {}
+        # start of the last written window, so late samples do not overwrite it with a partial one
+        self._written: dict[tuple[str, str, str, str, bool], int] = {}
+        self._lock = Lock()
+
+    def track(self, measurement: str, fields: Iterable[str]):
+        self._fields[measurement] = tuple(fields)
+
+    def _encoder(self, measurement: str, label: str) -> LineEncoder:
+        # NOTE: made on the first write, the worker is only known once the app is configured
+        if not (encoder := self._encoders.get((measurement, label))):
+            encoder = self._encoders[measurement, label] = LineEncoder(
+                f"{measurement}_{label}",
+                ("house", "location", "simulated", "worker") if self.worker else ("house", "location", "simulated"),
+                {"location": str.upper},
+            )
+        return encoder
+
+    def add(self, measurement: str, house: str, location: str, simulated: bool, values: dict, timestamp: int):
+        if not (fields := self._fields.get(measurement)):
+            return
+
+        closed = []
+
+        with self._lock:
+            for label, size in self.windows.items():
+                start = timestamp - timestamp % size
+                key = measurement, label, house, location, simulated
+                window = self._open.get(key)
+
+                if window is None or window.start < start:
+                    if start <= self._written.get(key, -1):
+                        continue # late sample for an already written window
+
+                    if window:
+                        closed.append((key, window))
+                        self._written[key] = window.start
+                    window = self._open[key] = _Window(start)
+                elif window.start > start:
+                    continue # late sample for an already written window
+
+                aggregates = window.aggregates
+                for name in fields:
+                    if (value := values.get(name)) is not None:
+                        (aggregates.get(name) or aggregates.setdefault(name, _Aggregate())).add(value)
+
+        self._write(closed)
+
+    def flush(self, now: int, force: bool = False):
+        """Writes the windows that ended before ``now`` (ns) minus the grace period, all of them if ``force``."""
+        with self._lock:
+            closed = [
+                (key, window)
+                for key, window in self._open.items()
+                if force or window.start + self.windows[key[1]] + self.grace <= now
+            ]
+
+            for key, window in closed:
+                del self._open[key]
+                self._written[key] = window.start
+
+        self._write(closed)
+
+    def _write(self, closed: list[tuple[tuple[str, str, str, str, bool], _Window]]):
+        for (measurement, label, house, location, simulated), window in closed:
+            if not window.aggregates:
+                continue
+
+            fields = ",".join(aggregate.fields(name) for name, aggregate in window.aggregates.items())
+            tags = (house, location, simulated, self.worker) if self.worker else (house, location, simulated)
+            line = self._encoder(measurement, label).encode(tags, fields, window.start)
+
+            try:
+                self.write(line, self.bucket)
+            except Exception:
+                _logger.exception("Failed to write %s rollup", measurement)
+
+
+class RollupFlusher(Thread):
+    """Flushes ended windows periodically, so quiet sensors still get their rollups written."""
+
+    def __init__(self, rollups: Rollups, interval: float = 10):
+        super().__init__(name=self.__class__.__name__, daemon=True)
+        self.rollups = rollups
+        self.interval = interval
+        self.stopping = Event()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            self.rollups.flush(time.time_ns())
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+        self.rollups.flush(0, force=True)
+
+
+rollups = Rollups()
+
+def init_app(app):
+    from .x import influxdb2
+
+    rollups.bucket = app.config.get("INFLUX_ROLLUP_BUCKET")
+    rollups.grace = int(app.config.get("ROLLUP_GRACE", 5) * NS)
+    if app.config.get("MQTT_SHARED", False):
+        rollups.worker = app.config.get("MQTT_CLIENT_ID", "justkeeplivin")
+
+    if rollups.bucket:
+        influxdb2.ensure_bucket(rollups.bucket, app.config.get("INFLUX_ROLLUP_RETENTION"))
+    if (retention := app.config.get("INFLUX_RAW_RETENTION")) is not None:
+        influxdb2.ensure_bucket(influxdb2.DEFAULT_BUCKET, retention)
+
+    flusher = RollupFlusher(rollups, app.config.get("ROLLUP_FLUSH_INTERVAL", 10))
+    flusher.start()
+    atexit.register(flusher.stop)
@@ -1,19 +1,34 @@
+import os
 import json
-from dataclasses import dataclass, field
-from threading import Timer, Lock
+import time
+import atexit
+import logging
+import sqlite3
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from queue import SimpleQueue
+from threading import Lock, Thread
+from typing import Callable
 
 from flask import Flask
 from abc import ABC, abstractmethod
-from .x.mqtt import mqtt, Client, try_parse_message, Message
+from .x import mqtt as x_mqtt
+from .x.mqtt import mqtt, on_json_topic, subscribe, Client, JsonMessage
 from .x.influxdb2 import write, Point
+from .x.timers import timers, TimerHandle
+from .fusion import APPROACH, LEAVE, Entrances, timestamp
+from .imu import ImuWindows
+
+_logger = logging.getLogger(__name__)
 
-# NOTE: there are some threading races but should be fine :)
 
 @dataclass
 class SecurityEvent:
     type: str
     source: str | None = None
     extra: dict = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+    """When it happened (Unix time), deadlines are counted from it so a replay schedules them the same."""
 
     PERSON_ENTERED = "PERSON_ENTERED"
     PERSON_EXITED = "PERSON_EXITED"
@@ -26,8 +41,13 @@ class SecurityEvent:
     ARMING = "ARMING"
     ARM = "ARM"
     ALARM = "ALARM"
+    # submitted by the timers of the states, with the deadline they were for
+    ARMING_ELAPSED = "ARMING_ELAPSED"
+    ALARM_DUE = "ALARM_DUE"
 
 class SecurityState(ABC):
+    deadline: float | None = None
+    """Of the timer the state waits on (Unix time), ``None`` if there is none."""
 
     @abstractmethod
     def handle_event(self, event: SecurityEvent): ...
@@ -39,21 +59,32 @@ class SecurityState(ABC):
         pass
 
 class SecurityContext:
+    """Security state of a house.
+
+    Events are only applied by the thread of its :class:`SecurityContexts`, so nothing in here is
+    shared between threads. Timers do not change the state themselves, they submit an event. While
+    the context is ``replaying`` its log nothing leaves it, no alarm points, commands or timers.
+    """
 
-    def __init__(self, security_pin: str):
-        self._state_lock = Lock()
+    def __init__(self, security_pin: str, house: str = "default", submit: Callable[[str, SecurityEvent], None] | None = None):
         self.security_pin = security_pin
+        self.house = house
         self.people_counter: int = 0
-        self.state = DisarmedState(self)
+        self.replaying = False
+        self.now = time.time()
+        """Timestamp of the event being handled."""
+        self._submit = submit
+        self._state: SecurityState = DisarmedState(self)
 
     def handle_event(self, event: SecurityEvent | str):
         event = event if isinstance(event, SecurityEvent) else SecurityEvent(type=event)
+        self.now = event.timestamp
 
         match event.type:
             case SecurityEvent.PERSON_ENTERED:
                 self.people_counter += 1
             case SecurityEvent.PERSON_EXITED:
-                self.people_counter = min(0, self.people_counter - 1)
+                self.people_counter = max(0, self.people_counter - 1)
             case SecurityEvent.DISARM | SecurityEvent.ARM | SecurityEvent.ALARM | SecurityEvent.ARMING:
                 State = {
                     SecurityEvent.DISARM: DisarmedState,
@@ -68,7 +99,17 @@ class SecurityContext:
         self.state.handle_event(event)
 
     def is_pin_correct(self, event: SecurityEvent):
-        return self.security_pin == event.extra.get("pin")
+        if "correct" in event.extra: # checked once submitted, the pin is not logged
+            return event.extra["correct"]
+        return self.security_pin is not None and self.security_pin == event.extra.get("keys") # as typed on the keypad
+
+    def call_at(self, deadline: float, event_type: str) -> TimerHandle | None:
+        """Submits an ``event_type`` event for this house at ``deadline``, unless replaying."""
+        if self.replaying or self._submit is None:
+            return None
+
+        event = SecurityEvent(event_type, source="timer", extra={"deadline": deadline}, timestamp=deadline)
+        return timers.call_later(deadline - time.time(), self._submit, self.house, event)
 
     @property
     def state(self) -> SecurityState:
@@ -76,10 +117,217 @@ class SecurityContext:
 
     @state.setter
     def state(self, new_state: SecurityState):
-        with self._state_lock: # at least make this atomic change
-            if hasattr(self, "_state"): self._state.on_exit()
-            new_state.on_enter()
-            self._state = new_state
+        self._state.on_exit()
+        new_state.on_enter()
+        self._state = new_state
+
+    def snapshot(self) -> dict:
+        return {
+            "state": type(self._state).__name__,
+            "deadline": self._state.deadline,
+            "people_counter": self.people_counter,
+        }
+
+    def restore(self, snapshot: dict):
+        """Puts the context back in a snapshotted state, without entering it."""
+        state = STATES[snapshot["state"]](self)
+        state.deadline = snapshot.get("deadline")
+        self._state = state
+        self.people_counter = snapshot.get("people_counter", 0)
+
+    def resume(self):
+        """Enters the state again once replayed, so it schedules its timer (again)."""
+        self._state.on_enter()
+
+
+_STOP = object()
+
+class SecurityContexts:
+    """Security contexts of the houses, each made on the first event of its house, and the thread that runs them.
+
+    Pins come from ``HOUSES`` (``{"<house>": {"pin": "1234"}}``), houses without one use ``HOME_PIN``.
+
+    Events are :meth:`submit`\\ ted from any thread and applied one after another by the ``security``
+    thread, the only one that touches the contexts. With a ``log`` every event is appended to it once
+    applied, with the state of its house, and the log is compacted every ``compact_every``
+    events. :meth:`start` first restores the houses from it, their states, pending deadlines and people
+    counters (``restore_time`` is how long that took).
+    """
+
+    def __init__(self, houses: dict[str, dict], default_pin: str | None, log: 'EventLog | None' = None, compact_every: int = 1_000):
+        self.houses = houses
+        self.default_pin = default_pin
+        self.log = log
+        self.compact_every = compact_every
+        self.restore_time = 0.
+        self._contexts: dict[str, SecurityContext] = {}
+        self._lock = Lock()
+        self._queue: SimpleQueue = SimpleQueue()
+        self._thread: Thread | None = None
+
+    def __getitem__(self, house: str) -> SecurityContext:
+        if context := self._contexts.get(house):
+            return context
+
+        with self._lock:
+            if (context := self._contexts.get(house)) is None:
+                pin = self.houses.get(house, {}).get("pin", self.default_pin)
+                context = self._contexts[house] = SecurityContext(pin, house, self.submit)
+            return context
+
+    def __iter__(self):
+        return iter(list(self._contexts.values()))
+
+    def __len__(self) -> int:
+        return len(self._contexts)
+
+    def submit(self, house: str, event: SecurityEvent | str):
+        """Queues an event of a house, safe to call from any thread."""
+        self._queue.put((house, event if isinstance(event, SecurityEvent) else SecurityEvent(type=event)))
+
+    def start(self) -> 'SecurityContexts':
+        if self.log:
+            started = time.perf_counter()
+            self.replay(*self.log.load())
+            self.restore_time = time.perf_counter() - started
+            _logger.info("Restored %d house(s) in %.2fms", len(self), self.restore_time * 1e3)
+
+        self._thread = Thread(target=self._run, name="security", daemon=True)
+        self._thread.start()
+        return self
+
+    def replay(self, snapshot: dict[str, dict], events: list[tuple[str, SecurityEvent]]):
+        """Rebuilds the contexts from their snapshots and the events after them, then resumes them."""
+        for house, data in snapshot.items():
+            self[house].restore(data)
+
+        for house, event in events:
+            context = self[house]
+            context.replaying = True
+            self._apply(context, event)
+        for context in self:
+            context.replaying = False
+            context.resume()
+
+    def _apply(self, context: SecurityContext, event: SecurityEvent):
+        try:
+            context.handle_event(event)
+        except Exception:
+            _logger.exception("Handling %s of house %s failed", event.type, context.house)
+
+    def _run(self):
+        while (item := self._queue.get()) is not _STOP:
+            house, event = item
+            context = self[house]
+
+            if event.type == SecurityEvent.PIN_ENTERED:
+                event = replace(event, extra={"correct": context.is_pin_correct(event)})
+
+            self._apply(context, event)
+
+            if self.log:
+                self._logged(lambda log: log.append(house, event, context.snapshot()))
+
+                if self.log.seq % self.compact_every == 0:
+                    self._logged(EventLog.compact)
+
+        if self.log:
+            self.log.close()
+
+    def _logged(self, operation: Callable[['EventLog'], None]):
+        # NOTE: the houses are still guarded without the log, it only matters for the next start
+        try:
+            operation(self.log)
+        except sqlite3.Error:
+            _logger.exception("Security event log failed")
+
+    def stop(self):
+        """Applies the events submitted so far, then closes the log."""
+        if self._thread:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+
+class EventLog:
+    """Security events and the last state of every house, in a SQLite database in WAL mode.
+
+    Every event is appended to ``events`` in the same transaction as the state of its house after it,
+    so the ``houses`` table is a snapshot that is never behind a committed event (and a crash loses the
+    last events whole, not half of one). A house's row records the last event it includes, events after
+    it (appended without a state, by hand) are replayed on load. :meth:`compact` deletes the events
+    appended so far.
+    """
+
+    def __init__(self, path: str | os.PathLike, synchronous: str = "NORMAL"):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.seq = 0
+
+        # only used by the security thread once loaded
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA synchronous={synchronous}") # NORMAL: durable up to the last checkpoint in WAL mode
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                seq INTEGER PRIMARY KEY,
+                house TEXT NOT NULL,
+                type TEXT NOT NULL,
+                source TEXT,
+                extra TEXT NOT NULL,
+                timestamp REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS houses (
+                house TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                deadline REAL,
+                people_counter INTEGER NOT NULL,
+                seq INTEGER NOT NULL
+            );
+        """)
+
+    def load(self) -> tuple[dict[str, dict], list[tuple[str, SecurityEvent]]]:
+        """Returns the snapshots of the houses and the events after them."""
+        snapshot = {
+            house: {"state": state, "deadline": deadline, "people_counter": people_counter}
+            for house, state, deadline, people_counter in self._db.execute("SELECT house, state, deadline, people_counter FROM houses")
+        }
+
+        events = [
+            (house, SecurityEvent(type, source, json.loads(extra), timestamp))
+            for house, type, source, extra, timestamp in self._db.execute("""
+                SELECT e.house, e.type, e.source, e.extra, e.timestamp FROM events e LEFT JOIN houses h USING (house)
+                WHERE e.seq > coalesce(h.seq, 0) ORDER BY e.seq
+            """)
+        ]
+
+        self.seq = self._db.execute("SELECT max(coalesce((SELECT max(seq) FROM events), 0), coalesce((SELECT max(seq) FROM houses), 0))").fetchone()[0]
+        return snapshot, events
+
+    def append(self, house: str, event: SecurityEvent, snapshot: dict | None = None):
+        """Appends an event, with the state of its house after it."""
+        self.seq += 1
+
+        with self._db: # one transaction
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)",
+                (self.seq, house, event.type, event.source, json.dumps(event.extra, ensure_ascii=False), event.timestamp),
+            )
+            if snapshot is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO houses VALUES (?, ?, ?, ?, ?)",
+                    (house, snapshot["state"], snapshot["deadline"], snapshot["people_counter"], self.seq),
+                )
+
+    def compact(self):
+        """Deletes the events appended so far, the houses they changed are saved with them."""
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM events WHERE seq <= ?", (self.seq,))
+
+    def close(self):
+        self._db.close()
 
 
 class DisarmedState(SecurityState):
@@ -97,29 +345,29 @@ class ArmingState(SecurityState):
 
     def __init__(self, context: SecurityContext, arming_delay: float = 10):
         self.context = context
-        self.timer = Timer(arming_delay, self._arm)
+        self.deadline = context.now + arming_delay
+        self.timer: TimerHandle | None = None
 
     def handle_event(self, event: SecurityEvent):
         match event.type:
             case SecurityEvent.PIN_ENTERED if self.context.is_pin_correct(event):
                 self.context.state = DisarmedState(self.context)
+            case SecurityEvent.ARMING_ELAPSED if event.extra.get("deadline") == self.deadline:
+                self.context.state = ArmedState(self.context)
 
     def on_enter(self):
-        self.timer.start()
+        self.timer = self.context.call_at(self.deadline, SecurityEvent.ARMING_ELAPSED)
 
     def on_exit(self):
-        self.timer.cancel()
-
-    def _arm(self):
-        self.context.state = ArmedState(self.context)
+        if self.timer:
+            self.timer.cancel()
 
 
 class ArmedState(SecurityState):
 
     def __init__(self, context: SecurityContext):
         self.context = context
-        self.alarm_timer: Timer | None = None
-        self.alarm_lock = Lock()
+        self.alarm_timer: TimerHandle | None = None
 
     def handle_event(self, event: SecurityEvent):
         match event.type:
@@ -131,24 +379,28 @@ class ArmedState(SecurityState):
                 self._schedule_alarm()
             case SecurityEvent.PIN_ENTERED if self.context.is_pin_correct(event):
                 self._dismiss_alarm()
+            case SecurityEvent.ALARM_DUE if self.deadline is not None and event.extra.get("deadline") == self.deadline:
+                self._trigger_alarm()
             # case SecurityEvent.PIN_ENTERED if self.context.is_pin_correct(event):
             #     self.context.state = DisarmedState(self.context)
 
     def _dismiss_alarm(self):
-        with self.alarm_lock:
-            if self.alarm_timer:
-                self.alarm_timer.cancel()
-                self.alarm_timer = None
+        if self.alarm_timer:
+            self.alarm_timer.cancel()
+        self.alarm_timer = self.deadline = None
 
     def _schedule_alarm(self, delay: float = 10):
-        with self.alarm_lock:
-            if not self.alarm_timer:
-                self.alarm_timer = Timer(delay, self._trigger_alarm)
-                self.alarm_timer.start()
+        if self.deadline is None:
+            self.deadline = self.context.now + delay
+            self.alarm_timer = self.context.call_at(self.deadline, SecurityEvent.ALARM_DUE)
 
     def _trigger_alarm(self):
         self.context.state = AlarmState(self.context)
 
+    def on_enter(self):
+        if self.deadline is not None: # resumed with an alarm pending
+            self.alarm_timer = self.context.call_at(self.deadline, SecurityEvent.ALARM_DUE)
+
     def on_exit(self):
         self._dismiss_alarm()
 
@@ -165,69 +417,128 @@ class AlarmState(SecurityState):
 
     # TODO: Notification?!
     def on_enter(self):
+        if self.context.replaying:
+            return
+
         write(
             Point("alarm")
+            .tag("house", self.context.house)
             .field("enabled", True)
         )
         mqtt.publish(
-            "cmd/home/porch/buzz",
+            f"cmd/home/{self.context.house}/porch/buzz",
             json.dumps({
                 "action": "on"
             })
         )
 
     def on_exit(self):
+        if self.context.replaying:
+            return
+
         write(
             Point("alarm")
+            .tag("house", self.context.house)
             .field("enabled", False)
         )
         mqtt.publish(
-            "cmd/home/porch/buzz",
+            f"cmd/home/{self.context.house}/porch/buzz",
             json.dumps({
                 "action": "off"
             })
         )
 
+STATES: dict[str, type[SecurityState]] = {
+    State.__name__: State for State in (DisarmedState, ArmingState, ArmedState, AlarmState)
+}
+
+
 topics = [
-    ("home/+/motion", 0),
-    ("home/+/typing", 0),
+    ("home/+/+/motion", 0),
+    ("home/+/+/door", 0),
+    ("home/+/+/proximity", 0),
+    ("home/+/+/typing", 0),
+    ("home/+/икона/gyro", 0),
 ]
 
+def _event_log(app: Flask) -> EventLog | None:
+    # workers sharing the stream only log on the leader, shards each in their own database
+    if not app.config.get("SECURITY_LOG", True) or x_mqtt.share_group is not None and x_mqtt.leader is None:
+        return None
+
+    path = Path(app.config.get("SECURITY_DB", os.path.join(app.instance_path, "security.db")))
+    if x_mqtt.shard is not None:
+        path = path.with_stem(f"{path.stem}-{x_mqtt.shard}")
+    return EventLog(path, app.config.get("SECURITY_SYNCHRONOUS", "NORMAL"))
+
 def init_app(app: Flask):
-    security_context = SecurityContext(security_pin=app.config.get("HOME_PIN"))
-    app.security_context = security_context
-
-    @mqtt.on_topic("home/+/motion")
-    def on_motion(client: Client, userdata: object, message: Message):
-        location = message.topic.split('/')[1]
-
-        if (data := try_parse_message(message)) and data.get("detected", False):
-            security_context.handle_event(SecurityEvent.MOTION_DETECTED)
-
-            if location in {"porch", "garage"}:
-                security_context.handle_event(SecurityEvent.APPROACHED_DOOR)
-
-                # TODO: Based on ultrasonic sensor data determine if person is approaching/leaving (entering or exiting the house)
-                import random
-                security_context.handle_event(random.choice([SecurityEvent.PERSON_ENTERED, SecurityEvent.PERSON_EXITED]))
-
-    @mqtt.on_topic("home/porch/typing")
-    def on_pin_entered(client: Client, userdata: object, message: Message):
-        if data := try_parse_message(message):
-            security_context.handle_event(SecurityEvent(
-                SecurityEvent.PIN_ENTERED,
-                extra={
-                    "keys": data.get("keys"),
-                }
-            ))
-
-    @mqtt.on_topic("home/икона/gyro")
-    def on_ikona_gyro(client: Client, userdata: object, message: Message):
-        if data := try_parse_message(message):
-            accel = data["accel"]
-            magnitude = sum(xi**2 for xi in accel.values())**1/2
-
-            if magnitude > 0.5:
-                security_context.handle_event(SecurityEvent.IKONA_TILTED)
-
-    mqtt.subscribe(topics)
+    security_contexts = SecurityContexts(
+        app.config.get("HOUSES", {}),
+        default_pin=app.config.get("HOME_PIN"),
+        log=_event_log(app),
+        compact_every=app.config.get("SECURITY_COMPACT_EVERY", 1_000),
+    ).start()
+    atexit.register(security_contexts.stop)
+    app.security_contexts = security_contexts
+
+    entrances = Entrances(
+        set(app.config.get("SECURITY_ENTRANCES", ("porch", "garage"))),
+        window=app.config.get("SECURITY_CROSSING_WINDOW", 5),
+    )
+    imus = ImuWindows(
+        size=app.config.get("IMU_WINDOW", 8),
+        batch=app.config.get("IMU_BATCH", 4),
+        confirm=app.config.get("IMU_CONFIRM", 2),
+        tilt=app.config.get("IMU_TILT_THRESHOLD", 15),
+        shake=app.config.get("IMU_SHAKE_THRESHOLD", .01),
+    )
+
+    def crossed(house: str, location: str, direction: int):
+        if direction == APPROACH:
+            security_contexts.submit(house, SecurityEvent(SecurityEvent.PERSON_ENTERED, source=location))
+        elif direction == LEAVE:
+            security_contexts.submit(house, SecurityEvent(SecurityEvent.PERSON_EXITED, source=location))
+
+    @on_json_topic("home/+/+/motion", pinned=True)
+    def on_motion(client: Client, userdata: object, message: JsonMessage, house: str, location: str):
+        if message.json.get("detected", False):
+            security_contexts.submit(house, SecurityEvent.MOTION_DETECTED)
+
+            if entrance := entrances.get(house, location):
+                security_contexts.submit(house, SecurityEvent.APPROACHED_DOOR)
+                crossed(house, location, entrance.trigger(timestamp(message.json)))
+
+    @on_json_topic("home/+/+/door", pinned=True)
+    def on_door(client: Client, userdata: object, message: JsonMessage, house: str, location: str):
+        if message.json.get("open", False) and (entrance := entrances.get(house, location)):
+            crossed(house, location, entrance.trigger(timestamp(message.json)))
+
+    @on_json_topic("home/+/+/proximity", pinned=True)
+    def on_proximity(client: Client, userdata: object, message: JsonMessage, house: str, location: str):
+        distance = message.json.get("distance")
+        if isinstance(distance, (int, float)) and (entrance := entrances.get(house, location)):
+            crossed(house, location, entrance.add(timestamp(message.json), distance))
+
+    @on_json_topic("home/+/porch/typing", pinned=True)
+    def on_pin_entered(client: Client, userdata: object, message: JsonMessage, house: str):
+        data = message.json
+
+        security_contexts.submit(house, SecurityEvent(
+            SecurityEvent.PIN_ENTERED,
+            extra={
+                "keys": data.get("keys"),
+            }
+        ))
+
+    @on_json_topic("home/+/икона/gyro", pinned=True)
+    def on_ikona_gyro(client: Client, userdata: object, message: JsonMessage, house: str):
+        try:
+            tilted = imus.get(house, "икона").add(timestamp(message.json), message.json.get("accel"))
+        except (TypeError, ValueError):
+            _logger.warning("Dropping gyro reading of %s without three accel numbers: %r", house, message.json)
+            return
+
+        if tilted:
+            security_contexts.submit(house, SecurityEvent(SecurityEvent.IKONA_TILTED, source="икона"))
+
+    subscribe(topics, pinned=True) # the state of a house lives in one worker
@@ -1,125 +1,190 @@
-from typing import cast
-
-from .x.mqtt import mqtt, Client, try_parse_message, Message
-from .x.influxdb2 import write, Point
-
-topics = [
-    ("home/+/door", 0),
-    ("home/+/motion", 0),
-    ("home/+/proximity", 0),
-    ("home/+/temperature", 0),
-    ("home/+/typing", 0),
-    ("home/+/gyro", 0),
-    ("home/+/remote", 0),
-    ("home/+/timer", 0),
-]
+import math
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable
 
-def init_app(app):
-    mqtt.subscribe(topics)
+from .x.mqtt import on_json_topic, subscribe, Client, JsonMessage
+from .x.influxdb2 import write
+from .x.influxdb2.lineprotocol import FORMATTERS, LineEncoder, escape_key
+from .rollups import rollups
+
+_logger = logging.getLogger(__name__)
 
+KEY_HOUSE = "house"
 KEY_LOCATION = "location"
 KEY_SIMULATED = "simulated"
 
 def _is_simulated(data: dict) -> bool:
     return data.get(KEY_SIMULATED, False) in {True, 'true', 'True', 1}
 
-@mqtt.on_topic("home/+/door")
-def on_door_message(client: Client, userdata: object, message: Message):
-    location = message.topic.split('/')[1]
-
-    if data := try_parse_message(message):
-        write(
-            Point("door")
-            .tag(KEY_LOCATION, location.upper())
-            .tag(KEY_SIMULATED, _is_simulated(data))
-            .field("open", data["open"])
-        )
-
-@mqtt.on_topic("home/+/motion")
-def on_motion_message(client: Client, userdata: object, message: Message):
-    location = message.topic.split('/')[1]
-
-    if data := try_parse_message(message):
-        write(
-            Point("motion")
-            .tag(KEY_LOCATION, location.upper())
-            .tag(KEY_SIMULATED, _is_simulated(data))
-            .field("detected", data["detected"])
-        )
-
-@mqtt.on_topic("home/+/proximity")
-def on_proximity_message(client: Client, userdata: object, message: Message):
-    location = message.topic.split('/')[1]
-
-    if data := try_parse_message(message):
-        write(
-            Point("proximity")
-            .tag(KEY_LOCATION, location.upper())
-            .tag(KEY_SIMULATED, _is_simulated(data))
-            .field("distance", data["distance"]) # meters (see if it could be like 2m or 20cm)
-            .field("in_range", data["in_range"])
-        )
-
-@mqtt.on_topic("home/+/typing")
-def on_typing_message(client: Client, userdata: object, message: Message):
-    location = message.topic.split('/')[1]
-
-    if data := try_parse_message(message):
-        write(
-            Point("typing")
-            .tag(KEY_LOCATION, location.upper())
-            .tag(KEY_SIMULATED, _is_simulated(data))
-            .field("keys", data["keys"]) # typed keys
-        )
-
-@mqtt.on_topic("home/+/temperature")
-def on_temperature_message(client: Client, userdata: object, message: Message):
-    location = message.topic.split('/')[1]
-
-    if data := try_parse_message(message):
-        write(
-            Point("temperature")
-            .tag(KEY_LOCATION, location.upper())
-            .tag(KEY_SIMULATED, _is_simulated(data))
-            .field("temperature", data["temperature"])
-            .field("humidity", data["humidity"])
-        )
-
-@mqtt.on_topic("home/+/remote")
-def on_ir_message(client: Client, userdata: object, message: Message):
-    location = message.topic.split('/')[1]
-
-    if data := try_parse_message(message):
-        write(
-            Point("remote")
-            .tag(KEY_LOCATION, location.upper())
-            .tag(KEY_SIMULATED, _is_simulated(data))
-            .field("button", data["button"])
-        )
-
-@mqtt.on_topic("home/+/gyro")
-def on_gyro_message(client: Client, userdata: object, message: Message):
-    location = message.topic.split('/')[1]
-
-    if data := try_parse_message(message):
-        write(
-            Point("gyro")
-            .tag(KEY_LOCATION, location.upper())
-            .tag(KEY_SIMULATED, _is_simulated(data))
-            .field("accel", accel := data["accel"])
-            .field("gyro", data["gyro"])
-            .field("magnitude", magnitude := sum(xi**2 for xi in accel)**0.5)
-            .field("significant_movement", magnitude > 0.5) # g
-        )
-
-@mqtt.on_topic("home/+/timer")
-def on_timer_message(client: Client, userdata: object, message: Message):
-    location = message.topic.split('/')[1]
-
-    if data := try_parse_message(message):
-        write(
-            Point("timer")
-            .tag(KEY_LOCATION, location.upper())
-            .tag(KEY_SIMULATED, _is_simulated(data))
-            .field("event", data["event"]) # reset | expired (maybe also set new timer delay confirmation "set")
-        )
+#region Schema
+
+@dataclass(frozen=True)
+class Field:
+    name: str
+    type: type = float
+    key: str | None = None
+    """Payload key, defaults to the field name."""
+    derive: Callable[[dict], Any] | None = None
+    """Computes the value from the (already validated) fields instead of reading it from the payload."""
+
+@dataclass(frozen=True)
+class Vector:
+    """Sequence in the payload, stored as one float field per component (``accel_x``, ``accel_y``, ...)."""
+    name: str
+    components: tuple[str, ...] = ("x", "y", "z")
+
+@dataclass(frozen=True)
+class Measurement:
+    topic: str
+    """Topic filter, the first wildcard is the house and the second the location."""
+    name: str
+    fields: tuple[Field | Vector, ...] = field(default_factory=tuple)
+
+
+def _magnitude(values: dict) -> float:
+    return math.hypot(values["accel_x"], values["accel_y"], values["accel_z"])
+
+SCHEMA = (
+    Measurement("home/+/+/door", "door", (Field("open", bool),)),
+    Measurement("home/+/+/motion", "motion", (Field("detected", bool),)),
+    Measurement("home/+/+/proximity", "proximity", (
+        Field("distance"), # meters (see if it could be like 2m or 20cm)
+        Field("in_range", bool),
+    )),
+    Measurement("home/+/+/typing", "typing", (Field("keys", str),)), # typed keys
+    Measurement("home/+/+/temperature", "temperature", (
+        Field("temperature"),
+        Field("humidity"),
+    )),
+    Measurement("home/+/+/remote", "remote", (Field("button", str),)),
+    Measurement("home/+/+/gyro", "gyro", (
+        Vector("accel"),
+        Vector("gyro"),
+        Field("magnitude", derive=_magnitude),
+        Field("significant_movement", bool, derive=lambda values: values["magnitude"] > 0.5), # g
+    )),
+    # reset | expired (maybe also set new timer delay confirmation "set")
+    Measurement("home/+/+/timer", "timer", (Field("event", str),)),
+)
+
+#endregion
+
+#region Compiled builders
+
+class InvalidPayload(ValueError):
+    pass
+
+Builder = Callable[[str, str, dict], str]
+"""Takes the house, location and payload and returns the point in line protocol, raises ``InvalidPayload``."""
+
+Observer = Callable[[str, str, str, bool, dict, int], None]
+"""Gets the measurement, house, location, simulated flag, field values and timestamp of every built point."""
+
+def compile_measurement(measurement: Measurement, observe: Observer | None = None) -> Builder:
+    """Turns a measurement into a function that validates a payload and formats it as line protocol.
+
+    Everything that does not depend on the payload (escaping, formatters, key lookups) is resolved here
+    once and the tag set prefix comes from the encoder's cache, so building a point is a handful of dict
+    lookups and string joins without ``Point`` objects.
+    """
+    encoder = LineEncoder(measurement.name, (KEY_HOUSE, KEY_LOCATION, KEY_SIMULATED), {KEY_LOCATION: str.upper})
+
+    # (payload key, field name, formatter) read from the payload in order
+    readers: list[tuple[str, str, Callable[[Any], str]]] = []
+    # (payload key, component field names)
+    vectors: list[tuple[str, tuple[str, ...]]] = []
+    # (field name, derive, formatter) computed after all read fields
+    derived: list[tuple[str, Callable[[dict], Any], Callable[[Any], str]]] = []
+
+    for f in measurement.fields:
+        if isinstance(f, Vector):
+            vectors.append((f.name, tuple(f"{f.name}_{c}" for c in f.components)))
+        elif f.derive:
+            derived.append((f.name, f.derive, FORMATTERS[f.type]))
+        else:
+            readers.append((f.key or f.name, f.name, FORMATTERS[f.type]))
+
+    format_float = FORMATTERS[float]
+    keys = {name: escape_key(name) for name in _field_names(measurement)}
+
+    def build(house: str, location: str, data: dict) -> str:
+        values: dict[str, Any] = {}
+        fields: list[str] = []
+
+        try:
+            for key, name, format_ in readers:
+                value = data[key]
+                fields.append(f"{keys[name]}={format_(value)}")
+                values[name] = value
+
+            for key, names in vectors:
+                components = data[key]
+                if len(components) != len(names):
+                    raise InvalidPayload(f"Expected {len(names)} components for {key}, got {len(components)}")
+
+                for name, value in zip(names, components):
+                    fields.append(f"{keys[name]}={format_float(value)}")
+                    values[name] = value
+
+            for name, derive, format_ in derived:
+                values[name] = value = derive(values)
+                fields.append(f"{keys[name]}={format_(value)}")
+        except (KeyError, TypeError) as e:
+            raise InvalidPayload(f"{measurement.name}: {e!r}") from e
+
+        simulated, timestamp = _is_simulated(data), time.time_ns()
+
+        if observe:
+            observe(measurement.name, house, location, simulated, values, timestamp)
+
+        return encoder.encode((house, location, simulated), ",".join(fields), timestamp)
+
+    return build
+
+def _field_names(measurement: Measurement) -> list[str]:
+    names = []
+
+    for f in measurement.fields:
+        if isinstance(f, Vector):
+            names.extend(f"{f.name}_{c}" for c in f.components)
+        else:
+            names.append(f.name)
+
+    return names
+
+def _rollup_fields(measurement: Measurement) -> list[str]:
+    """Numeric fields, the ones that get min/max/mean rollups."""
+    names = []
+
+    for f in measurement.fields:
+        if isinstance(f, Vector):
+            names.extend(f"{f.name}_{c}" for c in f.components)
+        elif f.type is float:
+            names.append(f.name)
+
+    return names
+
+def _handler(measurement: Measurement, build: Builder):
+    def handle(client: Client, userdata: object, message: JsonMessage, house: str, location: str):
+        try:
+            write(build(house, location, message.json))
+        except InvalidPayload as e:
+            _logger.warning("Dropping malformed payload on %s: %s", message.topic, e)
+
+    handle.__qualname__ = handle.__name__ = f"on_{measurement.name}_message"
+    return handle
+
+for _measurement in SCHEMA:
+    if _fields := _rollup_fields(_measurement):
+        rollups.track(_measurement.name, _fields)
+
+    on_json_topic(_measurement.topic)(_handler(_measurement, compile_measurement(_measurement, rollups.add)))
+
+#endregion
+
+topics = [(measurement.topic, 0) for measurement in SCHEMA]
+
+def init_app(app):
+    subscribe(topics)
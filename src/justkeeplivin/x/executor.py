@@ -0,0 +1,115 @@
+import time
+import logging
+from queue import Queue, Full
+from threading import Thread, Lock
+from typing import Any, Callable, Hashable
+
+_logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class OrderedExecutor:
+    """Pool of worker threads where tasks with the same key run one after another, in submission order.
+
+    Every key is pinned to one worker (by its hash), so different keys run in parallel while the
+    tasks of one key never overtake each other. Each worker has a bounded queue, when it is full
+    :meth:`submit` blocks the producer for up to ``block_timeout`` seconds and then drops the task.
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 1_000, block_timeout: float | None = 1, name: str = "worker"):
+        if workers < 1:
+            raise ValueError("At least one worker is required")
+
+        self.block_timeout = block_timeout
+
+        self.submitted = self.completed = self.failed = self.dropped = 0
+        self.blocked_time = 0.
+        self._max_depth = 0
+        self._stats_lock = Lock()
+
+        self._queues: list[Queue] = [Queue(queue_size) for _ in range(workers)]
+        self._threads = [
+            Thread(target=self._work, args=(queue,), name=f"{name}-{i}", daemon=True)
+            for i, queue in enumerate(self._queues)
+        ]
+        self._closed = False
+
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args: Any) -> bool:
+        if self._closed:
+            _logger.debug("Executor is shut down, dropping %s", key)
+            return False
+
+        queue = self._queues[hash(key) % len(self._queues)]
+        task = fn, args
+
+        try:
+            queue.put_nowait(task)
+        except Full:
+            start = time.perf_counter()
+            try:
+                queue.put(task, timeout=self.block_timeout)
+            except Full:
+                with self._stats_lock:
+                    self.dropped += 1
+                    self.blocked_time += time.perf_counter() - start
+
+                _logger.warning("Worker queue full for %ss, dropping %s", self.block_timeout, key)
+                return False
+
+            with self._stats_lock:
+                self.blocked_time += time.perf_counter() - start
+
+        with self._stats_lock:
+            self.submitted += 1
+            self._max_depth = max(self._max_depth, queue.qsize())
+
+        return True
+
+    def _work(self, queue: Queue):
+        while (task := queue.get()) is not _STOP:
+            fn, args = task
+
+            try:
+                fn(*args)
+            except Exception:
+                _logger.exception("Task %s failed", getattr(fn, "__qualname__", fn))
+                with self._stats_lock:
+                    self.failed += 1
+            else:
+                with self._stats_lock:
+                    self.completed += 1
+
+    def shutdown(self, timeout: float | None = 10):
+        """Stops accepting tasks and waits for the queued ones to finish."""
+        if self._closed:
+            return
+
+        self._closed = True
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        for queue in self._queues:
+            queue.put(_STOP)
+
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+
+        if pending := sum(queue.qsize() for queue in self._queues):
+            _logger.warning("Shut down with %d tasks left in the queues", pending)
+
+    @property
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "workers": len(self._threads),
+                "queued": [queue.qsize() for queue in self._queues],
+                "max_queued": self._max_depth,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "blocked_seconds": round(self.blocked_time, 3),
+            }
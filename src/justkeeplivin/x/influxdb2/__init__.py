@@ -0,0 +1,128 @@
+import os
+import atexit
+import logging
+from flask import Flask, current_app
+from influxdb_client import InfluxDBClient, Point, WriteApi, QueryApi, BucketRetentionRules
+from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client.client.flux_table import TableList
+
+from .batching import BatchingWriter, to_line_protocol
+from .spool import Spool
+
+_logger = logging.getLogger(__name__)
+
+influx: InfluxDBClient | None = None
+write_api: WriteApi | None = None
+query_api: QueryApi | None = None
+writer: BatchingWriter | None = None
+spool: Spool | None = None
+
+DEFAULT_BUCKET: str = ""
+
+def write(point: Point | str, bucket: str | None = None):
+    if writer:
+        return writer.put(point, bucket or DEFAULT_BUCKET)
+
+    assert write_api, "InfluxDb not initialized. Call init_app()"
+
+    if not spool:
+        return write_api.write(
+            bucket=bucket or DEFAULT_BUCKET,
+            record=point
+        )
+
+    record = to_line_protocol(point) # keep the sample time if it ends up in the spool
+    try:
+        write_api.write(
+            bucket=bucket or DEFAULT_BUCKET,
+            record=record
+        )
+    except Exception as e:
+        _logger.warning("Write failed (%s), spooling", e)
+        spool.append(bucket or DEFAULT_BUCKET, [record])
+    else:
+        if spool.pending:
+            try:
+                spool.replay(lambda bucket_, lines: write_api.write(bucket=bucket_, record=lines))
+            except Exception as e:
+                _logger.warning("Replaying spooled records failed (%s)", e)
+
+def query(query_: str, **params) -> TableList:
+    assert query_api, "InfluxDb not initialized. Call init_app()"
+
+    return query_api.query(
+        query_,
+        **params
+    )
+
+def ensure_bucket(name: str, retention: int | None = None):
+    """Creates the bucket if it is missing and sets its retention in seconds (0 keeps data forever, None leaves it as is)."""
+    assert influx, "InfluxDb not initialized. Call init_app()"
+
+    buckets = influx.buckets_api()
+    rules = [BucketRetentionRules(type="expire", every_seconds=retention)] if retention else []
+
+    try:
+        if bucket := buckets.find_bucket_by_name(name):
+            if retention is not None:
+                current = min((rule.every_seconds for rule in bucket.retention_rules or () if rule.every_seconds), default=0)
+                if retention and (not current or retention < current):
+                    _logger.warning(
+                        "Shortening the retention of bucket %s from %s to %ss, older data is deleted",
+                        name, f"{current}s" if current else "forever", retention,
+                    )
+                bucket.retention_rules = rules
+                buckets.update_bucket(bucket)
+        else:
+            buckets.create_bucket(bucket_name=name, retention_rules=rules)
+    except Exception as e:
+        _logger.warning("Could not set up bucket %s (%s)", name, e)
+
+def init_app(app: Flask):
+    global influx, write_api, query_api, writer, spool, DEFAULT_BUCKET
+
+    DEFAULT_BUCKET = app.config['INFLUX_BUCKET']
+    influx = InfluxDBClient(
+        url=app.config['INFLUX_URL'],
+        token=app.config['INFLUX_TOKEN'],
+        org=app.config['INFLUX_ORG'],
+    )
+    write_api = influx.write_api(write_options=SYNCHRONOUS)
+    query_api = influx.query_api()
+
+    if app.config.get('INFLUX_SPOOL', True):
+        spool = _create_spool(app)
+        atexit.register(spool.close)
+
+    match app.config.get('INFLUX_WRITE_MODE', 'batching'):
+        case 'batching':
+            writer = _create_writer(app, write_api)
+            atexit.register(writer.close)
+        case 'synchronous':
+            writer = None
+        case mode:
+            raise ValueError('Unsupported InfluxDB write mode: ' + mode)
+
+def _create_spool(app: Flask) -> Spool:
+    return Spool(
+        app.config.get('INFLUX_SPOOL_DIR', os.path.join(app.instance_path, 'influx-spool')),
+        segment_size=app.config.get('INFLUX_SPOOL_SEGMENT_SIZE', 8 * 2**20),
+        max_size=app.config.get('INFLUX_SPOOL_MAX_SIZE', 256 * 2**20),
+        fsync_interval=app.config.get('INFLUX_SPOOL_FSYNC_INTERVAL', 1),
+        replay_rate=app.config.get('INFLUX_REPLAY_RATE', 5_000),
+        replay_batch_size=app.config.get('INFLUX_REPLAY_BATCH_SIZE', 5_000),
+    )
+
+def _create_writer(app: Flask, write_api: WriteApi) -> BatchingWriter:
+    return BatchingWriter(
+        write_api,
+        batch_size=app.config.get('INFLUX_BATCH_SIZE', 500),
+        flush_interval=app.config.get('INFLUX_FLUSH_INTERVAL', 1),
+        buffer_size=app.config.get('INFLUX_BUFFER_SIZE', 10_000),
+        overflow=app.config.get('INFLUX_OVERFLOW', 'drop_oldest'),
+        block_timeout=app.config.get('INFLUX_BLOCK_TIMEOUT', 5),
+        max_retries=app.config.get('INFLUX_MAX_RETRIES', 5),
+        retry_interval=app.config.get('INFLUX_RETRY_INTERVAL', .5),
+        max_retry_interval=app.config.get('INFLUX_MAX_RETRY_INTERVAL', 30),
+        spool=spool,
+    )
@@ -0,0 +1,273 @@
+import time
+import random
+import logging
+from collections import deque
+from threading import Thread, Condition, Event
+from typing import Iterable
+
+from influxdb_client import WriteApi, Point
+from influxdb_client.rest import ApiException
+from influxdb_client.domain.write_precision import WritePrecision
+
+from .spool import Spool
+
+_logger = logging.getLogger(__name__)
+
+# overflow policies, what to do with a new record when the buffer is full
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+SPILL = "spill"
+
+OVERFLOW_POLICIES = {DROP_OLDEST, BLOCK, SPILL}
+
+def to_line_protocol(record: Point | str) -> str:
+    """Serializes a record, stamping it with the current time if it has none.
+
+    Records can spend a while in the buffer, so the server time on arrival is no longer the sample time.
+    """
+    if isinstance(record, Point):
+        if record._time is None:
+            record.time(time.time_ns(), WritePrecision.NS)
+
+        return record.to_line_protocol()
+
+    return record
+
+
+class BatchingWriter:
+    """Buffers records in memory and writes them in batches from a background thread.
+
+    Producers (MQTT callbacks) only pay for serializing the record and appending it to the buffer,
+    the HTTP round trips to InfluxDB happen on the writer thread.
+
+    Records that cannot be written are moved to the ``spool`` if there is one. While InfluxDB is down
+    batches go straight to the spool after a single attempt, and once a write goes through again the
+    spooled records are replayed in the background at the spool's rate limit.
+    """
+
+    def __init__(
+        self,
+        write_api: WriteApi,
+        batch_size: int = 500,
+        flush_interval: float = 1,
+        buffer_size: int = 10_000,
+        overflow: str = DROP_OLDEST,
+        block_timeout: float | None = 5,
+        max_retries: int = 5,
+        retry_interval: float = .5,
+        max_retry_interval: float = 30,
+        spool: Spool | None = None,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unsupported overflow policy: {overflow}. Expected one of {OVERFLOW_POLICIES}")
+
+        if overflow == SPILL and spool is None:
+            raise ValueError(f"Overflow policy {SPILL} requires a spool")
+
+        self.write_api = write_api
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer_size = max(buffer_size, batch_size)
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.spool = spool
+
+        self.written = self.dropped = self.spilled = self.replayed = self.retries = 0
+
+        self._healthy = True
+        self._last_probe = 0.
+
+        # (bucket, line protocol)
+        self._buffer: deque[tuple[str, str]] = deque()
+        self._cond = Condition()
+        self._closing = Event()
+        self._thread = Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def put(self, record: Point | str, bucket: str):
+        line = to_line_protocol(record)
+        if not line:
+            return
+
+        overflowed = None
+
+        with self._cond:
+            if self._closing.is_set():
+                raise RuntimeError("Writer is closed")
+
+            if len(self._buffer) >= self.buffer_size:
+                if self.overflow == SPILL:
+                    # spill the oldest half so the disk is not hit on every single record
+                    overflowed = [self._buffer.popleft() for _ in range(len(self._buffer) // 2)]
+                elif not self._make_room():
+                    return
+
+            self._buffer.append((bucket, line))
+
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+
+        if overflowed:
+            for bucket, lines in _group_by_bucket(overflowed).items():
+                self._spill(bucket, lines)
+
+    def _make_room(self) -> bool:
+        """Applies the in-memory overflow policies, called with the lock held when the buffer is full."""
+        if self.overflow == BLOCK:
+            if not self._cond.wait_for(
+                lambda: len(self._buffer) < self.buffer_size or self._closing.is_set(),
+                self.block_timeout
+            ):
+                self.dropped += 1
+                _logger.warning("Write buffer full for %ss, dropping record", self.block_timeout)
+                return False
+        else:
+            self._buffer.popleft()
+            self.dropped += 1
+
+        return True
+
+    def _run(self):
+        while True:
+            replaying = self._healthy and self.spool is not None and self.spool.pending
+
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._buffer) >= self.batch_size or self._closing.is_set(),
+                    min(self.flush_interval, .1) if replaying else self.flush_interval
+                )
+
+                if not self._buffer and self._closing.is_set():
+                    return
+
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                self._cond.notify_all() # wake up blocked producers
+
+            for bucket, lines in _group_by_bucket(batch).items():
+                self._write(bucket, lines)
+
+            if not self._closing.is_set():
+                self._replay()
+
+    def _write(self, bucket: str, lines: list[str]):
+        # while InfluxDB is down every batch is a single probe, retrying would only back up the buffer
+        max_retries = self.max_retries if self._healthy else 0
+
+        for attempt in range(max_retries + 1):
+            try:
+                self._write_lines(bucket, lines)
+            except ApiException as e:
+                if e.status and 400 <= e.status < 500 and e.status != 429:
+                    # malformed data or auth, retrying will not help
+                    _logger.error("InfluxDB rejected %d records: %s %s", len(lines), e.status, e.reason)
+                    self.dropped += len(lines)
+                    return
+                error = e
+            except Exception as e:
+                error = e
+            else:
+                self.written += len(lines)
+                self._set_healthy(True)
+                return
+
+            if attempt == max_retries:
+                break
+
+            self.retries += 1
+            delay = min(self.max_retry_interval, self.retry_interval * 2**attempt)
+            delay = random.uniform(delay / 2, delay) # jitter so writers do not retry in lockstep
+            _logger.warning("Writing %d records failed (%s), retrying in %.2fs", len(lines), error, delay)
+
+            if self._closing.wait(delay):
+                break # do not hold up the shutdown
+
+        self._set_healthy(False)
+        self._spill(bucket, lines)
+
+    def _replay(self):
+        if not self.spool or not self.spool.pending:
+            return
+
+        if not self._healthy:
+            # nothing new to write, so probe with the spooled records every now and then
+            if time.monotonic() - self._last_probe < self.max_retry_interval:
+                return
+            self._last_probe = time.monotonic()
+
+        try:
+            replayed = self.spool.replay(self._write_lines)
+        except Exception as e:
+            _logger.warning("Replaying spooled records failed (%s)", e)
+            self._set_healthy(False)
+        else:
+            if replayed:
+                self.replayed += replayed
+                self._set_healthy(True)
+
+    def _write_lines(self, bucket: str, lines: list[str]):
+        self.write_api.write(bucket=bucket, record=lines, write_precision=WritePrecision.NS)
+
+    def _set_healthy(self, healthy: bool):
+        if healthy != self._healthy:
+            if healthy:
+                _logger.info("InfluxDB is back, replaying %d spooled bytes", self.spool.size if self.spool else 0)
+            else:
+                _logger.warning("InfluxDB is down, spooling records")
+
+        self._healthy = healthy
+        self._last_probe = time.monotonic()
+
+    def _spill(self, bucket: str, lines: list[str]):
+        if self.spool is None:
+            _logger.error("Dropping %d records", len(lines))
+            self.dropped += len(lines)
+            return
+
+        try:
+            self.spool.append(bucket, lines)
+        except Exception:
+            _logger.exception("Failed to spill %d records", len(lines))
+            self.dropped += len(lines)
+        else:
+            self.spilled += len(lines)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Waits until the buffer is handed over to the writer thread."""
+        with self._cond:
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._buffer, timeout)
+
+    def close(self, timeout: float | None = 10):
+        with self._cond:
+            self._closing.set()
+            self._cond.notify_all()
+
+        self._thread.join(timeout)
+
+        if self._thread.is_alive():
+            _logger.warning("Writer did not finish in %ss, %d records left in memory", timeout, len(self._buffer))
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "spooled_bytes": self.spool.size if self.spool else 0,
+            "retries": self.retries,
+        }
+
+
+def _group_by_bucket(records: Iterable[tuple[str, str]]) -> dict[str, list[str]]:
+    grouped: dict[str, list[str]] = {}
+
+    for bucket, line in records:
+        grouped.setdefault(bucket, []).append(line)
+
+    return grouped
+
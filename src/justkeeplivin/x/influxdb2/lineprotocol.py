@@ -0,0 +1,100 @@
+import sys
+import math
+import time
+from typing import Any, Callable, Hashable, Iterable, Mapping
+
+# https://docs.influxdata.com/influxdb/v2/reference/syntax/line-protocol/#special-characters
+_ESCAPE_MEASUREMENT = str.maketrans({",": r"\,", " ": r"\ ", "\n": r"\n", "\r": r"\r", "\t": r"\t"})
+_ESCAPE_KEY = str.maketrans({",": r"\,", "=": r"\=", " ": r"\ ", "\n": r"\n", "\r": r"\r", "\t": r"\t"})
+_ESCAPE_STRING = str.maketrans({'"': r'\"', "\\": "\\\\"})
+
+
+def escape_measurement(name: str) -> str:
+    return name.translate(_ESCAPE_MEASUREMENT)
+
+def escape_key(key: str) -> str:
+    """Escapes tag keys, tag values and field keys."""
+    escaped = str(key).translate(_ESCAPE_KEY)
+    return escaped + " " if escaped.endswith("\\") else escaped
+
+def escape_string(value: str) -> str:
+    return value.translate(_ESCAPE_STRING)
+
+
+def format_bool(value: Any) -> str:
+    if value is True or value is False or value in (0, 1):
+        return "true" if value else "false"
+    raise TypeError(f"Expected a boolean, got {value!r}")
+
+def format_int(value: Any) -> str:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"{value}i"
+    raise TypeError(f"Expected an integer, got {value!r}")
+
+def format_float(value: Any) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+        return repr(float(value))
+    raise TypeError(f"Expected a finite number, got {value!r}")
+
+def format_str(value: Any) -> str:
+    if isinstance(value, str):
+        return f'"{escape_string(value)}"'
+    raise TypeError(f"Expected a string, got {value!r}")
+
+
+FORMATTERS: dict[type, Callable[[Any], str]] = {
+    bool: format_bool,
+    int: format_int,
+    float: format_float,
+    str: format_str,
+}
+"""Field value formatters by Python type, they raise ``TypeError`` for values of the wrong type."""
+
+
+class LineEncoder:
+    """Line protocol encoder for one measurement with a fixed set of tag keys.
+
+    The escaped ``measurement,tag=value,...`` prefix is built once per distinct combination of tag
+    values and interned, so encoding a sample only formats its fields and timestamp. Tag values are
+    passed raw and go through ``tag_formatters`` (``str`` by default) on a cache miss only.
+    """
+
+    def __init__(
+        self,
+        measurement: str,
+        tag_keys: Iterable[str] = (),
+        tag_formatters: Mapping[str, Callable[[Any], str]] | None = None,
+        max_tag_sets: int = 10_000,
+    ):
+        self.measurement = measurement
+        self.tag_keys = tuple(tag_keys)
+        self.max_tag_sets = max_tag_sets
+
+        tag_formatters = tag_formatters or {}
+        self._formatters = tuple(tag_formatters.get(key, str) for key in self.tag_keys)
+        self._head = escape_measurement(measurement)
+        self._keys = tuple(escape_key(key) for key in self.tag_keys)
+        self._prefixes: dict[tuple[Hashable, ...], str] = {}
+
+    def prefix(self, tag_values: tuple[Hashable, ...]) -> str:
+        """Returns ``measurement,tag=value,... `` (with the trailing space) for raw tag values."""
+        try:
+            return self._prefixes[tag_values]
+        except KeyError:
+            pass
+
+        tags = "".join(
+            f",{key}={escape_key(format_(value))}"
+            for key, format_, value in zip(self._keys, self._formatters, tag_values)
+        )
+
+        if len(self._prefixes) >= self.max_tag_sets:
+            self._prefixes.clear() # tag values are not bounded (locations come from topics), the cache is
+
+        prefix = self._prefixes[tag_values] = sys.intern(f"{self._head}{tags} ")
+        return prefix
+
+    def encode(self, tag_values: tuple[Hashable, ...], fields: str, timestamp: int | None = None) -> str:
+        """Encodes a sample, ``fields`` being the already formatted ``key=value,...`` field set."""
+        return f"{self.prefix(tag_values)}{fields} {time.time_ns() if timestamp is None else timestamp}"
+
@@ -0,0 +1,220 @@
+import os
+import time
+import logging
+from pathlib import Path
+from threading import Lock
+from typing import BinaryIO, Callable
+
+_logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".lp"
+
+
+class RateLimiter:
+    """Token bucket, hands out at most ``rate`` units per second with bursts of up to ``burst``."""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst or rate
+        self._tokens = self.burst
+        self._last = time.monotonic()
+
+    def take(self, n: int) -> int:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+        taken = min(n, int(self._tokens))
+        self._tokens -= taken
+        return taken
+
+
+class Spool:
+    """Append-only write-ahead spool of line protocol records on local disk.
+
+    Records are appended to ``<directory>/<bucket>/<sequence>.lp`` segments, plain line protocol
+    files that can also be imported by hand with ``influx write``. Segments are rotated once they
+    reach ``segment_size``, and the oldest ones are deleted when the spool grows over ``max_size``.
+
+    Replay goes segment by segment from the oldest one, and a segment is only deleted once it is
+    fully written. A crash mid replay writes part of a segment twice, which InfluxDB shrugs off
+    since points with the same series and timestamp overwrite each other.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        segment_size: int = 8 * 2**20,
+        max_size: int = 256 * 2**20,
+        fsync_interval: float = 1,
+        replay_rate: float = 5_000,
+        replay_batch_size: int = 5_000,
+    ):
+        self.directory = Path(directory)
+        self.segment_size = segment_size
+        self.max_size = max_size
+        self.fsync_interval = fsync_interval
+        self.replay_batch_size = replay_batch_size
+        self.limiter = RateLimiter(replay_rate, max(replay_rate, replay_batch_size))
+
+        self.dropped = 0
+
+        self._lock = Lock()
+        # bucket -> active segment
+        self._active: dict[str, tuple[Path, BinaryIO]] = {}
+        self._unsynced: set[BinaryIO] = set()
+        self._last_fsync = time.monotonic()
+        # segment being replayed and how far in it we got
+        self._replaying: tuple[Path, int] | None = None
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._segments = sorted(self.directory.glob(f"*/*{SEGMENT_SUFFIX}"), key=_sequence)
+        self._sequence = _sequence(self._segments[-1]) if self._segments else 0
+        self._size = sum(segment.stat().st_size for segment in self._segments)
+
+        if self._segments:
+            _logger.info("Found %d spooled segments (%d bytes) to replay", len(self._segments), self._size)
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._segments)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def append(self, bucket: str, lines: list[str]):
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+
+        with self._lock:
+            path, f = self._active.get(bucket) or self._open_segment(bucket)
+            f.write(data)
+            self._size += len(data)
+            self._unsynced.add(f)
+
+            if f.tell() >= self.segment_size:
+                self._close_segment(bucket)
+            elif time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._fsync()
+
+            if self._size > self.max_size:
+                self._enforce_max_size()
+
+    def replay(self, write: Callable[[str, list[str]], None]) -> int:
+        """Writes the next chunk of spooled records, as many as the rate limit allows.
+
+        Returns the number of replayed records. If ``write`` raises, the chunk stays in the spool
+        and the exception is propagated.
+        """
+        with self._lock:
+            if not self._segments:
+                return 0
+
+            limit = self.limiter.take(self.replay_batch_size)
+            if not limit:
+                return 0
+
+            segment, offset = self._replaying or (self._segments[0], 0)
+            if segment in (path for path, _ in self._active.values()):
+                # never read a segment that is still being written to
+                self._close_segment(segment.parent.name)
+
+            lines, end = _read_lines(segment, offset, limit)
+
+        if lines:
+            write(segment.parent.name, lines)
+
+        with self._lock:
+            if segment not in self._segments:
+                return len(lines) # dropped by the size cap meanwhile
+
+            if end < segment.stat().st_size:
+                self._replaying = segment, end
+            else:
+                self._remove_segment(segment)
+                self._replaying = None
+
+        return len(lines)
+
+    def flush(self):
+        with self._lock:
+            self._fsync()
+
+    def close(self):
+        with self._lock:
+            for bucket in list(self._active):
+                self._close_segment(bucket)
+
+    def _open_segment(self, bucket: str) -> tuple[Path, BinaryIO]:
+        self._sequence += 1
+        path = self.directory / bucket / f"{self._sequence:012d}{SEGMENT_SUFFIX}"
+        path.parent.mkdir(exist_ok=True)
+
+        self._active[bucket] = path, open(path, "ab")
+        self._segments.append(path)
+        return self._active[bucket]
+
+    def _close_segment(self, bucket: str):
+        path, f = self._active.pop(bucket)
+        self._unsynced.discard(f)
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+
+    def _fsync(self):
+        for f in self._unsynced:
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._unsynced.clear()
+        self._last_fsync = time.monotonic()
+
+    def _enforce_max_size(self):
+        while self._size > self.max_size and len(self._segments) > 1:
+            oldest = self._segments[0]
+
+            for bucket, (path, _) in list(self._active.items()):
+                if path == oldest:
+                    self._close_segment(bucket)
+
+            _logger.warning("Spool over %d bytes, dropping segment %s", self.max_size, oldest)
+            self.dropped += _count_lines(oldest)
+            self._remove_segment(oldest)
+
+            if self._replaying and self._replaying[0] == oldest:
+                self._replaying = None
+
+    def _remove_segment(self, segment: Path):
+        self._size -= segment.stat().st_size
+        self._segments.remove(segment)
+        segment.unlink()
+
+
+def _sequence(segment: Path) -> int:
+    return int(segment.stem)
+
+def _read_lines(segment: Path, offset: int, limit: int) -> tuple[list[str], int]:
+    lines = []
+
+    with open(segment, "rb") as f:
+        f.seek(offset)
+
+        for raw in f:
+            offset += len(raw)
+
+            if not raw.endswith(b"\n"):
+                # torn write at the end of a segment that was never closed (crash), skip it
+                _logger.warning("Skipping partial record at the end of %s", segment)
+                break
+
+            if line := raw.rstrip(b"\n").decode("utf-8"):
+                lines.append(line)
+
+            if len(lines) >= limit:
+                break
+
+    return lines, offset
+
+def _count_lines(segment: Path) -> int:
+    with open(segment, "rb") as f:
+        return sum(1 for _ in f)
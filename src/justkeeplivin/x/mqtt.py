@@ -1,15 +1,397 @@
 import json
+import zlib
+import atexit
 import logging
-from json import JSONDecodeError
-from typing import Any, Dict, Literal
+from dataclasses import dataclass
+from functools import lru_cache, wraps
+from itertools import count
+from typing import Any, Callable, Dict, Literal
 
+from flask import Flask
 from flask_mqtt import Mqtt
 from paho.mqtt.client import Client, MQTTMessage as Message, ConnectFlags, DisconnectFlags, CallbackOnMessage
+from paho.mqtt.enums import CallbackAPIVersion
+
+from .executor import OrderedExecutor
 
 _logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 mqtt = Mqtt()
-init_app = mqtt.init_app
+
+loads: Callable[[bytes | str], Any] = orjson.loads if orjson else json.loads
+
+def set_json_backend(backend: Literal["orjson", "json"]):
+    """Picks the library used to parse payloads, orjson is the default when it is installed."""
+    global loads
+
+    match backend:
+        case "orjson" if orjson:
+            loads = orjson.loads
+        case "orjson":
+            raise ValueError("orjson is not installed, `pip install justkeeplivin[fast]`")
+        case "json":
+            loads = json.loads
+        case _:
+            raise ValueError("Unsupported JSON backend: " + backend)
+
+
+@dataclass(frozen=True, slots=True)
+class JsonMessage:
+    """Received message with its payload parsed once, shared by all handlers of its topic."""
+    topic: str
+    levels: tuple[str, ...]
+    payload: bytes
+    json: Any
+    """Parsed payload, ``None`` if it is not valid JSON."""
+    qos: int = 0
+    retain: bool = False
+
+    @classmethod
+    def from_message(cls, message: Message, topic: str | None = None) -> 'JsonMessage':
+        topic = topic or message.topic
+        return cls(
+            topic=topic,
+            levels=tuple(topic.split('/')),
+            payload=message.payload,
+            json=try_parse_message(message.payload),
+            qos=message.qos,
+            retain=message.retain,
+        )
+
+
+BATCH_LEVEL = "batch"
+"""Last level of the topics the pies publish coalesced readings on, ``{"readings": [[<last level>, <payload>], ...]}``."""
+
+
+Handler = Callable[..., None]
+"""Called as ``handler(client, userdata, message: JsonMessage, *wildcards)``, with the topic levels matched
+by the filter's ``+`` wildcards (and the rest of the topic for ``#``) passed as extra arguments."""
+
+
+class _Node:
+    __slots__ = "children", "handlers"
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        # (registration order, handler, pinned)
+        self.handlers: list[tuple[int, Handler, bool]] = []
+
+
+def _topic_key(topic: str) -> str:
+    return topic
+
+def _house_key(topic: str) -> str:
+    # home/<house>/<location>/...
+    return topic.split('/', 2)[1] if topic.count('/') else topic
+
+def _location_key(topic: str) -> str:
+    return '/'.join(topic.split('/', 3)[1:3])
+
+ORDER_KEYS: dict[str, Callable[[str], Any]] = {
+    "topic": _topic_key,
+    "house": _house_key,
+    "location": _location_key,
+}
+
+
+class TopicDispatcher:
+    """Resolves a topic to its handlers with a trie of the subscribed topic filters.
+
+    Resolving walks the trie one topic level at a time, so it costs O(topic depth) no matter how many
+    filters are registered, and the result for each concrete topic is kept in an LRU cache.
+
+    With an ``executor`` the network thread only resolves the topic, parsing the payload and running
+    the handlers happens on the executor's workers. Messages with the same ``order_key`` (the topic by
+    default) are handled in the order they were received.
+
+    A batch message (``<prefix>/batch``) is split into its readings, each dispatched as if it was
+    published on ``<prefix>/<level>``.
+
+    Handlers that keep state across messages are registered ``pinned``, when workers share the stream
+    (see :func:`subscribe`) those only run on the leader. ``dispatch`` runs all handlers by default, only
+    the pinned ones or only the others with ``pinned`` set to ``True`` or ``False``.
+    """
+
+    def __init__(self, cache_size: int = 1024, executor: OrderedExecutor | None = None, order_key: Callable[[str], Any] = _topic_key):
+        self._root = _Node()
+        self._order = count()
+        self.resolve = lru_cache(cache_size)(self._resolve)
+        self.executor = executor
+        self.order_key = order_key
+
+    def on_topic(self, topic_filter: str, pinned: bool = False) -> Callable[[Handler], Handler]:
+        def decorator(handler: Handler) -> Handler:
+            self.add(topic_filter, handler, pinned)
+            return handler
+
+        return decorator
+
+    def on_json_topic(self, topic_filter: str, pinned: bool = False) -> Callable[[Handler], Handler]:
+        """Like :meth:`on_topic`, but the handler is only called for payloads that are JSON objects.
+
+        Returns the registered wrapper, which is what :meth:`remove` takes.
+        """
+        def decorator(handler: Handler) -> Handler:
+            @wraps(handler)
+            def wrapper(client: Client, userdata: Any, message: JsonMessage, *wildcards: str):
+                if isinstance(message.json, dict):
+                    handler(client, userdata, message, *wildcards)
+
+            self.add(topic_filter, wrapper, pinned)
+            return wrapper
+
+        return decorator
+
+    def add(self, topic_filter: str, handler: Handler, pinned: bool = False):
+        levels = topic_filter.split('/')
+        if '#' in levels[:-1] or any(('+' in level or '#' in level) and len(level) > 1 for level in levels):
+            raise ValueError("Invalid topic filter: " + topic_filter)
+
+        node = self._root
+        for level in levels:
+            node = node.children.setdefault(level, _Node())
+
+        node.handlers.append((next(self._order), handler, pinned))
+        self.resolve.cache_clear()
+
+    def remove(self, topic_filter: str, handler: Handler):
+        node = self._root
+        for level in topic_filter.split('/'):
+            if not (node := node.children.get(level)):
+                return
+
+        node.handlers = [(order, h, pinned) for order, h, pinned in node.handlers if h is not handler]
+        self.resolve.cache_clear()
+
+    def _resolve(self, topic: str, pinned: bool | None = None) -> tuple[tuple[Handler, tuple[str, ...]], ...]:
+        """Returns the handlers matching a topic with their wildcard arguments, in registration order.
+
+        Only the pinned handlers or only the others with ``pinned`` set, all of them if ``None``.
+        """
+        levels = topic.split('/')
+        matches: list[tuple[int, Handler, tuple[str, ...]]] = []
+        # (node, wildcards so far)
+        states = [(self._root, ())]
+
+        for i, level in enumerate(levels):
+            next_states = []
+
+            for node, wildcards in states:
+                # topics starting with $ are not matched by wildcards on the first level
+                if (multi := node.children.get('#')) and not (i == 0 and level.startswith('$')):
+                    rest = wildcards + ('/'.join(levels[i:]),)
+                    matches.extend((order, handler, rest) for order, handler, p in multi.handlers if pinned in (None, p))
+
+                if child := node.children.get(level):
+                    next_states.append((child, wildcards))
+
+                if (single := node.children.get('+')) and not (i == 0 and level.startswith('$')):
+                    next_states.append((single, wildcards + (level,)))
+
+            if not (states := next_states):
+                break
+        else:
+            for node, wildcards in states:
+                matches.extend((order, handler, wildcards) for order, handler, p in node.handlers if pinned in (None, p))
+
+                # "a/#" also matches "a"
+                if multi := node.children.get('#'):
+                    matches.extend((order, handler, wildcards + ('',)) for order, handler, p in multi.handlers if pinned in (None, p))
+
+        matches.sort(key=lambda match: match[0])
+        return tuple((handler, wildcards) for _, handler, wildcards in matches)
+
+    def dispatch(self, client: Client, userdata: Any, message: Message, pinned: bool | None = None) -> bool:
+        topic = message.topic
+        handlers = self.resolve(topic, pinned)
+        if not handlers:
+            prefix, _, level = topic.rpartition('/')
+            return level == BATCH_LEVEL and self._dispatch_batch(client, userdata, message, prefix, pinned)
+
+        if self.executor:
+            self.executor.submit(self.order_key(topic), self._handle, client, userdata, message, topic, handlers)
+        else:
+            self._handle(client, userdata, message, topic, handlers)
+
+        return True
+
+    def _dispatch_batch(self, client: Client, userdata: Any, message: Message, prefix: str, pinned: bool | None = None) -> bool:
+        # parsed here, readings on different topics can go to different workers
+        data = try_parse_message(message.payload)
+        readings = data.get("readings") if isinstance(data, dict) else None
+        if not isinstance(readings, list):
+            _logger.warning("Malformed batch on %s", message.topic)
+            return True
+
+        for reading in readings:
+            try:
+                level, json_ = reading
+                topic = f"{prefix}/{level}"
+            except (TypeError, ValueError):
+                _logger.warning("Malformed reading in batch on %s: %r", message.topic, reading)
+                continue
+
+            if not (handlers := self.resolve(topic, pinned)):
+                _logger.debug("No handlers for %s in batch on %s", topic, message.topic)
+                continue
+
+            sub_message = JsonMessage(topic, tuple(topic.split('/')), b"", json_, message.qos, message.retain)
+            if self.executor:
+                self.executor.submit(self.order_key(topic), self._run, client, userdata, sub_message, handlers)
+            else:
+                self._run(client, userdata, sub_message, handlers)
+
+        return True
+
+    def _handle(self, client: Client, userdata: Any, message: Message, topic: str, handlers: tuple[tuple[Handler, tuple[str, ...]], ...]):
+        self._run(client, userdata, JsonMessage.from_message(message, topic), handlers)
+
+    def _run(self, client: Client, userdata: Any, message: JsonMessage, handlers: tuple[tuple[Handler, tuple[str, ...]], ...]):
+        topic = message.topic
+
+        for handler, wildcards in handlers:
+            try:
+                handler(client, userdata, message, *wildcards)
+            except Exception:
+                _logger.exception("Handler %s failed on topic %s", handler.__qualname__, topic)
+
+
+dispatcher = TopicDispatcher()
+on_topic = dispatcher.on_topic
+on_json_topic = dispatcher.on_json_topic
+
+HOUSE_TOPIC = "home/{house}/#"
+
+shard: int | None = None
+"""Shard of houses this worker owns, ``None`` when it is the only one and owns them all."""
+
+share_group: str | None = None
+"""Shared subscription group of the workers the stream is split between, ``None`` when not shared."""
+
+leader: Client | None = None
+"""Client the pinned handlers of the leader worker receive their messages on, when the stream is shared."""
+_leader_topics: dict[str, int] = {}
+
+def shard_of(house: str, shards: int) -> int:
+    """Shard that owns a house, the same in every worker (unlike ``hash`` of a string)."""
+    return zlib.crc32(house.encode()) % shards
+
+def subscribe(topics: list[tuple[str, int]], pinned: bool = False):
+    """Subscribes to the topics of a module, ``pinned`` if its handlers are.
+
+    A sharded worker is already subscribed to everything under ``home/<house>/`` of its houses, so it
+    only subscribes to the other topics. When the stream is shared, the topics of stateless handlers
+    are subscribed through ``$share/<group>/`` so every message goes to one of the workers, those of
+    pinned handlers only by the leader, on its own client.
+    """
+    if shard is not None:
+        topics = [(topic, qos) for topic, qos in topics if not topic.startswith("home/")]
+
+    if share_group is not None and pinned:
+        if leader is None:
+            return
+
+        _leader_topics.update(topics)
+        if leader.is_connected():
+            leader.subscribe(topics)
+        return
+
+    if share_group is not None:
+        topics = [(f"$share/{share_group}/{topic}", qos) for topic, qos in topics]
+
+    if topics:
+        mqtt.subscribe(topics)
+
+def _subscribe_shard(app: Flask):
+    """Subscribes to the houses of this worker's shard, through the shared subscription of the shard.
+
+    Shards are meant to have one worker each, with a broker that delivers shared subscriptions to one
+    member for as long as it is connected (sticky), another worker of the same shard is a standby that
+    takes over once it is gone. Round robin would split the houses' events between the two.
+    """
+    global shard
+
+    shards = app.config.get("MQTT_SHARDS", 1)
+    shard = app.config["MQTT_SHARD"]
+    if not 0 <= shard < shards:
+        raise ValueError(f"MQTT_SHARD must be in [0, {shards}), got {shard}")
+
+    group = f"{app.config.get('MQTT_SHARE_GROUP', 'justkeeplivin')}-{shard}"
+    houses = [house for house in app.config.get("HOUSES", {}) if shard_of(house, shards) == shard]
+    if not houses:
+        _logger.warning("Shard %s/%s owns none of the houses", shard, shards)
+        return
+
+    _logger.info("Shard %s/%s owns houses %s", shard, shards, ", ".join(houses))
+    mqtt.subscribe([(f"$share/{group}/{HOUSE_TOPIC.format(house=house)}", 0) for house in houses])
+
+def _start_leader(app: Flask) -> Client:
+    """Connects the client of the pinned handlers, a second session next to the shared one."""
+
+    def on_connect(client: Client, userdata, flags, rc, properties=None):
+        if _leader_topics:
+            client.subscribe(list(_leader_topics.items()))
+
+    def on_message(client: Client, userdata, message: Message):
+        dispatcher.dispatch(client, userdata, message, pinned=True)
+
+    client = Client(CallbackAPIVersion.VERSION2, client_id=f"{app.config.get('MQTT_CLIENT_ID', 'justkeeplivin')}-leader")
+    if username := app.config.get("MQTT_USERNAME"):
+        client.username_pw_set(username, app.config.get("MQTT_PASSWORD"))
+    client.on_connect = on_connect
+    client.on_message = on_message
+
+    client.connect_async(
+        app.config.get("MQTT_BROKER_URL", "localhost"),
+        app.config.get("MQTT_BROKER_PORT", 1883),
+        app.config.get("MQTT_KEEPALIVE", 60),
+    )
+    client.loop_start()
+    atexit.register(client.loop_stop)
+    atexit.register(client.disconnect)
+    return client
+
+def _share(app: Flask):
+    """Splits the stream between the workers of ``MQTT_SHARE_GROUP``, the ``MQTT_LEADER`` one also runs the pinned handlers."""
+    global share_group, leader
+
+    if app.config.get("MQTT_SHARDS", 1) > 1:
+        raise ValueError("MQTT_SHARED and MQTT_SHARDS are exclusive, shards already split the stream")
+
+    share_group = app.config.get("MQTT_SHARE_GROUP", "justkeeplivin")
+    if app.config.get("MQTT_LEADER", False):
+        leader = _start_leader(app)
+
+    _logger.info("Sharing the stream in group %s%s", share_group, " as the leader" if leader else "")
+
+def init_app(app: Flask):
+    # before connecting, messages can arrive as soon as the client is up
+    if (workers := app.config.get("MQTT_WORKERS", 4)) > 0:
+        dispatcher.executor = OrderedExecutor(
+            workers,
+            queue_size=app.config.get("MQTT_WORKER_QUEUE_SIZE", 1_000),
+            block_timeout=app.config.get("MQTT_BLOCK_TIMEOUT", 1),
+            name="mqtt-worker",
+        )
+        dispatcher.order_key = ORDER_KEYS[app.config.get("MQTT_ORDER_KEY", "topic")]
+        atexit.register(dispatcher.executor.shutdown)
+
+    mqtt.init_app(app)
+
+    if app.config.get("MQTT_SHARED", False):
+        _share(app)
+
+    if app.config.get("MQTT_SHARDS", 1) > 1:
+        _subscribe_shard(app)
+    else:
+        batch = [(app.config.get("MQTT_BATCH_TOPIC", f"home/+/+/{BATCH_LEVEL}"), 0)]
+        subscribe(batch)
+        subscribe(batch, pinned=True) # pinned handlers need their readings of every batch
 
 @mqtt.on_connect()
 def _handle_connect(client: Client, userdata: Any, flags: Dict[str, Any], rc: int): ...
@@ -18,6 +400,11 @@ def _handle_connect(client: Client, userdata: Any, flags: Dict[str, Any], rc: in
 def _handle_disconnect(client: Client, userdata: Any, rc: int): ...
 
 @mqtt.on_message()
+def _handle_message(client: Client, userdata: object, message: Message):
+    # the leader's pinned handlers get their messages on its own client
+    if not dispatcher.dispatch(client, userdata, message, False if share_group is not None else None):
+        _handle_unhandled_message(client, userdata, message)
+
 def _handle_unhandled_message(client: Client, userdata: object, message: Message):
     _logger.warning(
         "Unhandled MQTT message",
@@ -30,34 +417,18 @@ def _handle_unhandled_message(client: Client, userdata: object, message: Message
         }
     )
 
-def try_parse_message(message: Message | bytes, encoding="utf-8", format_: Literal["json"] = "json") -> dict | None:
+def try_parse_message(message: 'JsonMessage | Message | bytes', encoding="utf-8", format_: Literal["json"] = "json") -> dict | None:
+    if isinstance(message, JsonMessage):
+        return message.json # already parsed by the dispatcher
+
     payload = message.payload if isinstance(message, Message) else message
     try:
-        decoded = payload.decode(encoding)
         match format_:
             case "json" | "JSON":
-                return json.loads(decoded)
+                return loads(payload if encoding in {"utf-8", "utf8"} else payload.decode(encoding))
             case _:
                 raise ValueError("Unsupported format: " + format_)
-    except (UnicodeDecodeError, JSONDecodeError) as e:
+    except ValueError as e: # UnicodeDecodeError and JSONDecodeError (of both backends) included
+        if format_ not in {"json", "JSON"}:
+            raise
         return None
-
-# class JsonMessage(Message, ABC):
-#     @property
-#     @abstractmethod
-#     def json(self) -> dict | None: ...
-#
-# def on_json_topic(topic):
-#     def decorator(handler):
-#         @wraps(handler)
-#         def wrapper(client, userdata, message):
-#             try:
-#                 data = json.loads(message.payload.decode("utf-8"))
-#             except (UnicodeDecodeError, JSONDecodeError) as e:
-#                 return None
-#             else:
-#                 message.json = data
-#                 handler(client, userdata, message)
-#
-#         return mqtt.on_topic(topic)(wrapper)
-#     return decorator
@@ -0,0 +1,171 @@
+import time
+import atexit
+import logging
+from threading import Condition, Thread
+from typing import Any, Callable
+
+_logger = logging.getLogger(__name__)
+
+
+class TimerHandle:
+    """A call scheduled on a :class:`TimerWheel`, :meth:`cancel` it to keep it from being made."""
+    __slots__ = "_wheel", "_slot", "deadline", "callback", "args", "cancelled"
+
+    def __init__(self, wheel: 'TimerWheel', deadline: int, callback: Callable[..., Any], args: tuple):
+        self._wheel = wheel
+        self._slot: dict[TimerHandle, None] | None = None
+        self.deadline = deadline
+        """Tick the call is due on."""
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> bool:
+        """Returns whether the call was still pending, it is not made once this returns ``True``."""
+        return self._wheel._cancel(self)
+
+
+class TimerWheel:
+    """Hierarchical timer wheel that makes any number of delayed calls on one thread.
+
+    Delays are rounded up to ``tick`` seconds. The first level has a slot per tick for the next ``slots``
+    ticks, every further level a slot per ``slots`` slots of the one below, so ``levels`` levels cover
+    ``slots ** levels`` ticks (longer delays wait in the last level until they come into range). Whenever
+    a level comes round, the next slot of the level above is cascaded down into it. Scheduling and
+    cancelling are O(1), a tick only looks at its own slot and the ones that cascade.
+
+    Calls are made on the wheel's thread, one after another, so they should not block.
+    """
+
+    def __init__(self, tick: float = .1, slots: int = 256, levels: int = 4, name: str = "timers"):
+        if slots < 2 or slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+
+        self.tick = tick
+        self.name = name
+        self._bits = slots.bit_length() - 1
+        self._mask = slots - 1
+        self._span = slots ** levels
+        self._wheels: list[list[dict[TimerHandle, None]]] = [[{} for _ in range(slots)] for _ in range(levels)]
+
+        self._origin = time.monotonic()
+        self._current = 0
+        """The last tick that was run, counted from ``_origin``."""
+        self._changed = Condition()
+        self._thread: Thread | None = None
+        self._stopping = False
+
+        self.pending = 0
+        self.calls = 0
+
+    def call_later(self, delay: float, callback: Callable[..., Any], *args: Any) -> TimerHandle:
+        """Calls ``callback(*args)`` on the wheel's thread once ``delay`` seconds have passed."""
+        with self._changed:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+            if not self.pending: # nothing was due, the wheel may not have been turned in a while
+                self._current = max(self._current, self._now())
+
+            ticks = -(-(time.monotonic() - self._origin + max(delay, 0)) // self.tick)
+            handle = TimerHandle(self, max(self._current + 1, int(ticks)), callback, args)
+            self._insert(handle)
+            self.pending += 1
+            self._changed.notify()
+
+        return handle
+
+    def _now(self) -> int:
+        return int((time.monotonic() - self._origin) // self.tick)
+
+    def _insert(self, handle: TimerHandle):
+        # NOTE: Called with the lock held
+        delta = handle.deadline - self._current
+        level = 0
+        while level < len(self._wheels) - 1 and delta >= 1 << self._bits * (level + 1):
+            level += 1
+
+        # past the last level it is put where it will be looked at again last
+        deadline = min(handle.deadline, self._current + self._span - 1)
+        slot = self._wheels[level][(deadline >> self._bits * level) & self._mask]
+        slot[handle] = None
+        handle._slot = slot
+
+    def _cancel(self, handle: TimerHandle) -> bool:
+        with self._changed:
+            if handle._slot is None:
+                return False
+
+            del handle._slot[handle]
+            handle._slot = None
+            handle.cancelled = True
+            self.pending -= 1
+            return True
+
+    def _advance(self, until: int) -> list[TimerHandle]:
+        # NOTE: Called with the lock held, returns the handles due up to the ``until`` tick
+        due = []
+
+        while self._current < until and self.pending:
+            self._current += 1
+            tick = self._current
+
+            # from the top, what cascades from a level may have to cascade further on the same tick
+            for level in range(len(self._wheels) - 1, 0, -1):
+                if tick & ((1 << self._bits * level) - 1) == 0:
+                    slot = self._wheels[level][(tick >> self._bits * level) & self._mask]
+                    handles = list(slot)
+                    slot.clear()
+                    for handle in handles:
+                        self._insert(handle)
+
+            slot = self._wheels[0][tick & self._mask]
+            if slot:
+                due.extend(slot)
+                slot.clear()
+
+        self._current = max(self._current, until)
+        for handle in due:
+            handle._slot = None
+        self.pending -= len(due)
+        return due
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while not self._stopping and (not self.pending or self._now() <= self._current):
+                    next_tick = self._origin + (self._current + 1) * self.tick
+                    self._changed.wait(max(next_tick - time.monotonic(), 0) if self.pending else None)
+
+                if self._stopping:
+                    return
+                due = self._advance(self._now())
+
+            for handle in due:
+                try:
+                    handle.callback(*handle.args)
+                except Exception:
+                    _logger.exception("Timer callback %s failed", getattr(handle.callback, "__qualname__", handle.callback))
+                self.calls += 1
+
+    def stop(self):
+        """Stops the thread, pending calls are not made."""
+        with self._changed:
+            self._stopping = True
+            self._changed.notify()
+
+        if self._thread:
+            self._thread.join()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "calls": self.calls,
+        }
+
+
+timers = TimerWheel()
+"""Shared by the timeouts of the backend, the security state machine's among them."""
+atexit.register(timers.stop)
@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+from justkeeplivin.fusion import APPROACH, LEAVE, Entrance
+from piagent.devices import _bind_proximity
+
+
+class Clock:
+    """Stands in for the agent, runs what the proximity binding schedules on a virtual clock."""
+
+    def __init__(self):
+        self.now = 0.
+        self.published: list[dict] = []
+        self._scheduled: dict[str, tuple[float, object]] = {}
+
+    def report(self, spec, data: dict):
+        data["ts"] = self.now
+        self.published.append(data)
+
+    def schedule(self, key, delay, callback):
+        self._scheduled.pop(key, None)
+        if delay:
+            self._scheduled[key] = self.now + delay, callback
+
+    def call_soon_threadsafe(self, callback, *args):
+        callback(*args)
+
+    def run_until(self, t: float):
+        while self._scheduled and (due := min(self._scheduled.values(), key=lambda s: s[0]))[0] <= t:
+            self.now = due[0]
+            self._scheduled = {k: s for k, s in self._scheduled.items() if s is not due}
+            due[1]()
+        self.now = t
+
+
+class Sensor:
+    threshold = .3
+
+    def __init__(self, distance: float = 1.):
+        self.distance = distance
+        self.when_in_range = self.when_out_of_range = None
+
+    @property
+    def in_range(self) -> bool:
+        return self.distance < self.threshold
+
+    def move(self, distance: float):
+        was = self.in_range
+        self.distance = distance
+        if self.in_range != was:
+            (self.when_in_range if self.in_range else self.when_out_of_range)(self)
+
+
+def walk(clock: Clock, sensor: Sensor, start: float, end: float, t: float, speed: float = .5):
+    """Moves the sensed person from ``start`` to ``end`` meters from ``t`` on, in 50ms steps."""
+    steps = int(abs(end - start) / speed / .05)
+    for step in range(1, steps + 1):
+        clock.run_until(t + step * .05)
+        sensor.move(start + (end - start) * step / steps)
+    return t + steps * .05
+
+
+def published():
+    clock, sensor = Clock(), Sensor()
+    _bind_proximity(clock, sensor, SimpleNamespace(id="dus1", options={}))
+    return clock, sensor
+
+
+def test_proximity_is_streamed_while_in_range():
+    clock, sensor = published()
+
+    t = walk(clock, sensor, 1., .1, 0)
+    clock.run_until(t + 2) # standing still in range publishes nothing
+    assert clock.published[0]["in_range"] is True
+    assert len(clock.published) == 3 # on getting in range, then every 200ms it moved by more than 2cm
+    assert all(abs(a["distance"] - b["distance"]) >= .02 for a, b in zip(clock.published, clock.published[1:]))
+
+    walk(clock, sensor, .1, 1., t + 2)
+    assert clock.published[-1]["in_range"] is False
+    count = len(clock.published)
+    clock.run_until(clock.now + 5) # out of range, nothing until someone is back
+    assert len(clock.published) == count
+
+
+def test_published_distances_tell_approach_from_leave():
+    clock, sensor = published()
+    entrance = Entrance()
+
+    def fed(since: int = 0) -> int:
+        """Feeds what was published from ``since`` on, returns what the entrance told apart."""
+        return next((d for data in clock.published[since:] if (d := entrance.add(data["ts"], data["distance"]))), 0)
+
+    # comes to the door and opens it
+    t = walk(clock, sensor, 1., .1, 0)
+    assert fed() == 0
+    assert entrance.trigger(t) == APPROACH
+
+    # stands inside for a while, then opens the door and goes away
+    clock.run_until(t + 10)
+    since = len(clock.published)
+    assert entrance.trigger(t + 10) == 0
+    walk(clock, sensor, .1, 1., t + 10)
+    assert fed(since) == LEAVE
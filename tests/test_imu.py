@@ -0,0 +1,45 @@
+import math
+
+from gpiohero.report import ReportFilter
+from justkeeplivin.imu import ImuWindow
+
+UPRIGHT = (0., 0., 1.)
+TILTED = (math.sin(math.radians(30)), 0., math.cos(math.radians(30)))
+
+
+def reported(readings: list[tuple[float, float, float]], interval: float = 2) -> list[tuple[float, tuple]]:
+    """What a change-only reporting IMU publishes of readings taken every ``interval`` seconds."""
+    now = 0.
+    published = []
+    report = ReportFilter(lambda m: published.append((now, m["accel"])), {"accel": .02}, clock=lambda: now)
+
+    for i, accel in enumerate(readings):
+        now = i * interval
+        report({"accel": accel})
+    return published
+
+
+def fired(samples: list[tuple[float, tuple]], window: ImuWindow | None = None) -> list[int]:
+    """Indexes of the samples the window got tilted or shaken on."""
+    window = window or ImuWindow()
+    return [i for i, (t, accel) in enumerate(samples) if window.add(t, accel)]
+
+
+def test_held_tilt_fires_within_two_samples():
+    samples = reported([UPRIGHT] * 200 + [TILTED] * 200) # held for over six minutes
+    tilted = next(i for i, (_, accel) in enumerate(samples) if accel == TILTED)
+
+    assert fired(samples)[0] - tilted <= 1
+
+
+def test_tilt_after_a_restart_fires_within_two_samples():
+    # the backend starts up with the icon upright, then it is taken down
+    samples = [(0., UPRIGHT), (60., TILTED), (62., TILTED), (64., TILTED)]
+
+    assert fired(samples)[0] <= 2
+
+
+def test_upright_and_spikes_do_not_fire():
+    samples = reported(([UPRIGHT] * 40 + [TILTED]) * 5)
+
+    assert fired(samples) == []
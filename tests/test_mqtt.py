@@ -0,0 +1,26 @@
+from paho.mqtt.client import MQTTMessage
+
+from justkeeplivin.x.mqtt import TopicDispatcher
+
+
+def message(topic: str, payload: bytes) -> MQTTMessage:
+    msg = MQTTMessage(topic=topic.encode())
+    msg.payload = payload
+    return msg
+
+
+def test_json_handler_is_removed():
+    dispatcher = TopicDispatcher()
+    received = []
+
+    @dispatcher.on_json_topic("home/+/+/door")
+    def on_door(client, userdata, message, house, location):
+        received.append((house, location, message.json["open"]))
+
+    assert dispatcher.dispatch(None, None, message("home/h1/porch/door", b'{"open": true}'))
+    assert dispatcher.dispatch(None, None, message("home/h1/porch/door", b"not json"))
+    assert received == [("h1", "porch", True)]
+
+    dispatcher.remove("home/+/+/door", on_door)
+    assert not dispatcher.dispatch(None, None, message("home/h1/porch/door", b'{"open": false}'))
+    assert received == [("h1", "porch", True)]
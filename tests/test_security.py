@@ -0,0 +1,69 @@
+import time
+import sqlite3
+
+import pytest
+
+from justkeeplivin import security
+from justkeeplivin.security import (
+    AlarmState, ArmedState, ArmingState, DisarmedState, EventLog, SecurityContexts, SecurityEvent,
+)
+
+
+@pytest.fixture
+def buzzes(monkeypatch) -> list[tuple[str, str]]:
+    published = []
+    monkeypatch.setattr(security, "write", lambda *_: None)
+    monkeypatch.setattr(security.mqtt, "publish", lambda topic, payload: published.append((topic, payload)))
+    return published
+
+
+def settle(contexts: SecurityContexts, house: str, State: type, timeout: float = 2):
+    """Waits for the security thread to bring the house to a state."""
+    deadline = time.monotonic() + timeout
+    while not isinstance(contexts[house].state, State):
+        assert time.monotonic() < deadline, f"{house} is {type(contexts[house].state).__name__}, not {State.__name__}"
+        time.sleep(.01)
+
+
+def typed(keys: str, timestamp: float | None = None) -> SecurityEvent:
+    return SecurityEvent(SecurityEvent.PIN_ENTERED, extra={"keys": keys}, timestamp=timestamp or time.time())
+
+
+def test_keypad_arms_alarms_and_disarms(tmp_path, buzzes):
+    contexts = SecurityContexts({"h1": {"pin": "4321"}}, "1234", EventLog(tmp_path / "security.db")).start()
+    try:
+        contexts.submit("h1", typed("1234"))
+        time.sleep(.1)
+        assert isinstance(contexts["h1"].state, DisarmedState) # not the pin of h1
+
+        # typed long enough ago for the arming delay to have passed, its timer is due at once
+        contexts.submit("h1", typed("4321", time.time() - 20))
+        settle(contexts, "h1", ArmedState)
+
+        contexts.submit("h1", typed("0000"))
+        contexts.submit("h1", SecurityEvent.MOTION_DETECTED)
+        settle(contexts, "h1", AlarmState)
+        assert buzzes[-1][0] == "cmd/home/h1/porch/buzz" and '"on"' in buzzes[-1][1]
+
+        contexts.submit("h1", typed("4321"))
+        settle(contexts, "h1", DisarmedState)
+        assert '"off"' in buzzes[-1][1]
+    finally:
+        contexts.stop()
+
+    # only whether a pin was correct is logged, not what was typed
+    with sqlite3.connect(tmp_path / "security.db") as db:
+        entered = [extra for extra, in db.execute("SELECT extra FROM events WHERE type = 'PIN_ENTERED' ORDER BY seq")]
+    assert entered == ['{"correct": false}', '{"correct": true}', '{"correct": false}', '{"correct": true}']
+
+
+def test_arming_is_cancelled_by_the_pin(buzzes):
+    contexts = SecurityContexts({}, "1234").start()
+    try:
+        contexts.submit("default", typed("1234"))
+        settle(contexts, "default", ArmingState)
+        contexts.submit("default", typed("1234"))
+        settle(contexts, "default", DisarmedState)
+    finally:
+        contexts.stop()
+    assert not buzzes